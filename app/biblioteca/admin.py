@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import CategoriaLibro, Libro, UsuarioLector, Prestamo
+from .models import (
+    CategoriaLibro,
+    EventoAuditoria,
+    Libro,
+    UsuarioLector,
+    Prestamo,
+    PrestamoArchivado,
+    TokenAPI,
+)
 
 
 @admin.register(CategoriaLibro)
@@ -82,3 +90,59 @@ class PrestamoAdmin(admin.ModelAdmin):
             },
         ),
     )
+
+
+@admin.register(PrestamoArchivado)
+class PrestamoArchivadoAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "libro",
+        "lector",
+        "estado",
+        "fecha_prestamo",
+        "fecha_devolucion_real",
+        "fecha_archivado",
+    )
+    list_filter = ("estado",)
+    search_fields = ("lector__dni", "libro__titulo")
+    date_hierarchy = "fecha_prestamo"
+    list_select_related = ("libro", "lector")
+
+    # el archivo es de solo lectura: se llena con archivar_prestamos
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EventoAuditoria)
+class EventoAuditoriaAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "usuario_nombre", "accion", "entidad", "entidad_id")
+    list_filter = ("accion", "entidad")
+    search_fields = ("usuario_nombre", "=entidad_id")
+    date_hierarchy = "fecha"
+
+    # append-only: se escribe con biblioteca.auditoria.auditar()
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TokenAPI)
+class TokenAPIAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "usuario", "prefijo", "alcances", "creado", "expira", "activo")
+    list_filter = ("activo",)
+    list_editable = ("activo",)
+    search_fields = ("nombre", "usuario__username", "prefijo")
+    list_select_related = ("usuario",)
+    readonly_fields = ("usuario", "prefijo", "clave_hash", "alcances", "creado")
+
+    # la clave sólo se conoce al crearlo: se crean con crear_token_api
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from biblioteca import roles
+
+CACHE_PREFIJO = "tokenapi:"
+
+
+def _clave_cache(clave_hash: str) -> str:
+    return CACHE_PREFIJO + clave_hash
+
+
+def olvidar_token(clave_hash: str) -> None:
+    cache.delete(_clave_cache(clave_hash))
+
+
+def olvidar_tokens_de(usuario_ids) -> None:
+    from biblioteca.models import TokenAPI
+
+    claves = TokenAPI.objects.filter(usuario_id__in=usuario_ids).values_list("clave_hash", flat=True)
+    cache.delete_many([_clave_cache(clave_hash) for clave_hash in claves])
+
+
+class TokenAPIAuthentication(authentication.BaseAuthentication):
+    """
+    Authorization: Token <clave>
+
+    El token validado (usuario + roles según sus alcances) se cachea
+    TOKEN_API_CACHE_TTL segundos: en ese lapso los requests no consultan
+    ni la tabla de tokens, ni la de sesiones, ni la de grupos.
+    El usuario devuelto es una instancia en memoria con los roles del token
+    que el usuario todavía tiene (alcances ∩ grupos actuales, releídos en
+    cada validación; nunca superusuario), suficiente para permisos,
+    creado_por y auditoría. Cambiar los grupos del usuario invalida sus
+    tokens cacheados (signals.py).
+    """
+
+    keyword = "Token"
+
+    def authenticate(self, request):
+        partes = authentication.get_authorization_header(request).split()
+        if not partes or partes[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(partes) != 2:
+            raise exceptions.AuthenticationFailed("Header Authorization inválido.")
+        try:
+            clave = partes[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Token inválido.")
+
+        from biblioteca.models import TokenAPI
+
+        clave_hash = TokenAPI.hashear(clave)
+        datos = cache.get(_clave_cache(clave_hash))
+        if datos is None:
+            datos = self._validar(clave_hash)
+        elif datos["expira"] <= timezone.now().timestamp():
+            olvidar_token(clave_hash)
+            raise exceptions.AuthenticationFailed("Token vencido.")
+
+        return self._usuario(datos), datos
+
+    def _validar(self, clave_hash):
+        from biblioteca.models import TokenAPI
+
+        token = (
+            TokenAPI.objects.select_related("usuario")
+            .filter(clave_hash=clave_hash)
+            .first()
+        )
+        if token is None or not token.esta_vigente() or not token.usuario.is_active:
+            raise exceptions.AuthenticationFailed("Token inválido o vencido.")
+
+        # un usuario degradado no conserva por el token el rol que ya no tiene
+        actuales = set(token.usuario.groups.values_list("name", flat=True))
+        if token.usuario.is_superuser:
+            actuales.add(roles.SUPERVISOR)
+        datos = {
+            "token_id": token.id,
+            "usuario_id": token.usuario_id,
+            "username": token.usuario.get_username(),
+            "grupos": [
+                TokenAPI.GRUPOS[a] for a in token.alcances if TokenAPI.GRUPOS.get(a) in actuales
+            ],
+            "expira": token.expira.timestamp(),
+        }
+        ttl = min(settings.TOKEN_API_CACHE_TTL, int(datos["expira"] - timezone.now().timestamp()))
+        if ttl > 0:
+            cache.set(_clave_cache(clave_hash), datos, ttl)
+        return datos
+
+    def _usuario(self, datos):
+        User = get_user_model()
+        usuario = User(id=datos["usuario_id"], is_active=True, is_superuser=False)
+        setattr(usuario, User.USERNAME_FIELD, datos["username"])
+        # lo que consultan es_operador / es_supervisor (ver biblioteca.roles._grupos)
+        usuario._grupos_biblioteca = frozenset(datos["grupos"])
+        return usuario
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,78 @@
+"""
+Esquema OpenAPI pre-generado.
+
+El esquema se genera una vez al construir la imagen:
+
+    python manage.py spectacular --file openapi/schema.yaml
+    python manage.py spectacular --format openapi-json --file openapi/schema.json
+
+y `esquema` sirve esos archivos (desde memoria, con ETag: un cliente que ya
+lo tiene recibe 304). Sólo con DEBUG y sin archivo se genera en vivo con
+drf_spectacular, que recorre todos los viewsets y serializers.
+"""
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_GET
+
+FORMATOS = {
+    "yaml": ("schema.yaml", "application/vnd.oai.openapi; charset=utf-8"),
+    "json": ("schema.json", "application/vnd.oai.openapi+json; charset=utf-8"),
+}
+
+
+def _formato(request) -> str:
+    return "json" if request.GET.get("format") == "json" else "yaml"
+
+
+def _ruta(formato: str) -> Path:
+    return Path(settings.OPENAPI_ESQUEMA_DIR) / FORMATOS[formato][0]
+
+
+@lru_cache(maxsize=8)
+def _leer(ruta: Path, mtime_ns: int) -> tuple:
+    # mtime en la clave: si se regenera el archivo se vuelve a leer
+    contenido = ruta.read_bytes()
+    return contenido, hashlib.sha256(contenido).hexdigest()[:32]
+
+
+def _archivo(request):
+    ruta = _ruta(_formato(request))
+    try:
+        return _leer(ruta, ruta.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def _etag(request):
+    archivo = _archivo(request)
+    return archivo[1] if archivo else None
+
+
+@require_GET
+@condition(etag_func=_etag)
+def _servir_archivo(request):
+    formato = _formato(request)
+    contenido, _ = _archivo(request)
+    response = HttpResponse(contenido, content_type=FORMATOS[formato][1])
+    # siempre revalidar: el ETag cambia con cada build
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def esquema(request, *args, **kwargs):
+    if _archivo(request) is not None:
+        return _servir_archivo(request)
+    if settings.DEBUG:
+        from drf_spectacular.views import SpectacularAPIView
+
+        return SpectacularAPIView.as_view()(request, *args, **kwargs)
+    return HttpResponse(
+        "El esquema OpenAPI no está generado. Ejecutá "
+        "'python manage.py spectacular --file openapi/schema.yaml'.",
+        status=503,
+        content_type="text/plain; charset=utf-8",
+    )
@@ -0,0 +1,15 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.views import exception_handler as drf_exception_handler
+
+
+def exception_handler(exc, context):
+    """
+    Igual al handler de DRF, pero las ValidationError de Django (reglas de
+    negocio de Prestamo.clean(), perform_destroy, etc.) se responden como
+    400 en vez de terminar en un 500.
+    """
+    if isinstance(exc, DjangoValidationError):
+        detalle = exc.message_dict if hasattr(exc, "error_dict") else exc.messages
+        exc = serializers.ValidationError(detalle)
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,29 @@
+"""
+Extensiones de drf-spectacular para el esquema OpenAPI.
+
+Se cargan sólo al generar el esquema (SPECTACULAR_SETTINGS
+["DEFAULT_GENERATOR_CLASS"] apunta a GeneradorEsquema): así
+drf_spectacular.extensions (y unittest, que arrastra) no se importan en
+cada arranque del servidor.
+"""
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.generators import SchemaGenerator
+
+from .authentication import TokenAPIAuthentication
+
+
+class TokenAPIScheme(OpenApiAuthenticationExtension):
+    target_class = TokenAPIAuthentication
+    name = "tokenAuth"
+
+    def get_security_definition(self, auto_schema):
+        return {
+            "type": "apiKey",
+            "in": "header",
+            "name": "Authorization",
+            "description": 'Token de API: "Token <clave>" (ver crear_token_api).',
+        }
+
+
+class GeneradorEsquema(SchemaGenerator):
+    """Generador de spectacular; importarlo registra las extensiones de arriba."""
@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from biblioteca.views import es_operador, es_supervisor
+from biblioteca.roles import es_operador, es_supervisor
 
 class IsSupervisor(BasePermission):
     """
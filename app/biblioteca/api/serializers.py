@@ -1,5 +1,10 @@
+import datetime
+
+from django.utils import timezone
 from rest_framework import serializers
-from biblioteca.models import CategoriaLibro, Libro, UsuarioLector, Prestamo
+
+from biblioteca import analitica
+from biblioteca.models import CategoriaLibro, Libro, UsuarioLector, Prestamo, EventoAuditoria
 
 
 class CategoriaLibroSerializer(serializers.ModelSerializer):
@@ -53,6 +58,52 @@ class UsuarioLectorSerializer(serializers.ModelSerializer):
         model = UsuarioLector
         fields = ["id", "nombre", "apellido", "dni", "email", "telefono", "activo"]
 
+class UsuarioLectorResumenSerializer(serializers.ModelSerializer):
+    """
+    Lo justo para un selector de lectores (listado paginado).
+    """
+    class Meta:
+        model = UsuarioLector
+        fields = ["id", "nombre", "apellido", "dni", "activo"]
+
+class AnaliticaPrestamosParamsSerializer(serializers.Serializer):
+    """
+    Query params de /api/analitica/prestamos/. Sin fechas: últimos 12 meses.
+    """
+    periodo = serializers.ChoiceField(choices=list(analitica.PERIODOS), default="mes")
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    por = serializers.CharField(
+        default=",".join(analitica.DIMENSIONES),
+        allow_blank=True,
+        help_text="Dimensiones separadas por coma: estado, categoria (vacío = total).",
+    )
+    estado = serializers.ChoiceField(choices=Prestamo.Estados.choices, required=False)
+    categoria = serializers.IntegerField(required=False)
+
+    def validate_por(self, valor):
+        dimensiones = [d.strip() for d in valor.split(",") if d.strip()]
+        invalidas = sorted(set(dimensiones) - set(analitica.DIMENSIONES))
+        if invalidas:
+            raise serializers.ValidationError(f"Dimensiones no válidas: {', '.join(invalidas)}.")
+        return dimensiones
+
+    def validate(self, datos):
+        datos.setdefault("hasta", timezone.localdate())
+        datos.setdefault("desde", datos["hasta"] - datetime.timedelta(days=365))
+        if datos["desde"] > datos["hasta"]:
+            raise serializers.ValidationError({"desde": "Debe ser anterior o igual a hasta."})
+        return datos
+
+class PopularesParamsSerializer(serializers.Serializer):
+    """
+    Query params de /api/populares/.
+    """
+    mes = serializers.DateField(
+        input_formats=["%Y-%m"], required=False, help_text="YYYY-MM. Default: el mes actual."
+    )
+    n = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
 class PrestamoSerializer(serializers.ModelSerializer):
     # libro: nested solo lectura
     libro = LibroSerializer(read_only=True)
@@ -183,3 +234,12 @@ class PrestamoSerializer(serializers.ModelSerializer):
 
         prestamo = Prestamo.objects.create(**validated_data)
         return prestamo
+
+
+class EventoAuditoriaSerializer(serializers.ModelSerializer):
+    usuario = serializers.CharField(source="usuario_nombre", read_only=True)
+
+    class Meta:
+        model = EventoAuditoria
+        fields = ["id", "fecha", "usuario", "accion", "entidad", "entidad_id", "datos"]
+        read_only_fields = fields
@@ -0,0 +1,46 @@
+"""
+Respuestas JSON que se generan de a pedazos (StreamingHttpResponse).
+
+Para volcados completos de una tabla: en vez de armar la lista entera de
+objetos + la lista de dicts serializados + el string JSON, se recorre el
+queryset con .iterator() y se emite un array JSON en bloques de
+`chunk_size` filas. El pico de memoria queda acotado por el bloque, no por
+la tabla.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+CHUNK_SIZE = 1000
+
+
+def _array_json(queryset, serializer_class, chunk_size, context):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield "["
+    primero = True
+    bloque = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        bloque.append(obj)
+        if len(bloque) == chunk_size:
+            yield from _bloque(bloque, serializer_class, context, encoder, primero)
+            primero = False
+            bloque = []
+    if bloque:
+        yield from _bloque(bloque, serializer_class, context, encoder, primero)
+    yield "]"
+
+
+def _bloque(objetos, serializer_class, context, encoder, primero):
+    datos = serializer_class(objetos, many=True, context=context).data
+    texto = ",".join(encoder.encode(item) for item in datos)
+    yield texto if primero else "," + texto
+
+
+def respuesta_json_streaming(queryset, serializer_class, context=None, chunk_size=CHUNK_SIZE):
+    """
+    Array JSON con `serializer_class` aplicado a cada fila de `queryset`.
+    Los errores a mitad del volcado ya no pueden cambiar el status (200).
+    """
+    return StreamingHttpResponse(
+        _array_json(queryset, serializer_class, chunk_size, context or {}),
+        content_type="application/json",
+    )
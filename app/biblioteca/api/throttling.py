@@ -0,0 +1,43 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from biblioteca import limites
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle de DRF sobre biblioteca.limites (token bucket en la cache).
+    La tasa se toma de DEFAULT_THROTTLE_RATES[scope]; DRF agrega Retry-After
+    con lo que devuelve wait().
+    """
+
+    scope = None
+    metodos = None  # None = todos
+
+    def allow_request(self, request, view):
+        if self.metodos is not None and request.method not in self.metodos:
+            return True
+        self.espera = limites.consumir(self.scope, limites.identificar(request))
+        return not self.espera
+
+    def wait(self):
+        return self.espera
+
+
+class LecturaThrottle(TokenBucketThrottle):
+    scope = "lectura"
+    metodos = SAFE_METHODS
+
+
+class EscrituraThrottle(TokenBucketThrottle):
+    scope = "escritura"
+    metodos = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class ReporteThrottle(TokenBucketThrottle):
+    """
+    Reportes (filtros de rango amplio): balde propio y más chico, compartido
+    con la vista HTML reporte_prestamos.
+    """
+
+    scope = "reporte"
@@ -1,7 +1,10 @@
 from rest_framework.routers import DefaultRouter
 from .views import (
+    AnaliticaPrestamosViewSet,
     CategoriaLibroViewSet,
+    EventoAuditoriaViewSet,
     LibroViewSet,
+    PopularesViewSet,
     UsuarioLectorViewSet,
     PrestamoViewSet,
 )
@@ -11,5 +14,8 @@ router.register(r"categorias", CategoriaLibroViewSet, basename="categoria")
 router.register(r"libros", LibroViewSet, basename="libro")
 router.register(r"lectores", UsuarioLectorViewSet, basename="lector")
 router.register(r"prestamos", PrestamoViewSet, basename="prestamo")
+router.register(r"auditoria", EventoAuditoriaViewSet, basename="auditoria")
+router.register(r"analitica/prestamos", AnaliticaPrestamosViewSet, basename="analitica-prestamos")
+router.register(r"populares", PopularesViewSet, basename="populares")
 
 urlpatterns = router.urls
@@ -2,24 +2,43 @@ import csv
 import datetime
 
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q, Count
 from django.http import HttpResponse
 from django.utils import timezone
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema_view, extend_schema
 from rest_framework import viewsets, permissions, mixins
 from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 
-from biblioteca.models import CategoriaLibro, Libro, UsuarioLector, Prestamo
+from biblioteca import analitica, populares, reportes
+from biblioteca.auditoria import auditar
+from biblioteca.models import (
+    CategoriaLibro,
+    EventoAuditoria,
+    Libro,
+    UsuarioLector,
+    Prestamo,
+    PrestamoArchivado,
+)
+from biblioteca.replicas import lectura_en_replica
 from .permissions import IsSupervisor, IsOperadorOrSupervisor
+from .streaming import respuesta_json_streaming
+from .throttling import ReporteThrottle
 from .serializers import (
+    AnaliticaPrestamosParamsSerializer,
     CategoriaLibroSerializer,
+    EventoAuditoriaSerializer,
+    PopularesParamsSerializer,
     LibroSerializer,
+    UsuarioLectorResumenSerializer,
     UsuarioLectorSerializer,
     PrestamoSerializer,
 )
-from ..views import es_supervisor, es_operador
+from biblioteca.roles import es_supervisor, es_operador
 
 
 class CategoriaLibroViewSet(viewsets.ModelViewSet):
@@ -38,7 +57,35 @@ class CategoriaLibroViewSet(viewsets.ModelViewSet):
                 "No podés eliminar la categoría porque tiene libros asociados. "
                 "Eliminá o reasigná esos libros primero."
             )
+        categoria_id = instance.id
         instance.delete()
+        auditar(
+            self.request.user,
+            "CATEGORIA_DELETE",
+            "categoria",
+            categoria_id,
+            nombre=instance.nombre,
+        )
+
+    def perform_create(self, serializer):
+        categoria = serializer.save()
+        auditar(
+            self.request.user,
+            "CATEGORIA_CREATE",
+            "categoria",
+            categoria.id,
+            nombre=categoria.nombre,
+        )
+
+    def perform_update(self, serializer):
+        categoria = serializer.save()
+        auditar(
+            self.request.user,
+            "CATEGORIA_UPDATE",
+            "categoria",
+            categoria.id,
+            nombre=categoria.nombre,
+        )
 
     def partial_update(self, request, *args, **kwargs):
         raise MethodNotAllowed("PATCH")
@@ -48,11 +95,13 @@ class CategoriaLibroViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"], pagination_class=None)
     def todos(self, request):
         """
-        Devuelve todas las categorías sin paginar.
+        Devuelve todas las categorías sin paginar (en streaming).
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return respuesta_json_streaming(
+            self.get_queryset(),
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+        )
 
 class LibroViewSet(viewsets.ModelViewSet):
     serializer_class = LibroSerializer
@@ -80,12 +129,31 @@ class LibroViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance: Libro):
         # Regla: no borrar si hay préstamos asociados
-        if Prestamo.objects.filter(libro=instance).exists():
+        if (
+            Prestamo.objects.filter(libro=instance).exists()
+            or PrestamoArchivado.objects.filter(libro=instance).exists()
+        ):
             raise ValidationError(
                 "No podés eliminar el libro porque tiene préstamos registrados. "
                 "Si no querés seguir prestándolo, dejá ejemplares_totales en 0."
             )
+        libro_id = instance.id
         instance.delete()
+        auditar(
+            self.request.user,
+            "LIBRO_DELETE",
+            "libro",
+            libro_id,
+            titulo=instance.titulo,
+        )
+
+    def perform_create(self, serializer):
+        libro = serializer.save()
+        auditar(self.request.user, "LIBRO_CREATE", "libro", libro.id, titulo=libro.titulo)
+
+    def perform_update(self, serializer):
+        libro = serializer.save()
+        auditar(self.request.user, "LIBRO_UPDATE", "libro", libro.id, titulo=libro.titulo)
 
     def partial_update(self, request, *args, **kwargs):
         raise MethodNotAllowed("PATCH")
@@ -95,22 +163,67 @@ class LibroViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"], pagination_class=None)
     def todos(self, request):
         """
-        Devuelve todos los libros (sin paginación).
+        Devuelve todos los libros (sin paginación, en streaming).
         Acepta también ?q= para filtrar por titulo/autor/isbn.
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return respuesta_json_streaming(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+        )
 
+class LectorCursorPagination(CursorPagination):
+    # un solo campo único: DRF arma el cursor con ordering[0] y desempata con
+    # un OFFSET, así que con apellidos repetidos (apellido, nombre, id)
+    # repetía o salteaba filas
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter("q", str, description="Prefijo de DNI, apellido o nombre."),
+            OpenApiParameter(
+                "todos",
+                bool,
+                description="1 = volcado completo sin paginar (formato anterior, streaming).",
+            ),
+        ]
+    )
+)
 class UsuarioLectorViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-    queryset = UsuarioLector.objects.all().order_by("apellido", "nombre")
-    serializer_class = UsuarioLectorSerializer
-    pagination_class = None
+    """
+    Listado paginado por cursor, con ?q= y campos resumidos.
+    ?todos=1 mantiene el formato anterior (array con todos los lectores y
+    todos los campos), generado en streaming.
+    """
+    serializer_class = UsuarioLectorResumenSerializer
+    pagination_class = LectorCursorPagination
+
+    def get_queryset(self):
+        qs = UsuarioLector.objects.buscar(self.request.query_params.get("q") or "")
+        if self._todos():
+            return qs.order_by("apellido", "nombre")
+        return qs.only(*UsuarioLectorResumenSerializer.Meta.fields)
 
     def get_permissions(self):
         # Sólo Operador o Supervisor pueden usar este endpoint
         return [IsOperadorOrSupervisor()]
 
+    def _todos(self) -> bool:
+        return self.request.query_params.get("todos") in ("1", "true")
+
+    def list(self, request, *args, **kwargs):
+        if self._todos():
+            return respuesta_json_streaming(
+                self.get_queryset(),
+                UsuarioLectorSerializer,
+                context=self.get_serializer_context(),
+            )
+        return super().list(request, *args, **kwargs)
+
 class PrestamoViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -126,7 +239,7 @@ class PrestamoViewSet(
         Equivalente a listar_prestamos.
         """
         qs = (
-            Prestamo.objects.select_related("libro", "lector")
+            Prestamo.objects.select_related("libro__categoria", "lector")
             .order_by("-fecha_prestamo", "-id")
         )
         estado = self.request.query_params.get("estado") or ""
@@ -159,10 +272,21 @@ class PrestamoViewSet(
         - setea creado_por
         - fuerza estado inicial PRESTADO
         La lógica de lector nuevo/existente está en el serializer.
+        Lector nuevo, préstamo, stock y contadores (populares) van en una
+        sola transacción.
         """
-        serializer.save(
-            creado_por=self.request.user,
-            estado=Prestamo.Estados.PRESTADO,
+        with transaction.atomic():
+            prestamo = serializer.save(
+                creado_por=self.request.user,
+                estado=Prestamo.Estados.PRESTADO,
+            )
+        auditar(
+            self.request.user,
+            "PRESTAMO_CREATE",
+            "prestamo",
+            prestamo.id,
+            libro_id=prestamo.libro_id,
+            lector_id=prestamo.lector_id,
         )
 
     # ------- Acciones custom sobre un préstamo -------
@@ -191,6 +315,13 @@ class PrestamoViewSet(
             prestamo.estado = Prestamo.Estados.DEVUELTO
 
         prestamo.save()
+        auditar(
+            request.user,
+            "PRESTAMO_DEVOLUCION",
+            "prestamo",
+            prestamo.id,
+            nuevo_estado=prestamo.estado,
+        )
 
         serializer = self.get_serializer(prestamo)
         return Response(serializer.data)
@@ -207,6 +338,7 @@ class PrestamoViewSet(
         prestamo.estado = Prestamo.Estados.ROBADO
         prestamo.fecha_devolucion_real = hoy
         prestamo.save()
+        auditar(request.user, "PRESTAMO_ROBADO", "prestamo", prestamo.id)
 
         serializer = self.get_serializer(prestamo)
         return Response(serializer.data)
@@ -214,6 +346,7 @@ class PrestamoViewSet(
     # ------- Dashboard (home) -------
 
     @action(detail=False, methods=["get"], url_path="dashboard")
+    @lectura_en_replica
     def dashboard(self, request):
         """
         Equivalente a la vista home:
@@ -230,7 +363,7 @@ class PrestamoViewSet(
         hace_7_dias = hoy - datetime.timedelta(days=7)
 
         prestamos_activos_recientes = (
-            Prestamo.objects.select_related("libro", "lector")
+            Prestamo.objects.select_related("libro__categoria", "lector")
             .filter(
                 estado__in=[
                     Prestamo.Estados.PRESTADO,
@@ -268,7 +401,7 @@ class PrestamoViewSet(
             ]
 
             atrasados = (
-                Prestamo.objects.select_related("libro", "lector")
+                Prestamo.objects.select_related("libro__categoria", "lector")
                 .filter(estado=Prestamo.Estados.ATRASADO)
                 .order_by("-fecha_prestamo")[:20]
             )
@@ -285,28 +418,20 @@ class PrestamoViewSet(
 
     # ------- Reporte (filtros + resumen + detalle) -------
 
-    def _build_reporte_queryset(self, request):
-        qs = Prestamo.objects.select_related(
-            "libro", "lector", "libro__categoria"
-        ).all()
-
-        estado = (request.query_params.get("estado") or "").strip()
-        categoria_id = (request.query_params.get("categoria") or "").strip()
-        fecha_desde = (request.query_params.get("fecha_desde") or "").strip()
-        fecha_hasta = (request.query_params.get("fecha_hasta") or "").strip()
-
-        if estado:
-            qs = qs.filter(estado=estado)
-        if categoria_id:
-            qs = qs.filter(libro__categoria_id=categoria_id)
-        if fecha_desde:
-            qs = qs.filter(fecha_prestamo__gte=fecha_desde)
-        if fecha_hasta:
-            qs = qs.filter(fecha_prestamo__lte=fecha_hasta)
-
-        return qs, estado, categoria_id, fecha_desde, fecha_hasta
-
-    @action(detail=False, methods=["get"], url_path="reporte")
+    def _build_reporte_querysets(self, request):
+        """
+        Prestamo (+ PrestamoArchivado si los filtros lo alcanzan) filtrados.
+        """
+        filtros = reportes.leer_filtros(request.query_params)
+        return reportes.querysets_reporte(filtros), filtros
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="reporte",
+        throttle_classes=[ReporteThrottle],
+    )
+    @lectura_en_replica
     def reporte(self, request):
         """
         Equivalente a reporte_prestamos (vista HTML), pero en JSON.
@@ -321,15 +446,8 @@ class PrestamoViewSet(
         - total_atrasados
         - prestamos (detalle completo)
         """
-        qs, estado, categoria_id, fecha_desde, fecha_hasta = self._build_reporte_queryset(
-            request
-        )
+        querysets, filtros = self._build_reporte_querysets(request)
 
-        resumen_raw = (
-            qs.values("estado")
-            .annotate(total=Count("id"))
-            .order_by("estado")
-        )
         estado_labels = dict(Prestamo.Estados.choices)
         resumen_por_estado = [
             {
@@ -337,40 +455,38 @@ class PrestamoViewSet(
                 "estado_display": estado_labels.get(row["estado"], row["estado"]),
                 "total": row["total"],
             }
-            for row in resumen_raw
+            for row in reportes.resumen_por_estado(querysets)
         ]
 
-        total_prestamos = qs.count()
-        total_atrasados = qs.filter(estado=Prestamo.Estados.ATRASADO).count()
+        total_prestamos = reportes.contar(querysets)
+        total_atrasados = reportes.contar_atrasados(querysets)
 
-        prestamos = qs.order_by("-fecha_prestamo", "-id")
+        prestamos = reportes.iterar_prestamos(querysets)
 
         data = {
-            "filtros": {
-                "estado": estado,
-                "categoria_id": categoria_id,
-                "fecha_desde": fecha_desde,
-                "fecha_hasta": fecha_hasta,
-            },
+            "filtros": filtros,
             "resumen_por_estado": resumen_por_estado,
             "total_prestamos": total_prestamos,
             "total_atrasados": total_atrasados,
-            "prestamos": self.get_serializer(prestamos, many=True).data,
+            "prestamos": self.get_serializer(list(prestamos), many=True).data,
         }
         return Response(data)
 
     # ------- CSV del reporte -------
 
-    @action(detail=False, methods=["get"], url_path="reporte_csv")
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="reporte_csv",
+        throttle_classes=[ReporteThrottle],
+    )
+    @lectura_en_replica
     def reporte_csv(self, request):
         """
         Exporta a CSV los préstamos filtrados por los mismos parámetros
         que /api/prestamos/reporte/.
         """
-        qs, estado, categoria_id, fecha_desde, fecha_hasta = self._build_reporte_queryset(
-            request
-        )
-        qs = qs.order_by("-fecha_prestamo")
+        querysets, _ = self._build_reporte_querysets(request)
 
         response = HttpResponse(content_type="text/csv")
         response["Content-Disposition"] = 'attachment; filename="reporte_prestamos.csv"'
@@ -390,7 +506,8 @@ class PrestamoViewSet(
         )
 
         # iterator() para que sea más óptimo en memoria
-        for p in qs.iterator():
+        # (en PostgreSQL usa cursor del lado del servidor, de a chunk_size filas)
+        for p in reportes.iterar_prestamos(querysets):
             writer.writerow(
                 [
                     p.id,
@@ -404,4 +521,143 @@ class PrestamoViewSet(
                 ]
             )
 
-        return response
\ No newline at end of file
+        return response
+
+class AuditoriaCursorPagination(CursorPagination):
+    # cursor: el costo de pedir la página N no crece con N
+    ordering = ("-fecha", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+class EventoAuditoriaViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Eventos de auditoría (solo supervisores), del más nuevo al más viejo.
+    Filtros:
+    - entidad + entidad_id (ej. ?entidad=prestamo&entidad_id=42)
+    - usuario (username)
+    - accion (ej. PRESTAMO_DEVOLUCION)
+    - desde / hasta (YYYY-MM-DD, sobre la fecha del evento)
+    """
+
+    serializer_class = EventoAuditoriaSerializer
+    pagination_class = AuditoriaCursorPagination
+
+    def get_permissions(self):
+        return [IsSupervisor()]
+
+    def get_queryset(self):
+        qs = EventoAuditoria.objects.all()
+        params = self.request.query_params
+
+        if params.get("entidad"):
+            qs = qs.filter(entidad=params["entidad"])
+        if params.get("entidad_id"):
+            try:
+                entidad_id = int(params["entidad_id"])
+                if not -(2**63) <= entidad_id < 2**63:  # BigIntegerField
+                    raise ValueError
+            except ValueError:
+                raise ValidationError({"entidad_id": "Debe ser un número entero."})
+            qs = qs.filter(entidad_id=entidad_id)
+        if params.get("usuario"):
+            qs = qs.filter(usuario_nombre=params["usuario"])
+        if params.get("accion"):
+            qs = qs.filter(accion=params["accion"])
+        # rango sobre la columna (no fecha__date, que la envuelve en un cast
+        # y no usa el índice de fecha)
+        if params.get("desde"):
+            qs = qs.filter(fecha__gte=self._inicio_del_dia(params, "desde"))
+        if params.get("hasta"):
+            qs = qs.filter(fecha__lt=self._inicio_del_dia(params, "hasta", dias=1))
+        return qs
+
+    @staticmethod
+    def _inicio_del_dia(params, parametro: str, dias: int = 0) -> datetime.datetime:
+        """Medianoche (zona horaria actual) del día `parametro` + `dias`."""
+        try:
+            dia = datetime.date.fromisoformat(params[parametro])
+        except ValueError:
+            raise ValidationError({parametro: "Fecha inválida, el formato es YYYY-MM-DD."})
+        dia += datetime.timedelta(days=dias)
+        return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+    @lectura_en_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+@extend_schema_view(
+    list=extend_schema(parameters=[AnaliticaPrestamosParamsSerializer], responses=OpenApiTypes.OBJECT)
+)
+class AnaliticaPrestamosViewSet(viewsets.ViewSet):
+    """
+    Préstamos por día / semana / mes (según fecha_prestamo), abiertos por
+    estado y/o categoría. Lee el rollup diario (comando actualizar_rollups),
+    no los préstamos: un año por mes son unas pocas filas.
+    """
+
+    def get_permissions(self):
+        return [IsSupervisor()]
+
+    @lectura_en_replica
+    def list(self, request):
+        params = AnaliticaPrestamosParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        datos = params.validated_data
+
+        serie = analitica.series(
+            datos["periodo"],
+            datos["desde"],
+            datos["hasta"],
+            por=datos["por"],
+            estado=datos.get("estado"),
+            categoria_id=datos.get("categoria"),
+        )
+        return Response(
+            {
+                "periodo": datos["periodo"],
+                "desde": datos["desde"],
+                "hasta": datos["hasta"],
+                "por": datos["por"],
+                "actualizado": analitica.ultima_actualizacion(),
+                "series": serie,
+            }
+        )
+
+@extend_schema_view(
+    list=extend_schema(parameters=[PopularesParamsSerializer], responses=OpenApiTypes.OBJECT)
+)
+class PopularesViewSet(viewsets.ViewSet):
+    """
+    Top-N de libros y categorías más prestados en un mes, leído de los
+    contadores mensuales (biblioteca.populares).
+    """
+
+    def get_permissions(self):
+        return [IsOperadorOrSupervisor()]
+
+    @lectura_en_replica
+    def list(self, request):
+        params = PopularesParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        mes = populares.inicio_de_mes(params.validated_data.get("mes") or timezone.localdate())
+        n = params.validated_data["n"]
+
+        return Response(
+            {
+                "mes": mes,
+                "libros": [
+                    {
+                        "libro": c.libro_id,
+                        "titulo": c.libro.titulo,
+                        "autor": c.libro.autor,
+                        "cantidad": c.cantidad,
+                    }
+                    for c in populares.top_libros(mes, n)
+                ],
+                "categorias": [
+                    {"categoria": c.categoria_id, "nombre": c.categoria.nombre, "cantidad": c.cantidad}
+                    for c in populares.top_categorias(mes, n)
+                ],
+            }
+        )
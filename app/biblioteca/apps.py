@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class BibliotecaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "biblioteca"
-    verbose_name = "Biblioteca"
\ No newline at end of file
+    verbose_name = "Biblioteca"
+
+    def ready(self):
+        from . import checks  # noqa: F401 (registra los system checks)
+        from . import signals  # noqa: F401 (invalida el cache de fragmentos)
@@ -0,0 +1,96 @@
+"""
+Auditoría de acciones: una línea en el log biblioteca.audit (mismo formato
+de siempre, "ACCION user=... <entidad>_id=... clave=...") y un
+EventoAuditoria consultable.
+
+Los eventos se agregan con transaction.on_commit (si la transacción se
+revierte, no queda evento) a un buffer por request, y
+AuditoriaMiddleware los escribe al final con un único bulk_create. Fuera
+de un request (comandos, shell) se escriben directamente al commit.
+"""
+import logging
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .models import EventoAuditoria
+
+logger = logging.getLogger("biblioteca.audit")
+
+# None = fuera de un request: se escribe directo
+_buffer = ContextVar("buffer_auditoria", default=None)
+
+
+def _serializable(valor):
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
+
+def auditar(usuario, accion: str, entidad: str, entidad_id=None, **datos):
+    """
+    Registra `accion` sobre `entidad` (ej. "prestamo", "libro", "categoria").
+    Los `datos` extra se loguean como clave=valor (en el orden recibido) y
+    se guardan en EventoAuditoria.datos.
+    """
+    username = usuario.username if usuario is not None and usuario.is_authenticated else ""
+
+    claves = [f"{entidad}_id", *datos]
+    logger.info(
+        f"{accion} user=%s " + " ".join(f"{clave}=%s" for clave in claves),
+        username or "-",
+        entidad_id,
+        *datos.values(),
+    )
+
+    evento = EventoAuditoria(
+        usuario=usuario if username else None,
+        usuario_nombre=username,
+        accion=accion,
+        entidad=entidad,
+        entidad_id=entidad_id,
+        datos={clave: _serializable(valor) for clave, valor in datos.items()},
+    )
+    transaction.on_commit(lambda: _encolar(evento))
+
+
+def _encolar(evento):
+    buffer = _buffer.get()
+    if buffer is None:
+        EventoAuditoria.objects.bulk_create([evento])
+    else:
+        buffer.append(evento)
+
+
+def guardar_pendientes():
+    """
+    Escribe los eventos acumulados en el request (un solo INSERT).
+    """
+    buffer = _buffer.get()
+    if not buffer:
+        return
+    eventos = buffer[:]
+    buffer.clear()
+    EventoAuditoria.objects.bulk_create(eventos)
+
+
+class AuditoriaMiddleware:
+    """
+    Abre el buffer de eventos del request y lo vuelca después de la vista.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _buffer.set([])
+        try:
+            response = self.get_response(request)
+            try:
+                guardar_pendientes()
+            except Exception:
+                # la acción ya está confirmada: no convertirla en un 500
+                logger.exception("AUDITORIA_ERROR path=%s", request.path)
+        finally:
+            _buffer.reset(token)
+        return response
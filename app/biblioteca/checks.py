@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def sesiones_con_cache_local(app_configs, **kwargs):
+    """
+    cached_db con una cache por proceso (LocMem) puede servir sesiones
+    viejas: un logout en un worker no invalida la copia de otro.
+    """
+    if settings.SESSION_ENGINE != "django.contrib.sessions.backends.cached_db":
+        return []
+    alias = getattr(settings, "SESSION_CACHE_ALIAS", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache") and not settings.DEBUG:
+        return [
+            Warning(
+                "SESSION_MODO=cached_db con una cache local por proceso.",
+                hint="Configurá CACHE_URL=redis://... para compartir las sesiones entre workers.",
+                id="biblioteca.W001",
+            )
+        ]
+    return []
+
+
+@register()
+def fragmentos_con_cache_local(app_configs, **kwargs):
+    """
+    Con LocMem cada worker guarda su copia de los fragmentos {% cache %}.
+    No sirve datos viejos (la versión está en la base, ver
+    biblioteca.fragmentos), pero cada worker los renderiza por su cuenta.
+    """
+    if settings.FRAGMENTOS_CACHE_TTL <= 0 or settings.DEBUG:
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache"):
+        return [
+            Warning(
+                "Cache de fragmentos en una cache local por proceso.",
+                hint="Configurá CACHE_URL=redis://... para compartir los fragmentos entre workers, "
+                "o FRAGMENTOS_CACHE_TTL=0.",
+                id="biblioteca.W002",
+            )
+        ]
+    return []
+
+
+@register()
+def metricas_publicas(app_configs, **kwargs):
+    """
+    /metrics sin token abierto a cualquiera (METRICAS_PUBLICAS fuera de DEBUG).
+    """
+    if (
+        settings.METRICAS_HABILITADAS
+        and settings.METRICAS_PUBLICAS
+        and not settings.METRICAS_TOKEN
+        and not settings.DEBUG
+    ):
+        return [
+            Warning(
+                "/metrics responde sin autenticación (METRICAS_PUBLICAS=1, sin METRICAS_TOKEN).",
+                hint="Definí METRICAS_TOKEN, o dejá /metrics sólo accesible desde la red interna.",
+                id="biblioteca.W003",
+            )
+        ]
+    return []
@@ -0,0 +1,152 @@
+"""
+Registro de consultas lentas con su EXPLAIN.
+
+ConsultasLentasMiddleware envuelve cada request con un execute_wrapper en
+todas las conexiones. Una query que tarda más de CONSULTAS_LENTAS_MS se
+guarda (SQL, params, vista, plan) en un buffer circular de
+CONSULTAS_LENTAS_CAPACIDAD entradas por proceso y se loguea como
+CONSULTA_LENTA en biblioteca.audit (JSON, sin bloquear).
+
+El buffer se ve en /reportes/consultas-lentas/ (sólo supervisores).
+Con CONSULTAS_LENTAS_MS=0 el middleware se desinstala solo.
+"""
+import datetime
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+
+logger = logging.getLogger("biblioteca.audit")
+
+MAX_SQL = 4000
+MAX_PARAMS = 500
+_EXPLICABLE_RE = re.compile(r"^\s*\(*\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+_request_actual = ContextVar("consultas_lentas_request", default=None)
+# evita registrar el EXPLAIN (y su savepoint) como otra consulta
+_explicando = ContextVar("consultas_lentas_explicando", default=False)
+
+_lock = threading.Lock()
+_buffer = None
+
+
+@dataclass(frozen=True)
+class ConsultaLenta:
+    cuando: datetime.datetime
+    ms: float
+    alias: str
+    vista: str
+    ruta: str
+    sql: str
+    params: str
+    plan: str
+
+
+def _buffer_actual() -> deque:
+    """
+    El buffer se arma en el primer uso, no al importar, y se rearma (con
+    las últimas entradas) si cambió CONSULTAS_LENTAS_CAPACIDAD. Llamar con
+    _lock tomado.
+    """
+    global _buffer
+    capacidad = settings.CONSULTAS_LENTAS_CAPACIDAD
+    if _buffer is None or _buffer.maxlen != capacidad:
+        _buffer = deque(_buffer or (), maxlen=capacidad)
+    return _buffer
+
+
+def registradas() -> list:
+    """Copia del buffer, de la más lenta a la más rápida."""
+    with _lock:
+        consultas = list(_buffer_actual())
+    return sorted(consultas, key=lambda c: c.ms, reverse=True)
+
+
+def limpiar() -> None:
+    with _lock:
+        _buffer_actual().clear()
+
+
+def _truncar(texto: str, maximo: int) -> str:
+    return texto if len(texto) <= maximo else texto[: maximo - 1] + "…"
+
+
+def explicar(connection, sql, params) -> str:
+    """
+    EXPLAIN de la query (sólo SELECT / WITH: el resto puede tener efectos).
+    Corre en un savepoint: en PostgreSQL un EXPLAIN que falla no deja la
+    transacción del request abortada.
+    """
+    if not _EXPLICABLE_RE.match(sql):
+        return ""
+    token = _explicando.set(True)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            filas = cursor.fetchall()
+    except Exception as exc:
+        return f"(EXPLAIN falló: {type(exc).__name__}: {exc})"
+    finally:
+        _explicando.reset(token)
+    return "\n".join(" | ".join(str(valor) for valor in fila) for fila in filas)
+
+
+def _registrar_si_lenta(execute, sql, params, many, context):
+    if _explicando.get():
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    resultado = execute(sql, params, many, context)
+    ms = (time.perf_counter() - inicio) * 1000
+    if ms < settings.CONSULTAS_LENTAS_MS:
+        return resultado
+
+    connection = context["connection"]
+    request = _request_actual.get()
+    match = getattr(request, "resolver_match", None)
+    consulta = ConsultaLenta(
+        cuando=datetime.datetime.now(datetime.timezone.utc),
+        ms=round(ms, 1),
+        alias=connection.alias,
+        vista=match.view_name if match else "-",
+        ruta=request.path if request is not None else "-",
+        sql=_truncar(sql, MAX_SQL),
+        params=_truncar(repr(params), MAX_PARAMS),
+        plan="" if many else explicar(connection, sql, params),
+    )
+    with _lock:
+        _buffer_actual().append(consulta)
+    logger.warning(
+        "CONSULTA_LENTA alias=%s vista=%s ms=%s sql=%s params=%s plan=%s",
+        consulta.alias,
+        consulta.vista,
+        consulta.ms,
+        consulta.sql,
+        consulta.params,
+        consulta.plan,
+    )
+    return resultado
+
+
+class ConsultasLentasMiddleware:
+    def __init__(self, get_response):
+        if settings.CONSULTAS_LENTAS_MS <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_actual.set(request)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_registrar_si_lenta))
+                return self.get_response(request)
+        finally:
+            _request_actual.reset(token)
@@ -1,13 +1,60 @@
 from django import forms
+from django.urls import reverse
 from .models import Prestamo, UsuarioLector, CategoriaLibro, Libro
 
 
+class AutocompleteWidget(forms.Widget):
+    """
+    Reemplazo de <select> para tablas grandes: un input oculto con el id y
+    un buscador que consulta `url` (?q=...) a medida que se tipea. No
+    recorre el queryset del campo; sólo busca el objeto elegido para
+    mostrar su texto al re-renderizar el form.
+    """
+    template_name = "biblioteca/widgets/autocomplete.html"
+
+    class Media:
+        js = ["biblioteca/autocomplete.js"]
+
+    def __init__(self, url, placeholder="", minimo=2, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.placeholder = placeholder
+        self.minimo = minimo
+
+    def id_for_label(self, id_):
+        # el <label> apunta al buscador visible, no al input oculto
+        return f"{id_}_texto" if id_ else id_
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"].update(
+            url=reverse(self.url),
+            placeholder=self.placeholder,
+            minimo=self.minimo,
+            texto=self._texto(value),
+        )
+        return context
+
+    def _texto(self, value):
+        if value in (None, ""):
+            return ""
+        # ModelChoiceField le asigna .choices; el queryset es el del campo
+        try:
+            obj = self.choices.queryset.filter(pk=value).first()
+        except (ValueError, TypeError):
+            return ""
+        return str(obj) if obj is not None else ""
+
+
 class PrestamoForm(forms.ModelForm):
-    # 👇 lector explícito y NO requerido ⇒ el <select> ya no tiene "required"
+    # 👇 lector explícito y NO requerido ⇒ el buscador ya no tiene "required"
     lector = forms.ModelChoiceField(
         queryset=UsuarioLector.objects.filter(activo=True),
         required=False,
         label="Lector",
+        widget=AutocompleteWidget(
+            "biblioteca:buscar_lectores", placeholder="Apellido, nombre o DNI"
+        ),
     )
 
     # extras para crear lector en el mismo formulario
@@ -39,6 +86,10 @@ class PrestamoForm(forms.ModelForm):
             "comentarios",
         ]
         widgets = {
+            # sólo ofrece libros con ejemplares disponibles (ver buscar_libros)
+            "libro": AutocompleteWidget(
+                "biblioteca:buscar_libros", placeholder="Título o autor"
+            ),
             "fecha_prestamo": forms.DateInput(attrs={"type": "date"}),
             "fecha_devolucion_estimada": forms.DateInput(attrs={"type": "date"}),
         }
@@ -83,4 +134,4 @@ class LibroForm(forms.ModelForm):
             "categoria",
             "ejemplares_totales",
             "ejemplares_disponibles",
-        ]
\ No newline at end of file
+        ]
\ No newline at end of file
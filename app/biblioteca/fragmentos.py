@@ -0,0 +1,79 @@
+"""
+Versiones de datos para el cache de fragmentos de template.
+
+Los {% cache %} de home, libros y categorías incluyen en la clave la
+versión del área que muestran (además de rol, página y filtros). Las
+escrituras sobre libros, categorías y lectores incrementan la versión
+(ver signals.py) cuando confirman (transaction.on_commit), así que esos
+fragmentos no se sirven después de un cambio: la clave nueva no existe y
+se vuelve a renderizar. Los fragmentos viejos expiran solos
+(FRAGMENTOS_CACHE_TTL).
+
+Home es un resumen de préstamos: cambia con cada préstamo, devolución o
+robo, y invalidarlo en cada uno lo dejaría casi sin aciertos. Los
+préstamos no lo invalidan; en cambio vive FRAGMENTOS_HOME_TTL segundos.
+
+Las versiones van en la base (VersionFragmento), no en la cache: con
+CACHE_URL=locmem:// cada proceso tiene su propia cache y un incremento
+hecho en un worker o en un comando no llegaría a los demás. Cuesta una
+lectura por clave primaria por página y un UPDATE por escritura
+confirmada.
+
+Las escrituras masivas que no pasan por save() (archivar_prestamos,
+seed_demo_data, reconstruir_populares) llaman a incrementar() a mano.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import VersionFragmento
+
+AREAS = ("home", "libros", "categorias")
+
+
+def _nueva() -> int:
+    # una fila recreada (ej. tabla vaciada) no choca con versiones anteriores
+    return time.time_ns() // 1000
+
+
+def version(area: str) -> int:
+    # sólo lee: renderizar una página no escribe en la base (0 = nunca incrementada)
+    return VersionFragmento.objects.filter(area=area).values_list("version", flat=True).first() or 0
+
+
+def incrementar(*areas: str) -> None:
+    """
+    Incrementa al confirmar la transacción en curso (en autocommit, ya):
+    un rollback no invalida nada, y un request que lee entre la escritura
+    y el commit no cachea datos viejos con la versión nueva.
+    """
+    areas = areas or AREAS
+    transaction.on_commit(lambda: _incrementar(areas))
+
+
+def _incrementar(areas) -> None:
+    filas = VersionFragmento.objects.filter(area__in=areas)
+    if filas.update(version=F("version") + 1) < len(areas):
+        # primera vez: crea las que faltan (y vuelve a incrementar por si otro
+        # proceso las creó en el medio)
+        VersionFragmento.objects.bulk_create(
+            [VersionFragmento(area=area, version=_nueva()) for area in areas],
+            ignore_conflicts=True,
+        )
+        filas.update(version=F("version") + 1)
+
+
+def contexto(area: str) -> dict:
+    """
+    Variables que usan los {% cache %} de los templates.
+    """
+    ttl = settings.FRAGMENTOS_CACHE_TTL
+    if area == "home":
+        ttl = min(ttl, settings.FRAGMENTOS_HOME_TTL)
+    return {
+        "fragmento_ttl": ttl,
+        # sin cache de fragmentos la versión no se usa: no se lee
+        "fragmento_version": version(area) if ttl else 0,
+    }
@@ -0,0 +1,152 @@
+"""
+Medición por request: cantidad y tiempo de SQL, tiempo de templates y
+tiempo total de la vista. Se expone como header Server-Timing y en una
+línea del log biblioteca.audit.
+
+Se activa con INSTRUMENTACION_HABILITADA (env INSTRUMENTACION=1). Apagado,
+el middleware se desinstala solo (MiddlewareNotUsed) y no cuesta nada.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger("biblioteca.audit")
+
+
+@dataclass
+class Medicion:
+    queries: int = 0
+    sql_s: float = 0.0
+    template_s: float = 0.0
+    inicio: float = field(default_factory=time.perf_counter)
+
+    @property
+    def total_s(self) -> float:
+        return time.perf_counter() - self.inicio
+
+
+_medicion_actual = ContextVar("medicion_actual", default=None)
+
+
+def medicion_actual():
+    """
+    La Medicion del request en curso, o None si no se está midiendo.
+    """
+    return _medicion_actual.get()
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.queries += 1
+        medicion.sql_s += time.perf_counter() - inicio
+
+
+@contextmanager
+def medir():
+    """
+    Mide el bloque (todas las conexiones configuradas). Si ya hay una
+    medición en curso, la reutiliza en vez de contar dos veces.
+    """
+    existente = _medicion_actual.get()
+    if existente is not None:
+        yield existente
+        return
+
+    medicion = Medicion()
+    token = _medicion_actual.set(medicion)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(_medir_sql))
+            yield medicion
+    finally:
+        _medicion_actual.reset(token)
+
+
+class _TemplateMedido:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return self._template.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            medicion.template_s += time.perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """
+    Backend de templates que suma el tiempo de render a la Medicion actual.
+    Los {% include %} / {% extends %} quedan dentro del render de nivel superior.
+    """
+
+    def from_string(self, template_code):
+        return _TemplateMedido(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TemplateMedido(super().get_template(template_name))
+
+
+def _ms(segundos: float) -> float:
+    return round(segundos * 1000, 1)
+
+
+class InstrumentacionMiddleware:
+    """
+    Va antes de sesión/auth en MIDDLEWARE para que el total los incluya.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACION_HABILITADA:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with medir() as medicion:
+            response = self.get_response(request)
+            total_s = medicion.total_s
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={_ms(medicion.sql_s)};desc="{medicion.queries} queries"',
+                f"tpl;dur={_ms(medicion.template_s)}",
+                f"total;dur={_ms(total_s)}",
+            ]
+        )
+
+        match = getattr(request, "resolver_match", None)
+        user = getattr(request, "user", None)
+        logger.info(
+            "REQUEST method=%s path=%s view=%s status=%s user=%s "
+            "queries=%s sql_ms=%s tpl_ms=%s total_ms=%s",
+            request.method,
+            request.path,
+            match.view_name if match else "-",
+            response.status_code,
+            user.username if user is not None and user.is_authenticated else "-",
+            medicion.queries,
+            _ms(medicion.sql_s),
+            _ms(medicion.template_s),
+            _ms(total_s),
+        )
+        return response
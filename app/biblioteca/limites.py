@@ -0,0 +1,84 @@
+"""
+Límite de tasa por usuario con token bucket en la cache compartida.
+
+Cada (alcance, usuario) tiene un balde de `N` fichas que se rellena a N por
+período ("10/min" = 10 fichas, una cada 6 s): se permiten ráfagas de hasta
+N requests y después el ritmo sostenido. Los alcances y tasas son los de
+REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], así la API (api/throttling.py) y
+las vistas HTML (`@limitar`) comparten el mismo balde.
+
+La lectura y escritura del balde no son atómicas: con varios workers puede
+colarse algún request de más en una ráfaga, a cambio de no bloquear.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+PERIODOS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def leer_tasa(tasa: str) -> tuple:
+    """
+    "10/min" -> (capacidad=10, fichas por segundo=10/60). None = sin límite.
+    """
+    if not tasa:
+        return None
+    cantidad, periodo = tasa.split("/")
+    return int(cantidad), int(cantidad) / PERIODOS[periodo[0]]
+
+
+def tasa_de(alcance: str):
+    tasas = settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+    return leer_tasa(tasas.get(alcance))
+
+
+def consumir(alcance: str, ident, tasa=None) -> float:
+    """
+    Saca una ficha del balde. Devuelve 0 si el request pasa, o los segundos
+    que faltan para la próxima ficha.
+    """
+    tasa = tasa if tasa is not None else tasa_de(alcance)
+    if tasa is None:
+        return 0
+    capacidad, por_segundo = tasa
+    clave = f"limite:{alcance}:{ident}"
+    ahora = time.time()
+
+    fichas, ultimo = cache.get(clave, (capacidad, ahora))
+    fichas = min(capacidad, fichas + (ahora - ultimo) * por_segundo)
+    espera = 0
+    if fichas >= 1:
+        fichas -= 1
+    else:
+        espera = (1 - fichas) / por_segundo
+    # pasado el tiempo de rellenado completo el balde está lleno: se puede olvidar
+    cache.set(clave, (fichas, ahora), math.ceil(capacidad / por_segundo) + 1)
+    return espera
+
+
+def identificar(request) -> str:
+    if request.user.is_authenticated:
+        return f"u{request.user.pk}"
+    return "ip" + request.META.get("REMOTE_ADDR", "")
+
+
+def limitar(alcance: str):
+    """
+    Decorador de vistas HTML: pasado el límite responde 429 con Retry-After.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            espera = consumir(alcance, identificar(request))
+            if espera:
+                segundos = math.ceil(espera)
+                response = render(request, "429.html", {"segundos": segundos}, status=429)
+                response["Retry-After"] = str(segundos)
+                return response
+            return view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
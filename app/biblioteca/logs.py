@@ -0,0 +1,181 @@
+"""
+Logging de auditoría sin bloquear el request.
+
+- `ColaAcotadaHandler`: QueueHandler con cola de tamaño fijo y su propio
+  QueueListener. El request sólo formatea y encola; la escritura a
+  stdout/disco la hace el hilo del listener.
+- Cuando la cola está llena se aplica `politica`:
+    - "descartar_nuevos": se pierde el registro que llega (default),
+    - "descartar_viejos": se saca el más viejo de la cola para hacer lugar,
+    - "bloquear": espera hasta `espera_max` segundos y, si sigue llena, descarta.
+  Los descartes se cuentan y se informan con un registro AUDIT_LOG_DESCARTADOS
+  en cuanto vuelve a haber lugar.
+- `JsonFormatter`: una línea JSON por registro. Los mensajes con formato
+  "EVENTO clave=%s clave=%s" se separan en campos (`evento` y cada clave).
+
+El listener se arma a mano (no con las claves "listener"/"handlers" de
+dictConfig) para funcionar igual en Python 3.11 y 3.12. Su hilo arranca con
+el primer registro de cada proceso, no al configurar el logging: con
+`gunicorn --preload` el master configura y después hace fork, y los hilos no
+pasan a los workers.
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+POLITICAS = ("descartar_nuevos", "descartar_viejos", "bloquear")
+
+_CLAVE_RE = re.compile(r"(\w+)=%[sdrf]")
+_EVENTO_RE = re.compile(r"^([A-Z][A-Z0-9_]+)\b")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        datos = {
+            "ts": datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc)
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+
+        if isinstance(record.msg, str):
+            evento = _EVENTO_RE.match(record.msg)
+            if evento:
+                datos["evento"] = evento.group(1)
+            args = record.args if isinstance(record.args, tuple) else ()
+            claves = _CLAVE_RE.findall(record.msg)
+            if claves and len(claves) == len(args):
+                for clave, valor in zip(claves, args):
+                    if not (valor is None or isinstance(valor, (int, float, bool))):
+                        valor = str(valor)
+                    datos[clave] = valor
+
+        datos["msg"] = record.getMessage()
+        if record.exc_info:
+            datos["exc"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # con la cola llena put_nowait fallaría: se espera a que haya lugar
+        self.queue.put(self._sentinel)
+
+
+class ColaAcotadaHandler(QueueHandler):
+    """
+    Ver docstring del módulo. Se configura desde LOGGING con "()":
+
+        "audit": {
+            "()": "biblioteca.logs.ColaAcotadaHandler",
+            "capacidad": 10000,
+            "politica": "descartar_nuevos",
+            "formatter": "json",
+        }
+    """
+
+    def __init__(self, capacidad=10000, politica="descartar_nuevos", espera_max=0.5, destino=None):
+        if politica not in POLITICAS:
+            raise ValueError(f"politica debe ser una de {POLITICAS}, no {politica!r}")
+        super().__init__(queue.Queue(maxsize=capacidad))
+        self.politica = politica
+        self.espera_max = espera_max
+        self.descartados = 0
+        self._pendientes = 0
+        self._lock_descartes = threading.Lock()
+
+        # el registro ya llega formateado (prepare()): el destino sólo escribe el texto
+        self.destino = destino or logging.StreamHandler(sys.stdout)
+        self.destino.setFormatter(logging.Formatter("%(message)s"))
+        self.listener = None
+        self._pid = None
+        self._cerrado = False
+        self._lock_listener = threading.Lock()
+        atexit.register(self.close)
+
+    def _arrancar_listener(self):
+        """
+        Arranca el listener en este proceso. En un hijo (fork) la cola y los
+        contadores copiados del padre son del padre: se empieza de cero.
+        """
+        with self._lock_listener:
+            if self._pid == os.getpid() or self._cerrado:
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self.descartados = self._pendientes = 0
+            self.listener = _Listener(self.queue, self.destino, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._arrancar_listener()
+        self._informar_descartes()
+        if not self._encolar(record):
+            with self._lock_descartes:
+                self.descartados += 1
+                self._pendientes += 1
+
+    def _encolar(self, record) -> bool:
+        try:
+            if self.politica == "bloquear":
+                self.queue.put(record, timeout=self.espera_max)
+            else:
+                self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            pass
+
+        if self.politica == "descartar_viejos":
+            try:
+                self.queue.get_nowait()
+                # nadie lo va a procesar: sin esto queue.join() no termina
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                return False
+            # se perdió el más viejo
+            with self._lock_descartes:
+                self.descartados += 1
+                self._pendientes += 1
+            return True
+        return False
+
+    def _informar_descartes(self):
+        if not self._pendientes or self.queue.full():
+            return
+        with self._lock_descartes:
+            pendientes, self._pendientes = self._pendientes, 0
+        if not pendientes:
+            return
+        aviso = logging.LogRecord(
+            "biblioteca.logs", logging.WARNING, __file__, 0,
+            "AUDIT_LOG_DESCARTADOS cantidad=%s total=%s",
+            (pendientes, self.descartados), None,
+        )
+        try:
+            self.queue.put_nowait(self.prepare(aviso))
+        except queue.Full:
+            with self._lock_descartes:
+                self._pendientes += pendientes
+
+    def close(self):
+        # vacía lo que quede en la cola antes de cerrar (sólo el proceso que
+        # arrancó el listener: en un hijo sin registros no hay hilo)
+        with self._lock_listener:
+            self._cerrado = True
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+                self.listener = None
+        super().close()
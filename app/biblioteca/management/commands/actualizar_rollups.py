@@ -0,0 +1,49 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca import analitica
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza el rollup diario de préstamos (RollupPrestamoDiario) que usa "
+        "/api/analitica/prestamos/. Por defecto es incremental: pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde",
+            help="Recalcula desde esta fecha (YYYY-MM-DD) en adelante.",
+        )
+        parser.add_argument(
+            "--completo",
+            action="store_true",
+            help="Recalcula todo el rollup.",
+        )
+
+    def handle(self, *args, **options):
+        if options["desde"] and options["completo"]:
+            raise CommandError("Usar --desde o --completo, no los dos.")
+
+        inicio = time.monotonic()
+        if options["completo"]:
+            filas = analitica.recalcular_rollups()
+            detalle = "completo"
+        elif options["desde"]:
+            try:
+                desde = datetime.date.fromisoformat(options["desde"])
+            except ValueError:
+                raise CommandError("--desde debe tener formato YYYY-MM-DD.")
+            filas = analitica.recalcular_rollups(desde)
+            detalle = f"desde {desde}"
+        else:
+            filas, dias = analitica.actualizar_rollups()
+            detalle = f"incremental, {dias} días anteriores con préstamos activos"
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rollup actualizado ({detalle}): {filas} filas en {time.monotonic() - inicio:.1f}s."
+            )
+        )
@@ -0,0 +1,119 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from biblioteca import fragmentos
+from biblioteca.models import Prestamo, PrestamoArchivado
+
+CAMPOS = [
+    "id",
+    "libro_id",
+    "lector_id",
+    "fecha_prestamo",
+    "fecha_devolucion_estimada",
+    "fecha_devolucion_real",
+    "estado",
+    "comentarios",
+    "creado_por_id",
+]
+
+
+def restar_meses(fecha: datetime.date, meses: int) -> datetime.date:
+    anio, mes = divmod(fecha.year * 12 + (fecha.month - 1) - meses, 12)
+    mes += 1
+    # 31/03 - 1 mes -> 28/02 (o 29)
+    dia = fecha.day
+    while True:
+        try:
+            return datetime.date(anio, mes, dia)
+        except ValueError:
+            dia -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve préstamos cerrados (DEVUELTO / ROBADO) con fecha_prestamo "
+        "anterior a N meses desde Prestamo a PrestamoArchivado, en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=12,
+            help="Antigüedad mínima (en meses) de la fecha de préstamo. Default: 12.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Cantidad de préstamos por lote (una transacción por lote). Default: 1000.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Sólo informa cuántos préstamos se archivarían.",
+        )
+
+    def handle(self, *args, **options):
+        meses = options["meses"]
+        batch_size = options["batch_size"]
+        if meses < 1:
+            raise CommandError("--meses debe ser >= 1.")
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser >= 1.")
+
+        corte = restar_meses(timezone.localdate(), meses)
+        candidatos = Prestamo.objects.filter(
+            estado__in=Prestamo.ESTADOS_CERRADOS,
+            fecha_prestamo__lt=corte,
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Se archivarían {candidatos.count()} préstamos anteriores a {corte}."
+            )
+            return
+
+        self.stdout.write(
+            self.style.WARNING(f"Archivando préstamos cerrados anteriores a {corte}...")
+        )
+
+        inicio = time.monotonic()
+        total = 0
+        ultimo_id = 0
+        while True:
+            with transaction.atomic():
+                # recorremos por id para que cada lote sea un range scan
+                lote = list(
+                    candidatos.filter(id__gt=ultimo_id)
+                    .order_by("id")
+                    .values(*CAMPOS)[:batch_size]
+                )
+                if not lote:
+                    break
+
+                ahora = timezone.now()
+                PrestamoArchivado.objects.bulk_create(
+                    [PrestamoArchivado(fecha_archivado=ahora, **row) for row in lote]
+                )
+                ids = [row["id"] for row in lote]
+                Prestamo.objects.filter(id__in=ids).delete()
+
+            ultimo_id = ids[-1]
+            total += len(lote)
+            self.stdout.write(f"  lote de {len(lote)} (total {total})")
+
+        if total:
+            # el DELETE por lotes no dispara señales: el resumen de home cambió
+            fragmentos.incrementar("home")
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archivados {total} préstamos en {duracion:.1f}s."
+            )
+        )
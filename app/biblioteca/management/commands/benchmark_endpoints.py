@@ -0,0 +1,249 @@
+import datetime
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from biblioteca.models import Libro, Prestamo, UsuarioLector
+
+BASELINE_DEFAULT = settings.BASE_DIR / "benchmarks" / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), cantidad de queries y pico de memoria de "
+        "los endpoints principales contra la base actual (usar después de "
+        "seed_demo_data --scale). Compara contra un baseline JSON y falla si "
+        "algún endpoint empeora más allá de la tolerancia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iteraciones",
+            type=int,
+            default=30,
+            help="Requests medidos por endpoint. Default: 30.",
+        )
+        parser.add_argument(
+            "--calentamiento",
+            type=int,
+            default=3,
+            help="Requests previos (no medidos) por endpoint. Default: 3.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(BASELINE_DEFAULT),
+            help=f"Archivo JSON de baseline. Default: {BASELINE_DEFAULT}.",
+        )
+        parser.add_argument(
+            "--guardar-baseline",
+            action="store_true",
+            help="Guarda los resultados como nuevo baseline en vez de comparar.",
+        )
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=0.25,
+            help="Empeoramiento permitido de p95 y memoria (0.25 = +25%%). Default: 0.25.",
+        )
+        parser.add_argument(
+            "--usuario",
+            default="supervisor",
+            help="Usuario (supervisor) con el que se hacen los requests. Default: supervisor.",
+        )
+        parser.add_argument(
+            "--dias-reporte",
+            type=int,
+            default=30,
+            help="Rango (en días hacia atrás) de los filtros de reporte. Default: 30.",
+        )
+        parser.add_argument(
+            "--q",
+            default="Mar",
+            help="Término de búsqueda para /api/libros/?q=. Default: Mar.",
+        )
+        parser.add_argument(
+            "--solo",
+            nargs="*",
+            help="Nombres de endpoints a medir (default: todos).",
+        )
+
+    # ---------- endpoints ----------
+
+    def _endpoints(self, options):
+        """
+        [(nombre, método, url, data)] de los caminos críticos.
+        Los POST se ejecutan dentro de una transacción que se descarta.
+        """
+        libro = Libro.objects.filter(activo=True, ejemplares_disponibles__gt=0).first()
+        lector = (
+            UsuarioLector.objects.filter(activo=True)
+            .exclude(prestamos__estado=Prestamo.Estados.ATRASADO)
+            .first()
+        )
+        prestamo = Prestamo.objects.filter(estado=Prestamo.Estados.PRESTADO).first()
+        if not (libro and lector and prestamo):
+            raise CommandError(
+                "No hay datos suficientes: corré antes seed_demo_data (idealmente con --scale)."
+            )
+
+        hoy = timezone.localdate()
+        filtros_reporte = {
+            "fecha_desde": (hoy - datetime.timedelta(days=options["dias_reporte"])).isoformat()
+        }
+        return [
+            ("listar_prestamos", "get", reverse("biblioteca:prestamo_list"), None),
+            ("libros_buscar", "get", reverse("libro-list"), {"q": options["q"]}),
+            (
+                "prestamo_crear",
+                "post",
+                reverse("prestamo-list"),
+                {
+                    "libro_id": libro.pk,
+                    "lector_id": lector.pk,
+                    "fecha_prestamo": hoy.isoformat(),
+                    "fecha_devolucion_estimada": (hoy + datetime.timedelta(days=14)).isoformat(),
+                },
+            ),
+            ("prestamo_devolver", "post", reverse("prestamo-devolver", args=[prestamo.pk]), None),
+            ("dashboard", "get", reverse("prestamo-dashboard"), None),
+            ("reporte", "get", reverse("prestamo-reporte"), filtros_reporte),
+            ("reporte_csv", "get", reverse("prestamo-reporte-csv"), filtros_reporte),
+        ]
+
+    def _request(self, client, metodo, url, data):
+        if metodo == "get":
+            response = client.get(url, data)
+        else:
+            # los POST no deben ensuciar el dataset de benchmark
+            with transaction.atomic():
+                response = client.post(url, data, content_type="application/json")
+                transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(f"{metodo.upper()} {url} devolvió {response.status_code}")
+        # fuerza el contenido (ej. CSV) como lo haría el servidor
+        response.content
+        return response
+
+    def _medir(self, client, metodo, url, data, options):
+        for _ in range(options["calentamiento"]):
+            self._request(client, metodo, url, data)
+
+        latencias = []
+        queries = []
+        for _ in range(options["iteraciones"]):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                self._request(client, metodo, url, data)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            queries.append(len(ctx.captured_queries))
+
+        # la memoria se mide aparte: tracemalloc distorsiona la latencia
+        tracemalloc.start()
+        try:
+            self._request(client, metodo, url, data)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(latencias, n=100, method="inclusive")
+        return {
+            "p50_ms": round(percentiles[49], 2),
+            "p95_ms": round(percentiles[94], 2),
+            "p99_ms": round(percentiles[98], 2),
+            "queries": max(queries),
+            "pico_memoria_kb": round(pico / 1024, 1),
+        }
+
+    # ---------- comparación ----------
+
+    def _regresiones(self, resultados, baseline, tolerancia):
+        regresiones = []
+        for nombre, actual in resultados.items():
+            previo = baseline.get(nombre)
+            if previo is None:
+                continue
+            if actual["p95_ms"] > previo["p95_ms"] * (1 + tolerancia):
+                regresiones.append(
+                    f"{nombre}: p95 {previo['p95_ms']}ms -> {actual['p95_ms']}ms"
+                )
+            if actual["queries"] > previo["queries"]:
+                regresiones.append(
+                    f"{nombre}: queries {previo['queries']} -> {actual['queries']}"
+                )
+            if actual["pico_memoria_kb"] > previo["pico_memoria_kb"] * (1 + tolerancia):
+                regresiones.append(
+                    f"{nombre}: memoria {previo['pico_memoria_kb']}KB -> {actual['pico_memoria_kb']}KB"
+                )
+        return regresiones
+
+    def handle(self, *args, **options):
+        if options["iteraciones"] < 2:
+            raise CommandError("--iteraciones debe ser >= 2 para calcular percentiles.")
+
+        User = get_user_model()
+        try:
+            usuario = User.objects.get(username=options["usuario"])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}.")
+
+        client = Client()
+        client.force_login(usuario)
+
+        endpoints = self._endpoints(options)
+        if options["solo"]:
+            endpoints = [e for e in endpoints if e[0] in options["solo"]]
+
+        resultados = {}
+        self.stdout.write(
+            f"{'endpoint':<20} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'mem KB':>10}"
+        )
+        # se mide el endpoint, no el límite de tasa (biblioteca.limites)
+        sin_limites = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+        with override_settings(REST_FRAMEWORK=sin_limites):
+            for nombre, metodo, url, data in endpoints:
+                r = self._medir(client, metodo, url, data, options)
+                resultados[nombre] = r
+                self.stdout.write(
+                    f"{nombre:<20} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+                    f"{r['p99_ms']:>7.1f}ms {r['queries']:>8} {r['pico_memoria_kb']:>10.1f}"
+                )
+
+        ruta = Path(options["baseline"])
+        if options["guardar_baseline"]:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            contenido = {
+                "generado": timezone.now().isoformat(),
+                "base_de_datos": connection.vendor,
+                "iteraciones": options["iteraciones"],
+                "endpoints": resultados,
+            }
+            ruta.write_text(json.dumps(contenido, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {ruta}."))
+            return
+
+        if not ruta.exists():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"No hay baseline en {ruta}; usá --guardar-baseline para crearlo."
+                )
+            )
+            return
+
+        baseline = json.loads(ruta.read_text())["endpoints"]
+        regresiones = self._regresiones(resultados, baseline, options["tolerancia"])
+        if regresiones:
+            raise CommandError(
+                "Regresiones respecto del baseline:\n  " + "\n  ".join(regresiones)
+            )
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto del baseline."))
@@ -0,0 +1,62 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from biblioteca.models import TokenAPI
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea un token de API (header 'Authorization: Token <clave>') para un "
+        "usuario. La clave se muestra una sola vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", required=True, help="Username dueño del token.")
+        parser.add_argument(
+            "--alcance",
+            action="append",
+            choices=TokenAPI.Alcances.values,
+            required=True,
+            help="Rol con el que actúa el token (repetible).",
+        )
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=90,
+            help="Días de validez. Default: 90.",
+        )
+        parser.add_argument("--nombre", default="", help="Descripción (ej. 'kiosco entrada').")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            usuario = User.objects.get(username=options["usuario"])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}.")
+        if not usuario.is_active:
+            raise CommandError(f"El usuario {usuario.username!r} está inactivo.")
+        if options["dias"] < 1:
+            raise CommandError("--dias debe ser >= 1.")
+
+        # el token no puede tener más permisos que su dueño
+        if not usuario.is_superuser:
+            grupos = set(usuario.groups.values_list("name", flat=True))
+            sobrantes = [a for a in options["alcance"] if TokenAPI.GRUPOS[a] not in grupos]
+            if sobrantes:
+                raise CommandError(
+                    f"{usuario.username!r} no tiene el rol de: {', '.join(sobrantes)}."
+                )
+
+        expira = timezone.now() + datetime.timedelta(days=options["dias"])
+        token, clave = TokenAPI.generar(
+            usuario,
+            nombre=options["nombre"] or f"token de {usuario.username}",
+            alcances=options["alcance"],
+            expira=expira,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Token #{token.id} creado, vence {expira:%Y-%m-%d}."))
+        self.stdout.write("Clave (no se vuelve a mostrar):")
+        self.stdout.write(clave)
@@ -0,0 +1,68 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones vencidas de la tabla de sesiones en lotes "
+        "(a diferencia de clearsessions, que hace un único DELETE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Sesiones borradas por lote. Default: 5000.",
+        )
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0,
+            help="Segundos de espera entre lotes (para no competir con el tráfico). Default: 0.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Sólo informa cuántas sesiones vencidas hay.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser >= 1.")
+
+        engine = import_module(settings.SESSION_ENGINE)
+        get_model = getattr(engine.SessionStore, "get_model_class", None)
+        if get_model is None:
+            # signed_cookies (o cache pura): no hay tabla que limpiar
+            self.stdout.write(f"{settings.SESSION_ENGINE} no guarda sesiones en la base.")
+            return
+
+        Session = get_model()
+        vencidas = Session.objects.filter(expire_date__lt=timezone.now())
+
+        if options["dry_run"]:
+            self.stdout.write(f"Hay {vencidas.count()} sesiones vencidas.")
+            return
+
+        inicio = time.monotonic()
+        total = 0
+        while True:
+            claves = list(vencidas.values_list("session_key", flat=True)[:batch_size])
+            if not claves:
+                break
+            Session.objects.filter(session_key__in=claves).delete()
+            total += len(claves)
+            self.stdout.write(f"  lote de {len(claves)} (total {total})")
+            if options["pausa"]:
+                time.sleep(options["pausa"])
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(f"Borradas {total} sesiones vencidas en {duracion:.1f}s.")
+        )
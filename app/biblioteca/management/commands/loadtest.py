@@ -0,0 +1,343 @@
+import datetime
+import json
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from biblioteca.models import Libro, Prestamo, UsuarioLector
+
+# Mezcla de operaciones de mostrador (peso relativo)
+MEZCLA = {
+    "login": 5,
+    "buscar_catalogo": 45,
+    "checkout": 20,
+    "devolucion": 20,
+    "reporte": 10,
+}
+
+TERMINOS_BUSQUEDA = ["Mar", "Sombra", "Río", "Noche", "Isla", "Orwell", "Tolkien", "Code"]
+
+
+class _SilenciosoHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _Sesion:
+    """
+    Cliente HTTP con cookies propias (un operador o supervisor logueado).
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def _csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, metodo, path, data=None, json_body=None):
+        headers = {"Accept": "application/json"}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        elif data is not None:
+            body = urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if metodo != "GET":
+            headers["X-CSRFToken"] = self._csrf()
+            headers["Referer"] = self.base_url + "/"
+
+        req = Request(self.base_url + path, data=body, headers=headers, method=metodo)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except HTTPError as exc:
+            return exc.code, exc.read()
+
+    def login(self, username, password):
+        self.request("GET", "/login/")
+        status, _ = self.request(
+            "POST",
+            "/login/",
+            data={
+                "username": username,
+                "password": password,
+                "csrfmiddlewaretoken": self._csrf(),
+            },
+        )
+        # login OK => redirect (seguido por urllib) a home con 200
+        if status != 200 or not any(c.name == "sessionid" for c in self.cookies):
+            raise RuntimeError(f"login de {username} falló (status {status})")
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga end-to-end: operadores concurrentes con una mezcla de "
+        "logins, búsquedas, checkouts, devoluciones y reportes. Informa "
+        "throughput y tasa de errores (incluidos 'database is locked') a medida "
+        "que sube la concurrencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help=(
+                "URL base de un servidor ya levantado (misma base de datos), sin "
+                "límites de tasa (THROTTLE_LECTURA= THROTTLE_ESCRITURA= THROTTLE_REPORTE=). "
+                "Sin --url se levanta la app WSGI en un puerto local, en este proceso."
+            ),
+        )
+        parser.add_argument(
+            "--concurrencia",
+            default="1,2,4,8,16",
+            help="Escalones de concurrencia separados por coma. Default: 1,2,4,8,16.",
+        )
+        parser.add_argument(
+            "--duracion",
+            type=float,
+            default=10,
+            help="Segundos por escalón. Default: 10.",
+        )
+        parser.add_argument("--operador", default="operador:operador123", help="usuario:clave")
+        parser.add_argument("--supervisor", default="supervisor:supervisor123", help="usuario:clave")
+        parser.add_argument("--timeout", type=float, default=30, help="Timeout HTTP en segundos.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    # ---------- servidor in-process ----------
+
+    def _levantar_servidor(self):
+        httpd = ThreadedWSGIServer(("127.0.0.1", 0), _SilenciosoHandler)
+        httpd.set_app(get_wsgi_application())
+        hilo = threading.Thread(target=httpd.serve_forever, daemon=True)
+        hilo.start()
+        host, port = httpd.server_address[:2]
+        return httpd, f"http://{host}:{port}"
+
+    def _on_excepcion(self, sender, request=None, **kwargs):
+        exc = sys.exc_info()[1]
+        if exc is None:
+            return
+        with self._lock:
+            self._excepciones[type(exc).__name__] += 1
+            if "locked" in str(exc).lower():
+                self._locks += 1
+
+    # ---------- operaciones ----------
+
+    def _operacion(self, nombre, sesion, rng):
+        hoy = timezone.localdate()
+        if nombre == "login":
+            usuario, clave = self._credenciales["operador"]
+            nueva = _Sesion(self.base_url, self.timeout)
+            nueva.login(usuario, clave)
+            return 200
+        if nombre == "buscar_catalogo":
+            q = rng.choice(TERMINOS_BUSQUEDA)
+            return sesion["operador"].request("GET", f"/api/libros/?{urlencode({'q': q})}")[0]
+        if nombre == "checkout":
+            status, body = sesion["operador"].request(
+                "POST",
+                "/api/prestamos/",
+                json_body={
+                    "libro_id": rng.choice(self._libros),
+                    "lector_id": rng.choice(self._lectores),
+                    "fecha_prestamo": hoy.isoformat(),
+                    "fecha_devolucion_estimada": (hoy + datetime.timedelta(days=14)).isoformat(),
+                },
+            )
+            if status == 201:
+                with self._lock:
+                    self._prestados.append(json.loads(body)["id"])
+            return status
+        if nombre == "devolucion":
+            with self._lock:
+                if not self._prestados:
+                    return None
+                prestamo_id = self._prestados.pop(rng.randrange(len(self._prestados)))
+            return sesion["operador"].request("POST", f"/api/prestamos/{prestamo_id}/devolver/")[0]
+        if nombre == "reporte":
+            desde = (hoy - datetime.timedelta(days=7)).isoformat()
+            return sesion["supervisor"].request(
+                "GET", f"/api/prestamos/reporte/?{urlencode({'fecha_desde': desde})}"
+            )[0]
+        raise ValueError(nombre)
+
+    def _sesiones_para(self, concurrencia):
+        """
+        Una sesión de operador y una de supervisor por worker, logueadas antes
+        de arrancar el reloj (el hash de la clave no cuenta en el escalón) y
+        reutilizadas entre escalones.
+        """
+        while len(self._sesiones) < concurrencia:
+            sesion = {}
+            for rol in ("operador", "supervisor"):
+                sesion[rol] = _Sesion(self.base_url, self.timeout)
+                sesion[rol].login(*self._credenciales[rol])
+            self._sesiones.append(sesion)
+        return self._sesiones[:concurrencia]
+
+    def _worker(self, worker_id, sesion, deadline, resultados):
+        rng = random.Random(self.seed * 1000 + worker_id)
+        nombres = list(MEZCLA)
+        pesos = [MEZCLA[n] for n in nombres]
+        while time.monotonic() < deadline:
+            nombre = rng.choices(nombres, pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                status = self._operacion(nombre, sesion, rng)
+            except (URLError, OSError, RuntimeError):
+                status = "error_red"
+            if status is None:
+                continue
+            resultados.append((nombre, status, time.perf_counter() - inicio))
+
+    def _escalon(self, concurrencia, duracion):
+        sesiones = self._sesiones_para(concurrencia)
+        resultados = []
+        self._locks = 0
+        self._excepciones = Counter()
+        deadline = time.monotonic() + duracion
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            futuros = [
+                pool.submit(self._worker, i, sesion, deadline, resultados)
+                for i, sesion in enumerate(sesiones)
+            ]
+            for futuro in futuros:
+                futuro.result()
+        transcurrido = time.monotonic() - inicio
+        return resultados, transcurrido
+
+    def handle(self, *args, **options):
+        self.seed = options["seed"]
+        self.timeout = options["timeout"]
+        self._credenciales = {
+            rol: tuple(options[rol].split(":", 1)) for rol in ("operador", "supervisor")
+        }
+        self._lock = threading.Lock()
+        self._locks = 0
+        self._excepciones = Counter()
+        self._sesiones = []
+
+        try:
+            escalones = [int(c) for c in options["concurrencia"].split(",") if c.strip()]
+        except ValueError:
+            raise CommandError("--concurrencia debe ser una lista de enteros, ej. 1,2,4,8")
+
+        # pools de ids: libros con stock, lectores sin atrasos, préstamos abiertos
+        self._libros = list(
+            Libro.objects.filter(activo=True, ejemplares_disponibles__gt=0)
+            .values_list("id", flat=True)[:5000]
+        )
+        self._lectores = list(
+            UsuarioLector.objects.filter(activo=True)
+            .exclude(prestamos__estado=Prestamo.Estados.ATRASADO)
+            .values_list("id", flat=True)[:5000]
+        )
+        self._prestados = list(
+            Prestamo.objects.filter(estado=Prestamo.Estados.PRESTADO)
+            .values_list("id", flat=True)[:5000]
+        )
+        if not (self._libros and self._lectores):
+            raise CommandError("No hay datos suficientes: corré antes seed_demo_data.")
+
+        httpd = None
+        # todos los workers usan las mismas cuentas: con los límites de tasa
+        # por usuario se mediría el límite (429) y no la capacidad
+        sin_limites = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+        )
+        if options["url"]:
+            self.base_url = options["url"].rstrip("/")
+        else:
+            httpd, self.base_url = self._levantar_servidor()
+            sin_limites.enable()
+            got_request_exception.connect(self._on_excepcion)
+            # los 500 se resumen por tipo de excepción en vez de volcar tracebacks
+            logging.getLogger("django.request").disabled = True
+        self.stdout.write(f"Objetivo: {self.base_url} — mezcla: {MEZCLA}")
+        self.stdout.write(
+            f"{'conc':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'errores':>8} "
+            f"{'locks':>6} {'rechazos':>9} {'requests':>9}"
+        )
+
+        try:
+            # falla rápido si las credenciales no sirven
+            try:
+                self._sesiones_para(1)
+            except (URLError, OSError, RuntimeError) as exc:
+                raise CommandError(f"No se pudo iniciar sesión: {exc}")
+
+            for concurrencia in escalones:
+                resultados, transcurrido = self._escalon(concurrencia, options["duracion"])
+                self._informar(concurrencia, resultados, transcurrido)
+        finally:
+            if httpd is not None:
+                got_request_exception.disconnect(self._on_excepcion)
+                logging.getLogger("django.request").disabled = False
+                httpd.shutdown()
+                httpd.server_close()
+                sin_limites.disable()
+
+    def _informar(self, concurrencia, resultados, transcurrido):
+        total = len(resultados)
+        if not total:
+            self.stdout.write(f"{concurrencia:>5} sin requests completados")
+            return
+
+        latencias = sorted(r[2] * 1000 for r in resultados)
+        percentiles = (
+            statistics.quantiles(latencias, n=100, method="inclusive")
+            if total > 1
+            else [latencias[0]] * 99
+        )
+        # 4xx de negocio (ej. sin ejemplares) no son errores del sistema
+        errores = sum(1 for _, s, _ in resultados if s == "error_red" or s >= 500)
+        rechazos = sum(1 for _, s, _ in resultados if s != "error_red" and 400 <= s < 500)
+
+        self.stdout.write(
+            f"{concurrencia:>5} {total / transcurrido:>8.1f} {percentiles[49]:>7.1f}ms "
+            f"{percentiles[94]:>7.1f}ms {errores / total:>7.1%} {self._locks:>6} "
+            f"{rechazos:>9} {total:>9}"
+        )
+
+        por_operacion = defaultdict(Counter)
+        for nombre, status, _ in resultados:
+            por_operacion[nombre][status] += 1
+        for nombre in MEZCLA:
+            if por_operacion[nombre]:
+                detalle = ", ".join(f"{s}={n}" for s, n in sorted(por_operacion[nombre].items(), key=str))
+                self.stdout.write(f"        {nombre}: {detalle}")
+        if self._excepciones:
+            detalle = ", ".join(f"{t}={n}" for t, n in self._excepciones.most_common())
+            self.stdout.write(f"        excepciones: {detalle}")
+        limitados = sum(1 for _, s, _ in resultados if s == 429)
+        if limitados:
+            self.stderr.write(
+                f"        {limitados} respuestas 429: el servidor tiene límites de tasa. "
+                "Levantarlo con THROTTLE_LECTURA= THROTTLE_ESCRITURA= THROTTLE_REPORTE= "
+                "para medir capacidad."
+            )
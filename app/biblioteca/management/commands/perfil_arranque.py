@@ -0,0 +1,142 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARCA_REQUEST = "perfil_arranque:primer_request"
+PREFIJO_RESULTADO = "PERFIL_ARRANQUE "
+
+# corre en un intérprete nuevo con -X importtime (los imports salen por stderr)
+SCRIPT = r"""
+import io, json, sys, time
+t0 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+app = get_wsgi_application()
+t1 = time.perf_counter()
+print("import time: 0 | 0 | %(marca)s", file=sys.stderr, flush=True)
+estado = []
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": %(ruta)r, "QUERY_STRING": "",
+    "SERVER_NAME": %(host)r, "SERVER_PORT": "80", "HTTP_HOST": %(host)r,
+    "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+}
+respuesta = app(environ, lambda status, headers, exc_info=None: estado.append(status))
+for _ in respuesta:
+    pass
+getattr(respuesta, "close", lambda: None)()
+t2 = time.perf_counter()
+print(%(prefijo)r + json.dumps({
+    "setup_ms": (t1 - t0) * 1000, "primer_request_ms": (t2 - t1) * 1000, "status": estado[0],
+}), flush=True)
+"""
+
+
+def _parsear_importtime(stderr: str) -> dict:
+    """
+    {"setup": {paquete: (us, módulos)}, "primer_request": {...}} con el
+    tiempo propio (self) de cada módulo sumado por paquete de primer nivel.
+    """
+    fases = {"setup": defaultdict(lambda: [0, 0]), "primer_request": defaultdict(lambda: [0, 0])}
+    fase = fases["setup"]
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _, modulo = (parte.strip() for parte in linea[len("import time:"):].split("|"))
+        if modulo == MARCA_REQUEST:
+            fase = fases["primer_request"]
+            continue
+        paquete = fase[modulo.split(".")[0]]
+        paquete[0] += int(propio)
+        paquete[1] += 1
+    return fases
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío: tiempo de import por paquete (python -X "
+        "importtime), django.setup() + WSGI y el primer request, en procesos nuevos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ruta",
+            default="/login/",
+            help="Ruta del primer request (GET, sin sesión). Default: /login/.",
+        )
+        parser.add_argument(
+            "--repeticiones",
+            type=int,
+            default=5,
+            help="Procesos a medir (se informa la mediana). Default: 5.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=12,
+            help="Paquetes a listar por fase. Default: 12.",
+        )
+
+    def _medir_una_vez(self, ruta):
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ("*", "")), "localhost").lstrip(".")
+        codigo = SCRIPT % {"ruta": ruta, "host": host, "marca": MARCA_REQUEST, "prefijo": PREFIJO_RESULTADO}
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get("PYTHONPATH")]))
+
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", codigo],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        resultado = next(
+            (l[len(PREFIJO_RESULTADO):] for l in proceso.stdout.splitlines() if l.startswith(PREFIJO_RESULTADO)),
+            None,
+        )
+        if proceso.returncode or resultado is None:
+            errores = [l for l in proceso.stderr.splitlines() if not l.startswith("import time:")]
+            raise CommandError("Falló el proceso medido:\n" + "\n".join(errores[-20:]))
+        return {**json.loads(resultado), "total_ms": total_ms}, _parsear_importtime(proceso.stderr)
+
+    def handle(self, *args, **options):
+        if options["repeticiones"] < 1:
+            raise CommandError("--repeticiones debe ser >= 1.")
+
+        medidas, imports = [], []
+        for _ in range(options["repeticiones"]):
+            medida, por_paquete = self._medir_una_vez(options["ruta"])
+            medidas.append(medida)
+            imports.append(por_paquete)
+
+        def mediana(clave):
+            return statistics.median(m[clave] for m in medidas)
+
+        self.stdout.write(f"Arranque en frío (mediana de {len(medidas)} procesos):")
+        self.stdout.write(f"  django.setup() + WSGI       {mediana('setup_ms'):8.1f} ms")
+        self.stdout.write(
+            f"  primer request {options['ruta']:<12} {mediana('primer_request_ms'):8.1f} ms ({medidas[-1]['status']})"
+        )
+        self.stdout.write(f"  proceso completo            {mediana('total_ms'):8.1f} ms")
+
+        for fase, titulo in (("setup", "durante setup"), ("primer_request", "durante el primer request")):
+            paquetes = {p for i in imports for p in i[fase]}
+            filas = sorted(
+                (
+                    statistics.median(i[fase][p][0] if p in i[fase] else 0 for i in imports) / 1000,
+                    max(i[fase][p][1] if p in i[fase] else 0 for i in imports),
+                    p,
+                )
+                for p in paquetes
+            )
+            filas.reverse()
+            total = sum(ms for ms, _, _ in filas)
+            self.stdout.write(f"\nImports {titulo}: {total:.1f} ms")
+            for ms, modulos, paquete in filas[: options["top"]]:
+                self.stdout.write(f"  {paquete:<24} {ms:8.1f} ms  ({modulos} módulos)")
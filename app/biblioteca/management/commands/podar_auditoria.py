@@ -0,0 +1,72 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from biblioteca.models import EventoAuditoria
+
+from .archivar_prestamos import restar_meses
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los eventos de auditoría de los meses completos anteriores a "
+        "los últimos N meses, en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=24,
+            help="Meses a conservar (además del mes en curso). Default: 24.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Eventos borrados por lote. Default: 5000.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Sólo informa cuántos eventos se borrarían.",
+        )
+
+    def handle(self, *args, **options):
+        meses = options["meses"]
+        batch_size = options["batch_size"]
+        if meses < 1:
+            raise CommandError("--meses debe ser >= 1.")
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser >= 1.")
+
+        # se poda por meses enteros: el corte es el día 1 del mes
+        inicio_mes = timezone.localdate().replace(day=1)
+        corte_fecha = restar_meses(inicio_mes, meses)
+        corte = timezone.make_aware(datetime.datetime.combine(corte_fecha, datetime.time.min))
+        viejos = EventoAuditoria.objects.filter(fecha__lt=corte)
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Se borrarían {viejos.count()} eventos anteriores a {corte_fecha}."
+            )
+            return
+
+        inicio = time.monotonic()
+        total = 0
+        while True:
+            ids = list(viejos.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            EventoAuditoria.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            self.stdout.write(f"  lote de {len(ids)} (total {total})")
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Borrados {total} eventos anteriores a {corte_fecha} en {duracion:.1f}s."
+            )
+        )
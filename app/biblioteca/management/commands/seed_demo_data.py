@@ -1,26 +1,119 @@
 import random
 import datetime
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
 
+from biblioteca import analitica, fragmentos, populares
 from biblioteca.models import (
     CategoriaLibro,
     Libro,
     UsuarioLector,
     Prestamo,
+    PrestamoArchivado,
+    PrestamosCategoriaMes,
+    PrestamosLibroMes,
+    RollupPrestamoDiario,
 )
 
+# (libros, lectores, préstamos) para --scale
+ESCALAS = {
+    "chica": (1_000, 10_000, 100_000),
+    "mediana": (10_000, 100_000, 1_000_000),
+    "grande": (100_000, 1_000_000, 10_000_000),
+}
+
+NOMBRES = [
+    "Juan", "Ana", "Carlos", "María", "Lucía", "Pedro", "Sofía", "Diego",
+    "Laura", "Martín", "Valentina", "Mateo", "Camila", "Nicolás", "Julieta",
+]
+APELLIDOS = [
+    "Pérez", "García", "López", "Rodríguez", "Fernández", "Gómez", "Sánchez",
+    "Díaz", "Martínez", "Romero", "Álvarez", "Torres", "Ruiz", "Suárez",
+]
+PALABRAS_TITULO = [
+    "Sombra", "Río", "Ciudad", "Viento", "Memoria", "Jardín", "Noche", "Mar",
+    "Fuego", "Silencio", "Camino", "Espejo", "Laberinto", "Invierno", "Isla",
+]
+CATEGORIAS_ESCALA = [
+    "Novela", "Tecnología", "Historia", "Fantasía", "Infantil", "Poesía",
+    "Ciencia", "Filosofía", "Biografía", "Ensayo", "Policial", "Arte",
+]
+
+# Proporciones de estado para los préstamos generados en --scale.
+# Los activos (PRESTADO/ATRASADO) se limitan además a OCUPACION_MAXIMA del
+# stock total, para que queden ejemplares disponibles para los benchmarks.
+PROPORCION_ACTIVOS = 0.17
+PESOS_ACTIVOS = [(Prestamo.Estados.PRESTADO, 12), (Prestamo.Estados.ATRASADO, 5)]
+PESOS_CERRADOS = [(Prestamo.Estados.DEVUELTO, 80), (Prestamo.Estados.ROBADO, 3)]
+OCUPACION_MAXIMA = 0.6
+# 1 de cada N lectores es "moroso": sólo ellos tienen ATRASADO y nunca PRESTADO
+MOROSO_CADA = 25
+
 
 class Command(BaseCommand):
-    help = "Inicializa la base con datos de ejemplo para la biblioteca."
+    help = (
+        "Inicializa la base con datos de ejemplo para la biblioteca. "
+        "Con --scale genera volúmenes grandes (determinísticos) para benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            choices=sorted(ESCALAS),
+            help=(
+                "Genera un dataset grande con bulk_create: "
+                + ", ".join(
+                    f"{k}={l:,} libros/{r:,} lectores/{p:,} préstamos"
+                    for k, (l, r, p) in ESCALAS.items()
+                )
+            ),
+        )
+        parser.add_argument("--libros", type=int, help="Pisa la cantidad de libros de --scale.")
+        parser.add_argument("--lectores", type=int, help="Pisa la cantidad de lectores de --scale.")
+        parser.add_argument("--prestamos", type=int, help="Pisa la cantidad de préstamos de --scale.")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Semilla del generador aleatorio (mismo seed => mismo dataset). Default: 42.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Filas por INSERT en --scale. Default: 5000.",
+        )
 
-    @transaction.atomic
     def handle(self, *args, **options):
+        if options["scale"]:
+            self.handle_scale(options)
+        else:
+            with transaction.atomic():
+                self.handle_demo()
+        # bulk_create / DELETE directo no disparan las señales
+        fragmentos.incrementar()
+
+        inicio = time.monotonic()
+        filas = analitica.recalcular_rollups()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rollups diarios: {filas} filas en {time.monotonic() - inicio:.1f}s.")
+        )
+        inicio = time.monotonic()
+        filas = populares.reconstruir()
+        self.stdout.write(
+            self.style.SUCCESS(f"Contadores de populares: {filas} filas en {time.monotonic() - inicio:.1f}s.")
+        )
+
+    def handle_demo(self):
         self.stdout.write(self.style.WARNING("Borrando datos previos de biblioteca..."))
 
+        PrestamoArchivado.objects.all().delete()
         Prestamo.objects.all().delete()
         Libro.objects.all().delete()
         UsuarioLector.objects.all().delete()
@@ -311,3 +404,213 @@ class Command(BaseCommand):
             )
         )
         self.stdout.write(self.style.SUCCESS("Datos de demo cargados OK."))
+
+    # ================= --scale =================
+
+    def _borrar_todo(self):
+        # DELETE directo: .delete() del ORM levanta todas las filas en memoria
+        with connection.cursor() as cursor:
+            for model in (
+                RollupPrestamoDiario,
+                PrestamosLibroMes,
+                PrestamosCategoriaMes,
+                PrestamoArchivado,
+                Prestamo,
+                Libro,
+                UsuarioLector,
+                CategoriaLibro,
+            ):
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+    def _insertar(self, model, filas, batch_size, etiqueta):
+        """
+        bulk_create por lotes desde un generador de instancias; informa filas/seg.
+        """
+        inicio = time.monotonic()
+        total = 0
+        lote = []
+        for obj in filas:
+            lote.append(obj)
+            if len(lote) >= batch_size:
+                model.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+                if total % (batch_size * 20) == 0:
+                    self.stdout.write(f"  {etiqueta}: {total:,}")
+        if lote:
+            model.objects.bulk_create(lote)
+            total += len(lote)
+
+        duracion = max(time.monotonic() - inicio, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{etiqueta}: {total:,} filas en {duracion:.1f}s ({total / duracion:,.0f} filas/s)"
+            )
+        )
+        return total
+
+    def handle_scale(self, options):
+        n_libros, n_lectores, n_prestamos = ESCALAS[options["scale"]]
+        # `is None`: un 0 explícito también pisa la escala
+        if options["libros"] is not None:
+            n_libros = options["libros"]
+        if options["lectores"] is not None:
+            n_lectores = options["lectores"]
+        if options["prestamos"] is not None:
+            n_prestamos = options["prestamos"]
+        if min(n_libros, n_lectores, n_prestamos) < 0:
+            raise CommandError("--libros, --lectores y --prestamos no pueden ser negativos.")
+        if n_prestamos and not (n_libros and n_lectores):
+            raise CommandError("Para generar préstamos hace falta al menos un libro y un lector.")
+        batch_size = options["batch_size"]
+        rng = random.Random(options["seed"])
+        hoy = timezone.localdate()
+        inicio_total = time.monotonic()
+
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            # carga masiva: no hace falta fsync por cada commit
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous = OFF")
+
+        self.stdout.write(
+            self.style.WARNING(
+                f"Generando {n_libros:,} libros, {n_lectores:,} lectores y "
+                f"{n_prestamos:,} préstamos (seed={options['seed']})..."
+            )
+        )
+        self._borrar_todo()
+
+        User = get_user_model()
+        usuario_creador, _ = User.objects.get_or_create(
+            username="seed_user",
+            defaults={"email": "seed_user@example.com", "is_staff": True},
+        )
+
+        CategoriaLibro.objects.bulk_create(
+            [CategoriaLibro(nombre=nombre, activo=True) for nombre in CATEGORIAS_ESCALA]
+        )
+        categoria_ids = list(CategoriaLibro.objects.order_by("id").values_list("id", flat=True))
+
+        # --- libros ---
+        totales_por_libro = [rng.randint(1, 5) for _ in range(n_libros)]
+
+        def libros():
+            for i in range(n_libros):
+                totales = totales_por_libro[i]
+                yield Libro(
+                    titulo=f"{rng.choice(PALABRAS_TITULO)} {rng.choice(PALABRAS_TITULO)} {i}",
+                    autor=f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                    isbn=f"978{i:010d}",
+                    categoria_id=categoria_ids[i % len(categoria_ids)],
+                    ejemplares_totales=totales,
+                    ejemplares_disponibles=totales,
+                )
+
+        self._insertar(Libro, libros(), batch_size, "Libros")
+        libro_ids = list(Libro.objects.order_by("id").values_list("id", flat=True))
+
+        # --- lectores ---
+        def lectores():
+            for i in range(n_lectores):
+                yield UsuarioLector(
+                    nombre=rng.choice(NOMBRES),
+                    apellido=rng.choice(APELLIDOS),
+                    dni=str(30_000_000 + i),
+                    email=f"lector{i}@example.com",
+                    activo=True,
+                )
+
+        self._insertar(UsuarioLector, lectores(), batch_size, "Lectores")
+        lector_ids = list(UsuarioLector.objects.order_by("id").values_list("id", flat=True))
+        n_morosos = max(1, len(lector_ids) // MOROSO_CADA)
+
+        # --- préstamos ---
+        # Reglas de negocio sin consultar la base por fila:
+        # - capacidad: activos por libro <= ejemplares_totales (contador en memoria)
+        # - atrasos: ATRASADO sólo para lectores morosos, PRESTADO nunca para ellos
+        proporcion_activos = min(
+            PROPORCION_ACTIVOS,
+            OCUPACION_MAXIMA * sum(totales_por_libro) / max(n_prestamos, 1),
+        )
+        estados_activos, pesos_activos = zip(*PESOS_ACTIVOS)
+        estados_cerrados, pesos_cerrados = zip(*PESOS_CERRADOS)
+        activos_por_libro = [0] * len(libro_ids)
+
+        def elegir_lector(moroso):
+            if moroso:
+                return lector_ids[rng.randrange(n_morosos) * MOROSO_CADA]
+            for _ in range(20):
+                idx = rng.randrange(len(lector_ids))
+                if idx % MOROSO_CADA != 0 or idx >= n_morosos * MOROSO_CADA:
+                    return lector_ids[idx]
+            # el último nunca es moroso, salvo que sea el único lector
+            return lector_ids[-1]
+
+        def prestamos():
+            for _ in range(n_prestamos):
+                libro_idx = rng.randrange(len(libro_ids))
+                if rng.random() < proporcion_activos:
+                    estado = rng.choices(estados_activos, pesos_activos)[0]
+                else:
+                    estado = rng.choices(estados_cerrados, pesos_cerrados)[0]
+
+                if estado in Prestamo.ESTADOS_ACTIVOS:
+                    if activos_por_libro[libro_idx] >= totales_por_libro[libro_idx]:
+                        estado = Prestamo.Estados.DEVUELTO
+                    else:
+                        activos_por_libro[libro_idx] += 1
+
+                fecha_real = None
+                if estado == Prestamo.Estados.PRESTADO:
+                    fecha_prestamo = hoy - datetime.timedelta(days=rng.randint(0, 13))
+                    fecha_estimada = hoy + datetime.timedelta(days=rng.randint(1, 14))
+                elif estado == Prestamo.Estados.ATRASADO:
+                    fecha_prestamo = hoy - datetime.timedelta(days=rng.randint(21, 120))
+                    fecha_estimada = fecha_prestamo + datetime.timedelta(days=14)
+                else:
+                    fecha_prestamo = hoy - datetime.timedelta(days=rng.randint(15, 3 * 365))
+                    fecha_estimada = fecha_prestamo + datetime.timedelta(days=14)
+                    fecha_real = fecha_estimada + datetime.timedelta(days=rng.randint(-10, 5))
+                    fecha_real = min(max(fecha_real, fecha_prestamo), hoy)
+
+                yield Prestamo(
+                    libro_id=libro_ids[libro_idx],
+                    lector_id=elegir_lector(estado == Prestamo.Estados.ATRASADO),
+                    fecha_prestamo=fecha_prestamo,
+                    fecha_devolucion_estimada=fecha_estimada,
+                    fecha_devolucion_real=fecha_real,
+                    estado=estado,
+                    comentarios="",
+                    creado_por_id=usuario_creador.pk,
+                )
+
+        # bulk_create no llama a save(): ni full_clean() ni actualizar_disponibles()
+        self._insertar(Prestamo, prestamos(), batch_size, "Préstamos")
+
+        # --- stock: un solo UPDATE set-based ---
+        inicio = time.monotonic()
+        activos = (
+            Prestamo.objects.filter(libro=OuterRef("pk"), estado__in=Prestamo.ESTADOS_ACTIVOS)
+            .order_by()
+            .values("libro")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        Libro.objects.update(
+            ejemplares_disponibles=Greatest(
+                F("ejemplares_totales") - Coalesce(Subquery(activos), Value(0)),
+                Value(0),
+            )
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Stock recalculado en {time.monotonic() - inicio:.1f}s.")
+        )
+
+        duracion = time.monotonic() - inicio_total
+        filas = len(categoria_ids) + len(libro_ids) + len(lector_ids) + n_prestamos
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Dataset generado: {filas:,} filas en {duracion:.1f}s "
+                f"({filas / max(duracion, 1e-6):,.0f} filas/s)."
+            )
+        )
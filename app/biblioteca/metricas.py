@@ -0,0 +1,153 @@
+"""
+Métricas estilo Prometheus (prometheus_client), expuestas en /metrics.
+
+- Requests por vista y status (contador) y su latencia (histograma).
+- Queries y tiempo de SQL por request (histogramas, por vista).
+- Préstamos activos y atrasados (gauges): se calculan al momento del
+  scrape con un único aggregate sobre el índice (estado, fecha_prestamo),
+  cacheado METRICAS_GAUGES_TTL segundos.
+
+Multi-proceso (gunicorn/uwsgi con varios workers): definir
+PROMETHEUS_MULTIPROC_DIR (un directorio vacío, escribible, limpio al
+arrancar). Cada worker escribe sus valores ahí y /metrics los suma.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Count, Q
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .instrumentacion import medir
+from .models import Prestamo
+
+SIN_RUTA = "sin_ruta"
+CACHE_KEY_GAUGES = "metricas:prestamos"
+
+REQUESTS = Counter(
+    "biblioteca_http_requests_total",
+    "Requests atendidos.",
+    ["vista", "status"],
+)
+LATENCIA = Histogram(
+    "biblioteca_http_request_duracion_segundos",
+    "Duración del request (middleware en adelante).",
+    ["vista", "status"],
+)
+QUERIES = Histogram(
+    "biblioteca_db_queries_por_request",
+    "Queries SQL por request.",
+    ["vista"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, float("inf")),
+)
+TIEMPO_SQL = Histogram(
+    "biblioteca_db_duracion_por_request_segundos",
+    "Tiempo total de SQL por request.",
+    ["vista"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, float("inf")),
+)
+
+
+def contar_prestamos() -> dict:
+    """
+    {"activos": n, "atrasados": m} en una sola query sobre los estados
+    activos (no recorre los préstamos cerrados). "Atrasado" sigue a
+    Prestamo.esta_atrasado: estado ATRASADO o PRESTADO con la fecha
+    estimada vencida.
+    """
+    valores = cache.get(CACHE_KEY_GAUGES)
+    if valores is None:
+        valores = Prestamo.objects.filter(estado__in=Prestamo.ESTADOS_ACTIVOS).aggregate(
+            activos=Count("id"),
+            atrasados=Count(
+                "id",
+                filter=Q(estado=Prestamo.Estados.ATRASADO)
+                | Q(fecha_devolucion_estimada__lt=timezone.localdate()),
+            ),
+        )
+        cache.set(CACHE_KEY_GAUGES, valores, settings.METRICAS_GAUGES_TTL)
+    return valores
+
+
+class PrestamosCollector:
+    """
+    Gauges leídos de la DB en el scrape: valen lo mismo en todos los
+    workers, así que no pasan por el modo multi-proceso.
+    """
+
+    def collect(self):
+        valores = contar_prestamos()
+        activos = GaugeMetricFamily("biblioteca_prestamos_activos", "Préstamos prestados o atrasados.")
+        activos.add_metric([], valores["activos"])
+        yield activos
+        atrasados = GaugeMetricFamily("biblioteca_prestamos_atrasados", "Préstamos activos vencidos.")
+        atrasados.add_metric([], valores["atrasados"])
+        yield atrasados
+
+
+_registro_prestamos = CollectorRegistry(auto_describe=False)
+_registro_prestamos.register(PrestamosCollector())
+
+
+def exponer() -> bytes:
+    """Texto de /metrics (formato de exposición de Prometheus)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro) + generate_latest(_registro_prestamos)
+
+
+def metricas_view(request):
+    """
+    Con METRICAS_TOKEN exige el Bearer. Sin token, fuera de DEBUG, sólo
+    responde con METRICAS_PUBLICAS (expone vistas, tráfico y préstamos, y
+    cada scrape puede ir a la base).
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponseForbidden()
+    elif not (settings.DEBUG or settings.METRICAS_PUBLICAS):
+        return HttpResponseForbidden()
+    return HttpResponse(exponer(), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricasMiddleware:
+    """
+    Va después de SaludMiddleware (los probes no cuentan) y antes de
+    sesión/auth, para que la latencia los incluya.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_HABILITADAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with medir() as medicion:
+            response = self.get_response(request)
+            total_s = medicion.total_s
+
+        match = getattr(request, "resolver_match", None)
+        vista = match.view_name if match else SIN_RUTA
+        status = str(response.status_code)
+        REQUESTS.labels(vista, status).inc()
+        LATENCIA.labels(vista, status).observe(total_s)
+        QUERIES.labels(vista).observe(medicion.queries)
+        TIEMPO_SQL.labels(vista).observe(medicion.sql_s)
+        return response
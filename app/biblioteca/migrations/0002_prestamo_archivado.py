@@ -0,0 +1,60 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestamoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_prestamo', models.DateField()),
+                ('fecha_devolucion_estimada', models.DateField()),
+                ('fecha_devolucion_real', models.DateField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('PRESTADO', 'Prestado'), ('DEVUELTO', 'Devuelto'), ('ATRASADO', 'Atrasado'), ('ROBADO', 'Robado')], max_length=20)),
+                ('comentarios', models.TextField(blank=True)),
+                ('fecha_archivado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Préstamo archivado',
+                'verbose_name_plural': 'Préstamos archivados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['estado', 'fecha_prestamo'], name='biblioteca__estado_7ad9c4_idx'),
+        ),
+        migrations.AddField(
+            model_name='prestamoarchivado',
+            name='creado_por',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='prestamos_archivados_creados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='prestamoarchivado',
+            name='lector',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='prestamos_archivados', to='biblioteca.usuariolector'),
+        ),
+        migrations.AddField(
+            model_name='prestamoarchivado',
+            name='libro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='prestamos_archivados', to='biblioteca.libro'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamoarchivado',
+            index=models.Index(fields=['fecha_prestamo'], name='biblioteca__fecha_p_65df65_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamoarchivado',
+            index=models.Index(fields=['estado', 'fecha_prestamo'], name='biblioteca__estado_21e7ec_idx'),
+        ),
+    ]
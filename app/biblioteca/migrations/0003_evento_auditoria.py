@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_prestamo_archivado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoAuditoria',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario_nombre', models.CharField(blank=True, max_length=150)),
+                ('accion', models.CharField(max_length=50)),
+                ('entidad', models.CharField(max_length=50)),
+                ('entidad_id', models.BigIntegerField(blank=True, null=True)),
+                ('datos', models.JSONField(blank=True, default=dict)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_auditoria', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de auditoría',
+                'verbose_name_plural': 'Eventos de auditoría',
+                'indexes': [models.Index(fields=['entidad', 'entidad_id'], name='biblioteca__entidad_5629a1_idx'), models.Index(fields=['usuario', 'fecha'], name='biblioteca__usuario_e8755b_idx'), models.Index(fields=['fecha'], name='biblioteca__fecha_ebd52a_idx')],
+            },
+        ),
+    ]
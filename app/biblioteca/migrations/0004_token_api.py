@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_evento_auditoria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenAPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('prefijo', models.CharField(db_index=True, max_length=8)),
+                ('clave_hash', models.CharField(max_length=64, unique=True)),
+                ('alcances', models.JSONField(default=list)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira', models.DateTimeField()),
+                ('activo', models.BooleanField(default=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_api', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token de API',
+                'verbose_name_plural': 'Tokens de API',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_token_api'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuariolector',
+            index=models.Index(fields=['apellido', 'nombre'], name='biblioteca__apellid_cad47f_idx'),
+        ),
+    ]
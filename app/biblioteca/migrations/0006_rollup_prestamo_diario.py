@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_lector_indice_apellido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupPrestamoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PRESTADO', 'Prestado'), ('DEVUELTO', 'Devuelto'), ('ATRASADO', 'Atrasado'), ('ROBADO', 'Robado')], max_length=20)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups_prestamos', to='biblioteca.categorialibro')),
+            ],
+            options={
+                'verbose_name': 'Rollup diario de préstamos',
+                'verbose_name_plural': 'Rollups diarios de préstamos',
+                'indexes': [models.Index(fields=['estado', 'fecha'], name='biblioteca__estado_ce2527_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria', 'estado'), name='unique_rollup_prestamo_dia')],
+            },
+        ),
+    ]
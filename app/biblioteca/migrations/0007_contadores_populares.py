@@ -0,0 +1,44 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0006_rollup_prestamo_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestamosCategoriaMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_por_mes', to='biblioteca.categorialibro')),
+            ],
+            options={
+                'verbose_name': 'Préstamos de categoría por mes',
+                'verbose_name_plural': 'Préstamos de categorías por mes',
+                'indexes': [models.Index(fields=['mes', '-cantidad', 'categoria'], name='prestamos_categoria_mes_top')],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'categoria'), name='unique_prestamos_categoria_mes')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrestamosLibroMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_por_mes', to='biblioteca.libro')),
+            ],
+            options={
+                'verbose_name': 'Préstamos de libro por mes',
+                'verbose_name_plural': 'Préstamos de libros por mes',
+                'indexes': [models.Index(fields=['mes', '-cantidad', 'libro'], name='prestamos_libro_mes_top')],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'libro'), name='unique_prestamos_libro_mes')],
+            },
+        ),
+    ]
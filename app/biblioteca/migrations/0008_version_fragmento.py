@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0007_contadores_populares'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionFragmento',
+            fields=[
+                ('area', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Versión de fragmentos',
+                'verbose_name_plural': 'Versiones de fragmentos',
+            },
+        ),
+    ]
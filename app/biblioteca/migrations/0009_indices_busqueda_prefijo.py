@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:26
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_version_fragmento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(django.db.models.functions.text.Lower('titulo'), name='libro_titulo_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(django.db.models.functions.text.Lower('autor'), name='libro_autor_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='usuariolector',
+            index=models.Index(django.db.models.functions.text.Lower('apellido'), name='lector_apellido_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='usuariolector',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='lector_nombre_lower'),
+        ),
+    ]
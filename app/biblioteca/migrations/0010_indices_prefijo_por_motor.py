@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:45
+
+from django.db import migrations
+
+# Índices para col__istartswith, que cada motor escribe distinto:
+# - SQLite: "col" LIKE 'x%' ESCAPE '\' (sin distinguir mayúsculas ASCII);
+#   sólo usa un índice con collation NOCASE.
+# - PostgreSQL: UPPER("col"::text) LIKE UPPER('x%'); usa un índice funcional
+#   sobre UPPER(col) con text_pattern_ops (LIKE con prefijo en cualquier locale).
+INDICES = [
+    ("lector_apellido_prefijo", "biblioteca_usuariolector", "apellido"),
+    ("lector_nombre_prefijo", "biblioteca_usuariolector", "nombre"),
+    ("libro_titulo_prefijo", "biblioteca_libro", "titulo"),
+    ("libro_autor_prefijo", "biblioteca_libro", "autor"),
+]
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    for nombre, tabla, columna in INDICES:
+        if vendor == "sqlite":
+            expresion = f"{qn(columna)} COLLATE NOCASE"
+        elif vendor == "postgresql":
+            expresion = f"UPPER({qn(columna)}::text) text_pattern_ops"
+        else:
+            continue
+        schema_editor.execute(f"CREATE INDEX {qn(nombre)} ON {qn(tabla)} ({expresion})")
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor not in ("sqlite", "postgresql"):
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(nombre)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0009_indices_busqueda_prefijo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='libro',
+            name='libro_titulo_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='libro',
+            name='libro_autor_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='usuariolector',
+            name='lector_apellido_lower',
+        ),
+        migrations.RemoveIndex(
+            model_name='usuariolector',
+            name='lector_nombre_lower',
+        ),
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:51
+
+import time
+
+from django.db import migrations
+
+AREAS = ("home", "libros", "categorias")
+
+
+def crear_versiones(apps, schema_editor):
+    # con las filas creadas, cada incremento es un solo UPDATE
+    VersionFragmento = apps.get_model("biblioteca", "VersionFragmento")
+    VersionFragmento.objects.bulk_create(
+        [VersionFragmento(area=area, version=time.time_ns() // 1000) for area in AREAS],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0010_indices_prefijo_por_motor'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_versiones, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,6 @@
+import hashlib
+import secrets
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -42,6 +45,8 @@ class Libro(models.Model):
                 name="unique_titulo_autor",
             ),
         ]
+        # búsqueda por prefijo (titulo/autor__istartswith): índices propios de
+        # cada motor, creados en la migración 0010
 
     def clean(self):
         super().clean()
@@ -68,6 +73,21 @@ class Libro(models.Model):
         self.ejemplares_disponibles = max(0, self.ejemplares_totales - activos)
         self.save(update_fields=["ejemplares_disponibles"])
 
+class UsuarioLectorQuerySet(models.QuerySet):
+    def buscar(self, q: str):
+        """
+        Números -> prefijo de DNI (índice único); texto -> prefijo de
+        apellido o nombre, con istartswith (índices de la migración 0010; el
+        OR se resuelve con una búsqueda por índice en cada columna).
+        """
+        q = q.strip()
+        if not q:
+            return self
+        if q.isdigit():
+            # rango en vez de startswith (LIKE): usa el índice único de dni
+            return self.filter(dni__gte=q, dni__lt=q[:-1] + chr(ord(q[-1]) + 1))
+        return self.filter(models.Q(apellido__istartswith=q) | models.Q(nombre__istartswith=q))
+
 class UsuarioLector(models.Model):
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
@@ -76,10 +96,18 @@ class UsuarioLector(models.Model):
     telefono = models.CharField(max_length=30, blank=True)
     activo = models.BooleanField(default=True)
 
+    objects = UsuarioLectorQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Lector"
         verbose_name_plural = "Lectores"
         ordering = ["apellido", "nombre"]
+        indexes = [
+            # orden por defecto
+            models.Index(fields=["apellido", "nombre"]),
+        ]
+        # búsqueda por prefijo (buscar): índices propios de cada motor,
+        # creados en la migración 0010
 
     def __str__(self) -> str:
         return f"{self.apellido}, {self.nombre} ({self.dni})"
@@ -93,6 +121,8 @@ class Prestamo(models.Model):
 
     # Estados que cuentan como "ocupan ejemplar"
     ESTADOS_ACTIVOS = (Estados.PRESTADO, Estados.ATRASADO)
+    # Estados finales: son los que se pueden pasar a PrestamoArchivado
+    ESTADOS_CERRADOS = (Estados.DEVUELTO, Estados.ROBADO)
 
     libro = models.ForeignKey(Libro, on_delete=models.PROTECT, related_name="prestamos")
     lector = models.ForeignKey(UsuarioLector, on_delete=models.PROTECT, related_name="prestamos")
@@ -111,6 +141,11 @@ class Prestamo(models.Model):
         related_name="prestamos_creados",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "fecha_prestamo"]),
+        ]
+
     def clean(self):
         from django.core.exceptions import ValidationError
 
@@ -185,4 +220,246 @@ class Prestamo(models.Model):
         return False
 
     esta_atrasado.boolean = True
-    esta_atrasado.short_description = "¿Atrasado?"
\ No newline at end of file
+    esta_atrasado.short_description = "¿Atrasado?"
+
+
+class PrestamoArchivado(models.Model):
+    """
+    Préstamos cerrados (DEVUELTO / ROBADO) viejos, movidos fuera de Prestamo
+    por el comando archivar_prestamos para que la tabla "caliente" sólo
+    tenga lo operativo. Conserva el id original del préstamo.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    libro = models.ForeignKey(
+        Libro, on_delete=models.PROTECT, related_name="prestamos_archivados"
+    )
+    lector = models.ForeignKey(
+        UsuarioLector, on_delete=models.PROTECT, related_name="prestamos_archivados"
+    )
+    fecha_prestamo = models.DateField()
+    fecha_devolucion_estimada = models.DateField()
+    fecha_devolucion_real = models.DateField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=Prestamo.Estados.choices)
+    comentarios = models.TextField(blank=True)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name="prestamos_archivados_creados",
+    )
+    fecha_archivado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Préstamo archivado"
+        verbose_name_plural = "Préstamos archivados"
+        indexes = [
+            models.Index(fields=["fecha_prestamo"]),
+            models.Index(fields=["estado", "fecha_prestamo"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Préstamo archivado #{self.id}"
+
+
+class RollupPrestamoDiario(models.Model):
+    """
+    Préstamos por día (fecha_prestamo), categoría y estado, sumando
+    Prestamo y PrestamoArchivado. Datos derivados: los recalcula el comando
+    actualizar_rollups (biblioteca.analitica) y los lee
+    /api/analitica/prestamos/.
+    """
+    fecha = models.DateField()
+    categoria = models.ForeignKey(
+        CategoriaLibro, on_delete=models.CASCADE, related_name="rollups_prestamos"
+    )
+    estado = models.CharField(max_length=20, choices=Prestamo.Estados.choices)
+    cantidad = models.PositiveIntegerField()
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Rollup diario de préstamos"
+        verbose_name_plural = "Rollups diarios de préstamos"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fecha", "categoria", "estado"],
+                name="unique_rollup_prestamo_dia",
+            ),
+        ]
+        indexes = [
+            # días con préstamos todavía activos (se recalculan en cada corrida)
+            models.Index(fields=["estado", "fecha"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.fecha} {self.categoria_id} {self.estado}: {self.cantidad}"
+
+
+class PrestamosLibroMes(models.Model):
+    """
+    Préstamos iniciados por libro y mes (mes = día 1 de fecha_prestamo).
+    Contador que se incrementa en cada alta de Prestamo
+    (biblioteca.populares); se reconstruye con reconstruir_populares.
+    """
+    mes = models.DateField()
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name="prestamos_por_mes")
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Préstamos de libro por mes"
+        verbose_name_plural = "Préstamos de libros por mes"
+        constraints = [
+            models.UniqueConstraint(fields=["mes", "libro"], name="unique_prestamos_libro_mes"),
+        ]
+        indexes = [
+            # top-N del mes: recorre el índice en orden, sin ordenar
+            models.Index(fields=["mes", "-cantidad", "libro"], name="prestamos_libro_mes_top"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.mes:%Y-%m} libro {self.libro_id}: {self.cantidad}"
+
+
+class PrestamosCategoriaMes(models.Model):
+    """
+    Igual que PrestamosLibroMes, por categoría del libro.
+    """
+    mes = models.DateField()
+    categoria = models.ForeignKey(
+        CategoriaLibro, on_delete=models.CASCADE, related_name="prestamos_por_mes"
+    )
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Préstamos de categoría por mes"
+        verbose_name_plural = "Préstamos de categorías por mes"
+        constraints = [
+            models.UniqueConstraint(fields=["mes", "categoria"], name="unique_prestamos_categoria_mes"),
+        ]
+        indexes = [
+            models.Index(fields=["mes", "-cantidad", "categoria"], name="prestamos_categoria_mes_top"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.mes:%Y-%m} categoría {self.categoria_id}: {self.cantidad}"
+
+
+class VersionFragmento(models.Model):
+    """
+    Versión de cada área del cache de fragmentos (biblioteca.fragmentos).
+    Vive en la base para que la vean todos los procesos: workers y
+    comandos de management.
+    """
+    area = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Versión de fragmentos"
+        verbose_name_plural = "Versiones de fragmentos"
+
+    def __str__(self) -> str:
+        return f"{self.area}: {self.version}"
+
+
+class EventoAuditoria(models.Model):
+    """
+    Registro append-only de acciones (quién hizo qué sobre qué entidad).
+    Se escribe con biblioteca.auditoria.auditar(); se consulta desde
+    /api/auditoria/ y se poda por meses con podar_auditoria.
+    """
+    id = models.BigAutoField(primary_key=True)
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="eventos_auditoria",
+    )
+    # copia del username: el evento sigue siendo legible si se borra el usuario
+    usuario_nombre = models.CharField(max_length=150, blank=True)
+    accion = models.CharField(max_length=50)
+    entidad = models.CharField(max_length=50)
+    entidad_id = models.BigIntegerField(null=True, blank=True)
+    datos = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name = "Evento de auditoría"
+        verbose_name_plural = "Eventos de auditoría"
+        indexes = [
+            models.Index(fields=["entidad", "entidad_id"]),
+            models.Index(fields=["usuario", "fecha"]),
+            models.Index(fields=["fecha"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.accion} {self.entidad}#{self.entidad_id} ({self.usuario_nombre})"
+
+
+class TokenAPI(models.Model):
+    """
+    Token para integraciones / kioscos (header "Authorization: Token <clave>").
+    Sólo se guarda el sha256 de la clave; la clave se muestra una vez al
+    crearlo (comando crear_token_api). Los alcances definen el rol con el
+    que actúa el token, sin mirar los grupos del usuario en cada request.
+    """
+    class Alcances(models.TextChoices):
+        OPERADOR = "operador", "Operador"
+        SUPERVISOR = "supervisor", "Supervisor"
+
+    # alcance -> nombre del grupo equivalente
+    GRUPOS = {Alcances.OPERADOR: "Operador", Alcances.SUPERVISOR: "Supervisor"}
+
+    nombre = models.CharField(max_length=100)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="tokens_api",
+    )
+    prefijo = models.CharField(max_length=8, db_index=True)
+    clave_hash = models.CharField(max_length=64, unique=True)
+    alcances = models.JSONField(default=list)
+    creado = models.DateTimeField(default=timezone.now)
+    expira = models.DateTimeField()
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Token de API"
+        verbose_name_plural = "Tokens de API"
+
+    def __str__(self) -> str:
+        return f"{self.nombre} ({self.prefijo}…)"
+
+    @staticmethod
+    def hashear(clave: str) -> str:
+        return hashlib.sha256(clave.encode()).hexdigest()
+
+    @classmethod
+    def generar(cls, usuario, nombre, alcances, expira):
+        """
+        Crea el token y devuelve (token, clave). La clave no se puede recuperar después.
+        """
+        clave = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            nombre=nombre,
+            usuario=usuario,
+            prefijo=clave[:8],
+            clave_hash=cls.hashear(clave),
+            alcances=sorted(set(alcances)),
+            expira=expira,
+        )
+        return token, clave
+
+    def esta_vigente(self) -> bool:
+        return self.activo and self.expira > timezone.now()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # revocar / cambiar alcances no espera al TTL de la cache
+        from .api.authentication import olvidar_token
+
+        olvidar_token(self.clave_hash)
+
+    def delete(self, *args, **kwargs):
+        from .api.authentication import olvidar_token
+
+        olvidar_token(self.clave_hash)
+        return super().delete(*args, **kwargs)
@@ -0,0 +1,132 @@
+"""
+Perfilado de un request puntual, a pedido de un supervisor.
+
+Con PERFILADO_HABILITADO (env PERFILADO=1) un supervisor logueado puede
+agregar ?__profile=cpu|mem (o el header X-Perfil: cpu|mem) a cualquier URL:
+
+- cpu: cProfile de la vista; devuelve el pstats ordenado por tiempo acumulado.
+- mem: tracemalloc; devuelve las líneas que más memoria asignaron y el pico.
+
+La respuesta de la vista se reemplaza por el informe en texto plano (el
+status original va en X-Perfil-Status). Con PERFILADO_DIR, además se guarda
+el .pstats / snapshot de tracemalloc ahí, para abrirlo con snakeviz o
+pstats. Apagado, el middleware se desinstala solo.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from .roles import es_supervisor
+
+PARAMETRO = "__profile"
+HEADER = "X-Perfil"
+MODOS = ("cpu", "mem")
+
+# cProfile (sys.monitoring en 3.12) y tracemalloc son globales al proceso:
+# un perfilado por vez
+_en_curso = threading.Lock()
+
+
+def _consumir(response):
+    # en una respuesta en streaming el trabajo ocurre al iterarla
+    if response.streaming:
+        b"".join(response.streaming_content)
+
+
+def _archivo(modo: str, extension: str):
+    directorio = settings.PERFILADO_DIR
+    if not directorio:
+        return None
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+    return Path(directorio) / f"{modo}-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}.{extension}"
+
+
+def perfilar_cpu(get_response, request):
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        response = get_response(request)
+        _consumir(response)
+    finally:
+        perfil.disable()
+
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(perfil, stream=salida)
+    estadisticas.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(settings.PERFILADO_TOP)
+    archivo = _archivo("cpu", "pstats")
+    if archivo:
+        estadisticas.dump_stats(archivo)
+    return response, salida.getvalue(), archivo
+
+
+def perfilar_mem(get_response, request):
+    ya_activo = tracemalloc.is_tracing()
+    if not ya_activo:
+        tracemalloc.start(settings.PERFILADO_MEM_FRAMES)
+    tracemalloc.reset_peak()
+    antes = tracemalloc.take_snapshot()
+    try:
+        response = get_response(request)
+        _consumir(response)
+        despues = tracemalloc.take_snapshot()
+        actual, pico = tracemalloc.get_traced_memory()
+    finally:
+        if not ya_activo:
+            tracemalloc.stop()
+
+    filtros = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+    diferencias = despues.filter_traces(filtros).compare_to(antes.filter_traces(filtros), "lineno")
+    lineas = [f"Pico durante el request: {pico / 1024:.1f} KiB (actual {actual / 1024:.1f} KiB)", ""]
+    lineas += [str(diferencia) for diferencia in diferencias[: settings.PERFILADO_TOP]]
+    archivo = _archivo("mem", "tracemalloc")
+    if archivo:
+        despues.dump(str(archivo))
+    return response, "\n".join(lineas) + "\n", archivo
+
+
+PERFILADORES = {"cpu": perfilar_cpu, "mem": perfilar_mem}
+
+
+class PerfiladoMiddleware:
+    """
+    Va al final de MIDDLEWARE: necesita request.user (AuthenticationMiddleware).
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFILADO_HABILITADO:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        modo = request.GET.get(PARAMETRO) or request.headers.get(HEADER)
+        if modo not in MODOS or not request.user.is_authenticated or not es_supervisor(request.user):
+            return self.get_response(request)
+
+        if not _en_curso.acquire(blocking=False):
+            return HttpResponse(
+                "Hay otro perfilado en curso en este proceso.\n",
+                status=409,
+                content_type="text/plain; charset=utf-8",
+            )
+        try:
+            response, informe, archivo = PERFILADORES[modo](self.get_response, request)
+        finally:
+            _en_curso.release()
+
+        perfil = HttpResponse(informe, content_type="text/plain; charset=utf-8")
+        perfil["X-Perfil-Status"] = str(response.status_code)
+        perfil["Cache-Control"] = "no-store"
+        if archivo:
+            perfil["X-Perfil-Archivo"] = archivo.name
+        return perfil
@@ -0,0 +1,122 @@
+"""
+Libros y categorías más prestados por mes.
+
+Cada alta de Prestamo incrementa dos contadores (PrestamosLibroMes y
+PrestamosCategoriaMes, ver signals.py) con un INSERT ... ON CONFLICT DO
+UPDATE SET cantidad = cantidad + 1 (una query por contador, exista o no la
+fila), dentro de la transacción del alta (crear_prestamo y
+PrestamoViewSet.perform_create usan transaction.atomic). El top-N de un mes
+lee esos contadores por el índice (mes, -cantidad): no agrupa préstamos.
+
+Lo que no pasa por Prestamo.save() (bulk_create de seed_demo_data,
+ediciones de libro/fecha, borrados) se corrige con reconstruir().
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from .models import (
+    Prestamo,
+    PrestamoArchivado,
+    PrestamosCategoriaMes,
+    PrestamosLibroMes,
+)
+
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _incrementar(modelo, mes, columna: str, valor) -> None:
+    # upsert: SQLite (>= 3.24) y PostgreSQL; el ORM no tiene "cantidad + 1"
+    # en bulk_create(update_conflicts=True)
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} ({qn('mes')}, {qn(columna)}, {qn('cantidad')}) VALUES (%s, %s, 1) "
+            f"ON CONFLICT ({qn('mes')}, {qn(columna)}) "
+            f"DO UPDATE SET {qn('cantidad')} = {tabla}.{qn('cantidad')} + 1",
+            [connection.ops.adapt_datefield_value(mes), valor],
+        )
+
+
+def registrar_prestamo(prestamo) -> None:
+    mes = inicio_de_mes(prestamo.fecha_prestamo)
+    _incrementar(PrestamosLibroMes, mes, "libro_id", prestamo.libro_id)
+    _incrementar(PrestamosCategoriaMes, mes, "categoria_id", prestamo.libro.categoria_id)
+
+
+def top_libros(mes, n: int):
+    return (
+        PrestamosLibroMes.objects.filter(mes=inicio_de_mes(mes))
+        .select_related("libro")
+        .order_by("-cantidad", "libro_id")[:n]
+    )
+
+
+def top_categorias(mes, n: int):
+    return (
+        PrestamosCategoriaMes.objects.filter(mes=inicio_de_mes(mes))
+        .select_related("categoria")
+        .order_by("-cantidad", "categoria_id")[:n]
+    )
+
+
+def _contar(filtro: dict) -> tuple:
+    por_libro, por_categoria = Counter(), Counter()
+    for modelo in (Prestamo, PrestamoArchivado):
+        filas = (
+            modelo.objects.filter(**filtro)
+            .annotate(mes=TruncMonth("fecha_prestamo"))
+            .values("mes", "libro_id", "libro__categoria_id")
+            .annotate(cantidad=Count("id"))
+            .order_by()
+        )
+        for fila in filas:
+            por_libro[(fila["mes"], fila["libro_id"])] += fila["cantidad"]
+            por_categoria[(fila["mes"], fila["libro__categoria_id"])] += fila["cantidad"]
+    return por_libro, por_categoria
+
+
+def reconstruir(desde=None) -> int:
+    """
+    Recalcula los contadores (todos, o desde el mes de `desde`) a partir de
+    Prestamo + PrestamoArchivado. Devuelve las filas escritas.
+
+    Se puede correr con préstamos entrando: primero bloquea los contadores
+    (en PostgreSQL LOCK TABLE; en SQLite el DELETE toma el lock de
+    escritura) y recién después cuenta. Un alta que llega en el medio
+    espera y suma sobre las filas nuevas; una que ya había incrementado
+    quedó confirmada antes del lock y entra en el conteo.
+    """
+    filtro, filtro_contadores = {}, {}
+    if desde is not None:
+        desde = inicio_de_mes(desde)
+        filtro, filtro_contadores = {"fecha_prestamo__gte": desde}, {"mes__gte": desde}
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for modelo in (PrestamosLibroMes, PrestamosCategoriaMes):
+                    cursor.execute(
+                        f"LOCK TABLE {connection.ops.quote_name(modelo._meta.db_table)} "
+                        "IN SHARE ROW EXCLUSIVE MODE"
+                    )
+        PrestamosLibroMes.objects.filter(**filtro_contadores).delete()
+        PrestamosCategoriaMes.objects.filter(**filtro_contadores).delete()
+        por_libro, por_categoria = _contar(filtro)
+        PrestamosLibroMes.objects.bulk_create(
+            [PrestamosLibroMes(mes=mes, libro_id=libro_id, cantidad=n) for (mes, libro_id), n in por_libro.items()],
+            batch_size=1000,
+        )
+        PrestamosCategoriaMes.objects.bulk_create(
+            [
+                PrestamosCategoriaMes(mes=mes, categoria_id=categoria_id, cantidad=n)
+                for (mes, categoria_id), n in por_categoria.items()
+            ],
+            batch_size=1000,
+        )
+    return len(por_libro) + len(por_categoria)
@@ -0,0 +1,133 @@
+"""
+Ruteo de lecturas a la réplica de base de datos.
+
+- Las escrituras siempre van a "default" (primaria).
+- Las lecturas van a "replica" sólo dentro de `usando_replica()` /
+  `@lectura_en_replica` (reportes y dashboards), y sólo si el alias existe.
+- Si en el request ya hubo una escritura, si hay una transacción abierta en
+  la primaria, o si el usuario escribió hace menos de REPLICA_STICKY_SECONDS
+  (cookie), se lee de la primaria para no mostrar datos viejos
+  (read-your-writes).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+ALIAS_PRIMARIA = "default"
+ALIAS_REPLICA = "replica"
+COOKIE_STICKY = "michi_primaria_hasta"
+
+_leer_de_replica = ContextVar("leer_de_replica", default=False)
+_fijado_a_primaria = ContextVar("fijado_a_primaria", default=False)
+# None = fuera de un request/bloque de réplica (no se registra nada)
+_hubo_escritura = ContextVar("hubo_escritura", default=None)
+
+
+def replica_configurada() -> bool:
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+@contextmanager
+def usando_replica():
+    """
+    Las lecturas dentro del bloque se mandan a la réplica (si corresponde).
+    """
+    token = _leer_de_replica.set(True)
+    token_escritura = _hubo_escritura.set(bool(_hubo_escritura.get()))
+    try:
+        yield
+    finally:
+        escribio = _hubo_escritura.get()
+        _hubo_escritura.reset(token_escritura)
+        _leer_de_replica.reset(token)
+        # una escritura dentro del bloque también fija el resto del request
+        if escribio and _hubo_escritura.get() is not None:
+            _hubo_escritura.set(True)
+
+
+def lectura_en_replica(view_func):
+    """
+    Decorador para vistas de solo lectura (reportes, dashboards).
+    Sirve tanto para vistas función como para métodos de ViewSet.
+    """
+    @wraps(view_func)
+    def _wrapped(*args, **kwargs):
+        with usando_replica():
+            return view_func(*args, **kwargs)
+    return _wrapped
+
+
+class ReplicaRouter:
+    """
+    Router de DATABASE_ROUTERS. Ver docstring del módulo.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _leer_de_replica.get()
+            and not _fijado_a_primaria.get()
+            and not _hubo_escritura.get()
+            and replica_configurada()
+            # dentro de una transacción en la primaria hay que ver lo propio
+            and not connections[ALIAS_PRIMARIA].in_atomic_block
+        ):
+            return ALIAS_REPLICA
+        return ALIAS_PRIMARIA
+
+    def db_for_write(self, model, **hints):
+        # a partir de acá, el resto del request lee de la primaria
+        if _hubo_escritura.get() is not None:
+            _hubo_escritura.set(True)
+        return ALIAS_PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # primaria y réplica tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # la réplica recibe el esquema por replicación, no por migrate
+        if db == ALIAS_REPLICA:
+            return False
+        return None
+
+
+class PrimariaStickyMiddleware:
+    """
+    Mantiene al usuario pegado a la primaria durante una ventana corta
+    después de escribir, así un redirect post-escritura (ej. crear_prestamo
+    -> prestamo_list/home) no lee de una réplica que todavía no se enteró.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ahora = time.time()
+        try:
+            hasta = float(request.COOKIES.get(COOKIE_STICKY, 0))
+        except ValueError:
+            hasta = 0
+
+        token_fijado = _fijado_a_primaria.set(hasta > ahora)
+        token_escritura = _hubo_escritura.set(False)
+        try:
+            response = self.get_response(request)
+            hubo_escritura = _hubo_escritura.get()
+        finally:
+            _fijado_a_primaria.reset(token_fijado)
+            _hubo_escritura.reset(token_escritura)
+
+        if hubo_escritura and replica_configurada():
+            ventana = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                COOKIE_STICKY,
+                str(ahora + ventana),
+                max_age=ventana,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,137 @@
+"""
+Consultas del reporte de préstamos, compartidas por la vista HTML
+(reporte_prestamos) y la API (PrestamoViewSet.reporte / reporte_csv).
+
+Los préstamos cerrados viejos viven en PrestamoArchivado; acá se
+combinan con los de Prestamo sólo cuando los filtros pueden alcanzarlos.
+"""
+import heapq
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Prestamo, PrestamoArchivado
+
+
+def leer_filtros(params) -> dict:
+    """
+    Normaliza los filtros del reporte desde request.GET / query_params.
+    """
+    return {
+        "estado": (params.get("estado") or "").strip(),
+        "categoria_id": (params.get("categoria") or "").strip(),
+        "fecha_desde": (params.get("fecha_desde") or "").strip(),
+        "fecha_hasta": (params.get("fecha_hasta") or "").strip(),
+    }
+
+
+def _filtrar(qs, filtros):
+    if filtros["estado"]:
+        qs = qs.filter(estado=filtros["estado"])
+    if filtros["categoria_id"]:
+        qs = qs.filter(libro__categoria_id=filtros["categoria_id"])
+    if filtros["fecha_desde"]:
+        qs = qs.filter(fecha_prestamo__gte=filtros["fecha_desde"])
+    if filtros["fecha_hasta"]:
+        qs = qs.filter(fecha_prestamo__lte=filtros["fecha_hasta"])
+    return qs
+
+
+def necesita_archivo(filtros) -> bool:
+    """
+    True si el archivo puede tener filas para estos filtros:
+    - sólo guarda estados cerrados
+    - y nada con fecha_prestamo posterior al préstamo archivado más nuevo.
+    """
+    if filtros["estado"] and filtros["estado"] not in Prestamo.ESTADOS_CERRADOS:
+        return False
+
+    horizonte = (
+        PrestamoArchivado.objects.order_by("-fecha_prestamo")
+        .values_list("fecha_prestamo", flat=True)
+        .first()
+    )
+    if horizonte is None:
+        return False
+    if filtros["fecha_desde"] and filtros["fecha_desde"] > horizonte.isoformat():
+        return False
+    return True
+
+
+def querysets_reporte(filtros) -> list:
+    """
+    Devuelve [qs de Prestamo] o [qs de Prestamo, qs de PrestamoArchivado],
+    ambos filtrados y con los select_related que usa el reporte.
+    """
+    querysets = [
+        _filtrar(
+            Prestamo.objects.select_related("libro", "lector", "libro__categoria"),
+            filtros,
+        )
+    ]
+    if necesita_archivo(filtros):
+        querysets.append(
+            _filtrar(
+                PrestamoArchivado.objects.select_related(
+                    "libro", "lector", "libro__categoria"
+                ),
+                filtros,
+            )
+        )
+    return querysets
+
+
+def resumen_por_estado(querysets) -> list:
+    """
+    [{"estado": ..., "total": ...}] sumando todas las fuentes, ordenado por estado.
+    """
+    totales = Counter()
+    for qs in querysets:
+        for row in qs.values("estado").annotate(total=Count("id")).order_by("estado"):
+            totales[row["estado"]] += row["total"]
+    return [{"estado": estado, "total": totales[estado]} for estado in sorted(totales)]
+
+
+def contar(querysets) -> int:
+    return sum(qs.count() for qs in querysets)
+
+
+def contar_atrasados(querysets) -> int:
+    # el archivo sólo tiene estados cerrados: los atrasados están en Prestamo
+    return querysets[0].filter(estado=Prestamo.Estados.ATRASADO).count()
+
+
+def iterar_prestamos(querysets, chunk_size=None):
+    """
+    Itera los préstamos de todas las fuentes ordenados por
+    -fecha_prestamo, -id, sin materializarlos (merge de iterators).
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    iterators = [
+        qs.order_by("-fecha_prestamo", "-id").iterator(chunk_size=chunk_size)
+        for qs in querysets
+    ]
+    if len(iterators) == 1:
+        return iterators[0]
+    return heapq.merge(
+        *iterators,
+        key=lambda p: (p.fecha_prestamo, p.id),
+        reverse=True,
+    )
+
+
+def ultimos_prestamos(querysets, limite) -> list:
+    """
+    Los `limite` préstamos más recientes entre todas las fuentes.
+    """
+    ordenados = [qs.order_by("-fecha_prestamo", "-id")[:limite] for qs in querysets]
+    return list(
+        islice(
+            heapq.merge(
+                *ordenados, key=lambda p: (p.fecha_prestamo, p.id), reverse=True
+            ),
+            limite,
+        )
+    )
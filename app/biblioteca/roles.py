@@ -0,0 +1,28 @@
+"""
+Roles de la biblioteca (grupos Operador / Supervisor).
+
+Módulo sin dependencias de vistas ni de DRF: lo usan las vistas HTML, los
+permisos de la API y la autenticación por token.
+"""
+OPERADOR = "Operador"
+SUPERVISOR = "Supervisor"
+
+
+def _grupos(user) -> frozenset:
+    """
+    Nombres de grupos del usuario, cacheados en el objeto user
+    (una sola query por request aunque se pregunte varias veces el rol).
+    """
+    grupos = getattr(user, "_grupos_biblioteca", None)
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list("name", flat=True))
+        user._grupos_biblioteca = grupos
+    return grupos
+
+
+def es_operador(user) -> bool:
+    return OPERADOR in _grupos(user)
+
+
+def es_supervisor(user) -> bool:
+    return user.is_superuser or SUPERVISOR in _grupos(user)
@@ -0,0 +1,81 @@
+"""
+Endpoints para el balanceador: /healthz (el proceso responde, sin DB) y
+/readyz (ping a la DB + migraciones aplicadas).
+
+Los atiende SaludMiddleware, primero en MIDDLEWARE: no pasan por sesiones,
+auth, mensajes, auditoría ni el resolver de URLs.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+
+RUTAS_HEALTHZ = frozenset({"/healthz", "/healthz/"})
+RUTAS_READYZ = frozenset({"/readyz", "/readyz/"})
+
+# None = todavía no se miró. Con pendientes (ej. un deploy que todavía no
+# corrió migrate) se vuelve a mirar cada REINTENTO_MIGRACIONES segundos.
+REINTENTO_MIGRACIONES = 10
+_migraciones_al_dia = None
+_proximo_chequeo = 0.0
+
+
+def _respuesta(datos: dict, status: int = 200) -> HttpResponse:
+    response = HttpResponse(json.dumps(datos), content_type="application/json", status=status)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def ping_db(using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    SELECT 1 con tope de SALUD_DB_TIMEOUT segundos. En PostgreSQL el tope
+    es un statement_timeout local a la transacción; la conexión en sí ya
+    tiene connect_timeout (DB_CONNECT_TIMEOUT).
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [int(settings.SALUD_DB_TIMEOUT * 1000)])
+            cursor.execute("SELECT 1")
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+
+def migraciones_al_dia(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    True si no hay migraciones sin aplicar. Cargar el grafo de migraciones
+    es caro: una vez que dio True queda cacheado para todo el proceso.
+    """
+    global _migraciones_al_dia, _proximo_chequeo
+    if _migraciones_al_dia is None or (not _migraciones_al_dia and time.monotonic() >= _proximo_chequeo):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connections[using])
+        _migraciones_al_dia = not executor.migration_plan(executor.loader.graph.leaf_nodes())
+        _proximo_chequeo = time.monotonic() + REINTENTO_MIGRACIONES
+    return _migraciones_al_dia
+
+
+def readyz() -> HttpResponse:
+    try:
+        ping_db()
+    except Exception as exc:
+        return _respuesta({"estado": "error", "db": type(exc).__name__}, status=503)
+    if not migraciones_al_dia():
+        return _respuesta({"estado": "error", "migraciones": "pendientes"}, status=503)
+    return _respuesta({"estado": "ok"})
+
+
+class SaludMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info in RUTAS_HEALTHZ:
+            return _respuesta({"estado": "ok"})
+        if request.path_info in RUTAS_READYZ:
+            return readyz()
+        return self.get_response(request)
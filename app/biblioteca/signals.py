@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import fragmentos, populares
+from .models import CategoriaLibro, Libro, Prestamo, UsuarioLector
+
+# qué fragmentos (biblioteca.fragmentos) muestran cada modelo. Los préstamos
+# no invalidan: home vive FRAGMENTOS_HOME_TTL
+AREAS_POR_MODELO = {
+    Libro: ("home", "libros"),
+    CategoriaLibro: ("libros", "categorias"),
+    UsuarioLector: ("home",),
+}
+# Libro.actualizar_disponibles (cada préstamo / devolución): el stock sólo
+# se ve en el listado de libros
+SOLO_STOCK = frozenset({"ejemplares_disponibles"})
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_save, sender=CategoriaLibro)
+@receiver(post_save, sender=UsuarioLector)
+# sin post_delete de UsuarioLector: un receiver desactiva el DELETE rápido
+# de los borrados masivos
+@receiver(post_delete, sender=Libro)
+@receiver(post_delete, sender=CategoriaLibro)
+def invalidar_fragmentos(sender, update_fields=None, **kwargs):
+    if sender is Libro and update_fields == SOLO_STOCK:
+        fragmentos.incrementar("libros")
+        return
+    fragmentos.incrementar(*AREAS_POR_MODELO[sender])
+
+
+@receiver(post_save, sender=Prestamo)
+def contar_prestamo(sender, instance, created, raw=False, **kwargs):
+    # sólo el alta cuenta (una devolución también es un save)
+    if created and not raw:
+        populares.registrar_prestamo(instance)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def olvidar_tokens_al_cambiar_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    # los roles de un token se cachean (TokenAPIAuthentication): al cambiar
+    # los grupos se vuelven a leer en el próximo request
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        usuario_ids = [instance.pk]
+    elif reverse and action in ("post_add", "post_remove"):
+        usuario_ids = list(pk_set)
+    elif reverse and action == "pre_clear":
+        usuario_ids = list(instance.user_set.values_list("pk", flat=True))
+    else:
+        return
+    # import local: con la API apagada no se carga DRF (ver perfil_arranque)
+    from .api.authentication import olvidar_tokens_de
+
+    transaction.on_commit(lambda: olvidar_tokens_de(usuario_ids))
@@ -0,0 +1,71 @@
+// Autocomplete de AutocompleteWidget (biblioteca/forms.py): al tipear pide
+// ?q=... al endpoint de data-autocomplete-url y guarda el id elegido en el
+// input oculto. Sin dependencias.
+(function () {
+  function iniciar(input) {
+    var destino = document.getElementById(input.dataset.autocompleteDestino);
+    var lista = document.getElementById(destino.id + "_resultados");
+    var minimo = parseInt(input.dataset.autocompleteMinimo, 10) || 1;
+    var espera = null;
+    var pedido = 0;
+
+    function cerrar() {
+      lista.hidden = true;
+      lista.innerHTML = "";
+    }
+
+    function mostrar(resultados) {
+      lista.innerHTML = "";
+      resultados.forEach(function (r) {
+        var item = document.createElement("li");
+        var boton = document.createElement("button");
+        boton.type = "button";
+        boton.textContent = r.texto;
+        boton.addEventListener("click", function () {
+          destino.value = r.id;
+          input.value = r.texto;
+          cerrar();
+        });
+        item.appendChild(boton);
+        lista.appendChild(item);
+      });
+      if (!resultados.length) {
+        var vacio = document.createElement("li");
+        vacio.textContent = "Sin resultados";
+        lista.appendChild(vacio);
+      }
+      lista.hidden = false;
+    }
+
+    input.addEventListener("input", function () {
+      // el texto cambió: la selección anterior ya no vale
+      destino.value = "";
+      clearTimeout(espera);
+      var q = input.value.trim();
+      if (q.length < minimo) {
+        cerrar();
+        return;
+      }
+      espera = setTimeout(function () {
+        var numero = ++pedido;
+        fetch(input.dataset.autocompleteUrl + "?q=" + encodeURIComponent(q), {
+          headers: { Accept: "application/json" },
+          credentials: "same-origin",
+        })
+          .then(function (r) { return r.json(); })
+          .then(function (datos) {
+            // ignorar respuestas de pedidos viejos
+            if (numero === pedido) mostrar(datos.resultados);
+          });
+      }, 200);
+    });
+
+    input.addEventListener("keydown", function (e) {
+      if (e.key === "Escape") cerrar();
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    document.querySelectorAll("input[data-autocomplete-url]").forEach(iniciar);
+  });
+})();
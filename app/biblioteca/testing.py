@@ -0,0 +1,153 @@
+"""
+Helpers de test para presupuestos de queries.
+
+- `presupuesto_queries(maximo)`: context manager / decorador que falla si
+  el bloque ejecuta más de `maximo` queries (lista las queries en el error).
+- `PresupuestoQueriesMixin.assertQueriesConstantes(...)`: mide un request
+  con un dataset chico y otra vez con uno grande; si la cantidad de queries
+  crece con los datos hay un N+1.
+
+Para declarar el presupuesto de un endpoint nuevo:
+
+    @presupuesto_queries(6)
+    def test_mi_endpoint(self):
+        self.client.get(...)
+"""
+import datetime
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .models import CategoriaLibro, Libro, Prestamo, UsuarioLector
+
+
+def _listar(queries) -> str:
+    return "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(queries, start=1))
+
+
+class presupuesto_queries(ContextDecorator):
+    """
+    Falla (AssertionError) si el bloque hace más de `maximo` queries en `using`.
+    """
+
+    def __init__(self, maximo: int, using: str = DEFAULT_DB_ALIAS):
+        self.maximo = maximo
+        self.using = using
+
+    def __enter__(self):
+        self._ctx = CaptureQueriesContext(connections[self.using])
+        self._ctx.__enter__()
+        return self._ctx
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._ctx.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        ejecutadas = len(self._ctx.captured_queries)
+        if ejecutadas > self.maximo:
+            raise AssertionError(
+                f"Presupuesto de queries excedido: {ejecutadas} > {self.maximo}\n"
+                + _listar(self._ctx.captured_queries)
+            )
+        return False
+
+
+def crear_prestamos_masivos(cantidad: int, creado_por, prefijo: str = "pq") -> None:
+    """
+    Crea `cantidad` préstamos cada uno con su propio libro, lector y
+    categoría (así un acceso a FK sin select_related cuesta una query por
+    fila). Usa bulk_create: no pasa por Prestamo.save() / full_clean().
+    """
+    if cantidad <= 0:
+        return
+    hoy = datetime.date.today()
+    base = Prestamo.objects.count()
+
+    categorias = CategoriaLibro.objects.bulk_create(
+        CategoriaLibro(nombre=f"{prefijo}-cat-{base + i}") for i in range(cantidad)
+    )
+    libros = Libro.objects.bulk_create(
+        Libro(
+            titulo=f"{prefijo}-libro-{base + i}",
+            autor="Autor",
+            categoria=categoria,
+            ejemplares_totales=2,
+            ejemplares_disponibles=1,
+        )
+        for i, categoria in enumerate(categorias)
+    )
+    lectores = UsuarioLector.objects.bulk_create(
+        UsuarioLector(nombre="Lector", apellido=f"{base + i}", dni=f"{prefijo}{base + i}")
+        for i in range(cantidad)
+    )
+    estados = [
+        Prestamo.Estados.PRESTADO,
+        Prestamo.Estados.ATRASADO,
+        Prestamo.Estados.DEVUELTO,
+        Prestamo.Estados.ROBADO,
+    ]
+    Prestamo.objects.bulk_create(
+        Prestamo(
+            libro=libro,
+            lector=lector,
+            fecha_prestamo=hoy - datetime.timedelta(days=i % 5),
+            fecha_devolucion_estimada=hoy + datetime.timedelta(days=7),
+            estado=estados[i % len(estados)],
+            creado_por=creado_por,
+        )
+        for i, (libro, lector) in enumerate(zip(libros, lectores))
+    )
+
+
+class PresupuestoQueriesMixin:
+    """
+    Mixin para TestCase: compara la cantidad de queries de un request con
+    `chico` y con `grande` filas extra de préstamos (y sus FK).
+    """
+
+    filas_chico = 10
+    filas_grande = 500
+
+    def contar_queries(self, hacer_request) -> tuple:
+        # cada medición se descarta: un POST no cambia el estado de la siguiente
+        # on_commit se ejecuta (ej. la escritura de auditoría) y cuenta en el total
+        with transaction.atomic():
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as ctx:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = hacer_request()
+                    if response.streaming:
+                        # las queries de una respuesta en streaming corren al consumirla
+                        b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+        return len(ctx.captured_queries), response, ctx.captured_queries
+
+    def assertQueriesConstantes(self, hacer_request, maximo=None, creado_por=None):
+        """
+        `hacer_request()` se llama una vez con `filas_chico` y otra con
+        `filas_grande` préstamos extra. Falla si la cantidad de queries
+        cambia, o si supera `maximo` (cuando se indica).
+        Devuelve la cantidad de queries.
+        """
+        creado_por = creado_por or self.supervisor
+
+        # los datos extra también se descartan al terminar
+        with transaction.atomic():
+            crear_prestamos_masivos(self.filas_chico, creado_por)
+            chico, response, _ = self.contar_queries(hacer_request)
+            self.assertLess(response.status_code, 400)
+
+            crear_prestamos_masivos(self.filas_grande - self.filas_chico, creado_por)
+            grande, response, queries = self.contar_queries(hacer_request)
+            self.assertLess(response.status_code, 400)
+            transaction.set_rollback(True)
+
+        self.assertEqual(
+            chico,
+            grande,
+            f"Las queries crecen con los datos ({self.filas_chico} filas: {chico}, "
+            f"{self.filas_grande} filas: {grande}):\n{_listar(queries)}",
+        )
+        if maximo is not None:
+            self.assertLessEqual(grande, maximo, _listar(queries))
+        return grande
@@ -1,13 +1,55 @@
 import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F, Q, Sum
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import CategoriaLibro, Libro, UsuarioLector, Prestamo
+from . import consultas_lentas, limites, metricas, salud
+from .auditoria import AuditoriaMiddleware, auditar
+from .models import (
+    CategoriaLibro,
+    EventoAuditoria,
+    Libro,
+    UsuarioLector,
+    Prestamo,
+    PrestamoArchivado,
+    PrestamosCategoriaMes,
+    PrestamosLibroMes,
+    RollupPrestamoDiario,
+    TokenAPI,
+    VersionFragmento,
+)
+from .replicas import COOKIE_STICKY, ReplicaRouter, usando_replica
+from .logs import ColaAcotadaHandler, JsonFormatter
+from .testing import PresupuestoQueriesMixin, presupuesto_queries
 
 
 User = get_user_model()
@@ -67,6 +109,11 @@ class BaseTestDataMixin:
             creado_por=cls.supervisor,
         )
 
+    def setUp(self):
+        super().setUp()
+        # tokens de API y límites de tasa viven en la cache (local al proceso)
+        cache.clear()
+
 
 class PrestamoModelTests(BaseTestDataMixin, TestCase):
     def test_fecha_devolucion_estimada_no_puede_ser_anterior_a_prestamo(self):
@@ -199,3 +246,1277 @@ class PrestamoViewsTests(BaseTestDataMixin, TestCase):
             [Prestamo.Estados.DEVUELTO, Prestamo.Estados.ATRASADO],
         )
         self.assertIsNotNone(self.prestamo.fecha_devolucion_real)
+
+    def test_api_sin_ejemplares_responde_400(self):
+        # el libro tiene 2 ejemplares y 1 prestado: el segundo préstamo lo agota
+        self.client.login(username="operador", password="operador123")
+        hoy = timezone.localdate()
+        data = {
+            "libro_id": self.libro.id,
+            "fecha_prestamo": hoy.isoformat(),
+            "fecha_devolucion_estimada": (hoy + datetime.timedelta(days=7)).isoformat(),
+        }
+        otro = UsuarioLector.objects.create(nombre="Ana", apellido="Gómez", dni="87654321")
+        response = self.client.post(
+            reverse("prestamo-list"), {**data, "lector_id": otro.id}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(
+            reverse("prestamo-list"), {**data, "lector_id": self.lector.id}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("libro", response.json())
+
+    def test_marcar_robado_desde_html(self):
+        self.client.login(username="operador", password="operador123")
+        url = reverse("biblioteca:prestamo_marcar_robado", args=[self.prestamo.id])
+        self.assertContains(self.client.get(url), "Marcar préstamo como robado")
+
+        self.client.post(url)
+        self.prestamo.refresh_from_db()
+        self.assertEqual(self.prestamo.estado, Prestamo.Estados.ROBADO)
+
+
+@mock.patch("biblioteca.replicas.replica_configurada", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    def test_lecturas_de_reporte_van_a_replica(self, _):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Prestamo), "default")
+        with usando_replica():
+            self.assertEqual(router.db_for_read(Prestamo), "replica")
+
+    def test_despues_de_escribir_se_lee_de_primaria(self, _):
+        router = ReplicaRouter()
+        with usando_replica():
+            self.assertEqual(router.db_for_write(Prestamo), "default")
+            self.assertEqual(router.db_for_read(Prestamo), "default")
+
+
+class PrimariaStickyTests(BaseTestDataMixin, TestCase):
+    @mock.patch("biblioteca.replicas.replica_configurada", return_value=True)
+    def test_post_deja_cookie_de_primaria_sticky(self, _):
+        self.client.login(username="supervisor", password="supervisor123")
+        url = reverse("biblioteca:prestamo_devolver", args=[self.prestamo.id])
+        response = self.client.post(url)
+        self.assertIn(COOKIE_STICKY, response.cookies)
+
+        response = self.client.get(reverse("biblioteca:libro_list"))
+        self.assertNotIn(COOKIE_STICKY, response.cookies)
+
+
+@skipUnless("replica" in settings.DATABASES, "Requiere DATABASE_REPLICA_URL")
+class ReplicaReporteTests(TransactionTestCase):
+    """
+    Con DATABASE_REPLICA_URL (ej. sqlite:///db-replica.sqlite3) la réplica es
+    un espejo de default en tests: el reporte debe consultarla a ella.
+    """
+    databases = set(settings.DATABASES)
+
+    def test_reporte_lee_de_replica(self):
+        supervisor = User.objects.create_superuser(
+            username="supervisor", password="supervisor123"
+        )
+        categoria = CategoriaLibro.objects.create(nombre="Novela")
+        libro = Libro.objects.create(titulo="1984", autor="Orwell", categoria=categoria)
+        lector = UsuarioLector.objects.create(nombre="Juan", apellido="Pérez", dni="1")
+        Prestamo.objects.create(
+            libro=libro,
+            lector=lector,
+            fecha_prestamo=datetime.date(2025, 1, 1),
+            fecha_devolucion_estimada=datetime.date(2025, 1, 10),
+            creado_por=supervisor,
+        )
+        self.client.login(username="supervisor", password="supervisor123")
+
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.get(reverse("biblioteca:reporte_prestamos"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Total de préstamos en el periodo: 1")
+        self.assertTrue(
+            any("biblioteca_prestamo" in q["sql"] for q in replica.captured_queries)
+        )
+
+
+class ArchivoPrestamosTests(BaseTestDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # préstamo viejo y cerrado (archivable) + el PRESTADO de setUpTestData
+        self.viejo = Prestamo.objects.create(
+            libro=self.libro,
+            lector=self.lector,
+            fecha_prestamo=datetime.date(2020, 3, 1),
+            fecha_devolucion_estimada=datetime.date(2020, 3, 10),
+            fecha_devolucion_real=datetime.date(2020, 3, 9),
+            estado=Prestamo.Estados.DEVUELTO,
+            creado_por=self.supervisor,
+        )
+
+    def test_archivar_mueve_solo_cerrados_viejos(self):
+        call_command("archivar_prestamos", meses=6, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(Prestamo.objects.filter(pk=self.viejo.pk).exists())
+        self.assertTrue(Prestamo.objects.filter(pk=self.prestamo.pk).exists())
+        archivado = PrestamoArchivado.objects.get(pk=self.viejo.pk)
+        self.assertEqual(archivado.estado, Prestamo.Estados.DEVUELTO)
+        self.assertEqual(archivado.lector, self.lector)
+
+    def test_reporte_une_prestamos_archivados(self):
+        call_command("archivar_prestamos", meses=6, stdout=StringIO())
+        self.client.login(username="supervisor", password="supervisor123")
+        url = reverse("biblioteca:reporte_prestamos")
+
+        response = self.client.get(url)
+        self.assertEqual(response.context["total_prestamos"], 2)
+
+        response = self.client.get(url, {"export": "csv"})
+        filas = response.content.decode().strip().splitlines()
+        self.assertEqual(len(filas), 3)  # encabezado + 2
+        self.assertTrue(filas[-1].startswith(f"{self.viejo.pk},"))
+
+        # rango posterior al archivo: sólo la tabla caliente
+        response = self.client.get(url, {"fecha_desde": "2024-01-01"})
+        self.assertEqual(response.context["total_prestamos"], 1)
+
+
+@override_settings(
+    INSTRUMENTACION_HABILITADA=True,
+    TEMPLATES=[
+        {
+            **settings.TEMPLATES[0],
+            "BACKEND": "biblioteca.instrumentacion.DjangoTemplatesMedidos",
+        }
+    ],
+)
+class InstrumentacionTests(BaseTestDataMixin, TestCase):
+    def test_server_timing_y_linea_de_audit(self):
+        self.client.login(username="supervisor", password="supervisor123")
+
+        with self.assertLogs("biblioteca.audit", level="INFO") as logs:
+            response = self.client.get(reverse("biblioteca:prestamo_list"))
+
+        self.assertEqual(response.status_code, 200)
+        server_timing = response["Server-Timing"]
+        self.assertRegex(server_timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(server_timing, r"tpl;dur=[\d.]+")
+        self.assertRegex(server_timing, r"total;dur=[\d.]+")
+        self.assertIn("view=biblioteca:prestamo_list", logs.output[-1])
+        self.assertRegex(logs.output[-1], r"queries=[1-9]\d*")
+
+    @override_settings(INSTRUMENTACION_HABILITADA=False)
+    def test_deshabilitado_no_agrega_header(self):
+        self.client.login(username="supervisor", password="supervisor123")
+        response = self.client.get(reverse("biblioteca:prestamo_list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class SeedEscalaTests(TestCase):
+    def _generar(self):
+        call_command(
+            "seed_demo_data",
+            scale="chica",
+            libros=20,
+            lectores=60,
+            prestamos=400,
+            batch_size=50,
+            stdout=StringIO(),
+        )
+        return list(
+            Prestamo.objects.order_by("id").values_list(
+                "libro__isbn", "lector__dni", "estado", "fecha_prestamo"
+            )
+        )
+
+    def test_respeta_reglas_de_negocio(self):
+        self._generar()
+        self.assertEqual(Prestamo.objects.count(), 400)
+
+        for libro in Libro.objects.all():
+            activos = libro.prestamos.filter(estado__in=Prestamo.ESTADOS_ACTIVOS).count()
+            self.assertLessEqual(activos, libro.ejemplares_totales)
+            self.assertEqual(libro.ejemplares_disponibles, libro.ejemplares_totales - activos)
+
+        con_atraso = Prestamo.objects.filter(estado=Prestamo.Estados.ATRASADO).values("lector")
+        self.assertFalse(
+            Prestamo.objects.filter(
+                estado=Prestamo.Estados.PRESTADO, lector__in=con_atraso
+            ).exists()
+        )
+
+    def test_mismo_seed_mismo_dataset(self):
+        self.assertEqual(self._generar(), self._generar())
+
+    def test_un_solo_lector_y_ceros_explicitos(self):
+        opciones = {"scale": "chica", "batch_size": 50, "stdout": StringIO()}
+        call_command("seed_demo_data", libros=3, lectores=1, prestamos=30, **opciones)
+        self.assertEqual(Prestamo.objects.count(), 30)
+        self.assertEqual(UsuarioLector.objects.count(), 1)
+
+        call_command("seed_demo_data", libros=0, lectores=0, prestamos=0, **opciones)
+        self.assertFalse(Libro.objects.exists())
+        self.assertFalse(UsuarioLector.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command("seed_demo_data", libros=0, lectores=5, prestamos=10, **opciones)
+
+
+class BenchmarkEndpointsTests(BaseTestDataMixin, TestCase):
+    def _benchmark(self, baseline, **opciones):
+        salida = StringIO()
+        call_command(
+            "benchmark_endpoints",
+            iteraciones=2,
+            calentamiento=0,
+            baseline=str(baseline),
+            stdout=salida,
+            **opciones,
+        )
+        return salida.getvalue()
+
+    def test_guarda_baseline_y_detecta_regresiones(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / "baseline.json"
+            self._benchmark(baseline, guardar_baseline=True)
+
+            datos = json.loads(baseline.read_text())
+            self.assertEqual(
+                set(datos["endpoints"]),
+                {
+                    "listar_prestamos",
+                    "libros_buscar",
+                    "prestamo_crear",
+                    "prestamo_devolver",
+                    "dashboard",
+                    "reporte",
+                    "reporte_csv",
+                },
+            )
+            # los POST se descartan: el dataset no cambia
+            self.assertEqual(Prestamo.objects.count(), 1)
+
+            # baseline "imposible" => falla
+            for resultado in datos["endpoints"].values():
+                resultado.update(p95_ms=0.001, queries=0)
+            baseline.write_text(json.dumps(datos))
+            with self.assertRaisesMessage(CommandError, "Regresiones"):
+                self._benchmark(baseline)
+
+
+class LoadtestTests(BaseTestDataMixin, LiveServerTestCase):
+    def setUp(self):
+        # TransactionTestCase no corre setUpTestData
+        self.setUpTestData()
+        super().setUp()
+
+    def test_corre_escalones_contra_servidor(self):
+        salida = StringIO()
+        call_command(
+            "loadtest",
+            url=self.live_server_url,
+            concurrencia="1,2",
+            duracion=0.5,
+            stdout=salida,
+        )
+        lineas = salida.getvalue().splitlines()
+        escalones = [l.split()[0] for l in lineas if l[:5].strip().isdigit()]
+        self.assertEqual(escalones, ["1", "2"])
+        self.assertIn("buscar_catalogo: 200=", salida.getvalue())
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"lectura": "1/min"}})
+    def test_en_proceso_sin_limites_de_tasa(self):
+        salida = StringIO()
+        call_command("loadtest", concurrencia="1", duracion=0.5, stdout=salida, stderr=StringIO())
+        self.assertIn("buscar_catalogo: 200=", salida.getvalue())
+        self.assertNotIn("429=", salida.getvalue())
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"lectura": "1/min"}})
+    def test_avisa_si_el_servidor_limita(self):
+        errores = StringIO()
+        call_command(
+            "loadtest", url=self.live_server_url, concurrencia="1", duracion=0.5,
+            stdout=StringIO(), stderr=errores,
+        )
+        self.assertIn("respuestas 429", errores.getvalue())
+
+    def test_credenciales_invalidas(self):
+        with self.assertRaisesMessage(CommandError, "No se pudo iniciar sesión"):
+            call_command(
+                "loadtest",
+                url=self.live_server_url,
+                operador="operador:mal",
+                duracion=0.1,
+                stdout=StringIO(),
+            )
+
+
+# se mide cada endpoint muchas veces seguidas: sin límites de tasa, y sin
+# cache de fragmentos (bulk_create no la invalida y se mediría el acierto)
+@override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}},
+    FRAGMENTOS_CACHE_TTL=0,
+)
+class PresupuestoQueriesTests(PresupuestoQueriesMixin, BaseTestDataMixin, TestCase):
+    """
+    Cada vista HTML y acción de la API hace la misma cantidad de queries
+    con 10 y con 500 préstamos (sin N+1), dentro de su presupuesto.
+    """
+
+    def _verificar(self, presupuestos, usuario):
+        self.client.force_login(usuario)
+        for nombre, (metodo, url, data, maximo) in presupuestos.items():
+            with self.subTest(nombre):
+                if metodo == "get":
+                    hacer = lambda: self.client.get(url, data)
+                else:
+                    hacer = lambda: self.client.post(url, data, content_type="application/json")
+                self.assertQueriesConstantes(hacer, maximo=maximo)
+
+    def test_presupuesto_excedido_falla(self):
+        with self.assertRaisesMessage(AssertionError, "Presupuesto de queries excedido: 1 > 0"):
+            with presupuesto_queries(0):
+                Libro.objects.count()
+
+    def test_vistas_html(self):
+        hoy = timezone.localdate().isoformat()
+        pk = self.prestamo.pk
+        self._verificar(
+            {
+                # +1: top de populares del mes (contadores, por índice)
+                "home": ("get", reverse("biblioteca:home"), None, 6),
+                "libro_list": ("get", reverse("biblioteca:libro_list"), None, 5),
+                "libro_create": ("get", reverse("biblioteca:libro_create"), None, 4),
+                "libro_edit": ("get", reverse("biblioteca:libro_edit", args=[self.libro.pk]), None, 5),
+                "libro_delete": ("get", reverse("biblioteca:libro_delete", args=[self.libro.pk]), None, 4),
+                "categoria_list": ("get", reverse("biblioteca:categoria_list"), None, 5),
+                "categoria_create": ("get", reverse("biblioteca:categoria_create"), None, 3),
+                "categoria_edit": ("get", reverse("biblioteca:categoria_edit", args=[self.categoria.pk]), None, 4),
+                "categoria_delete": ("get", reverse("biblioteca:categoria_delete", args=[self.categoria.pk]), None, 4),
+                "prestamo_list": ("get", reverse("biblioteca:prestamo_list"), None, 5),
+                "prestamo_create": ("get", reverse("biblioteca:prestamo_create"), None, 3),
+                "buscar_lectores": ("get", reverse("biblioteca:buscar_lectores"), {"q": "Lector"}, 4),
+                "buscar_libros": ("get", reverse("biblioteca:buscar_libros"), {"q": "pq"}, 4),
+                "prestamo_devolver_get": ("get", reverse("biblioteca:prestamo_devolver", args=[pk]), None, 3),
+                "prestamo_robado_get": ("get", reverse("biblioteca:prestamo_marcar_robado", args=[pk]), None, 4),
+                "reporte": ("get", reverse("biblioteca:reporte_prestamos"), {"fecha_desde": hoy}, 9),
+                "reporte_csv": ("get", reverse("biblioteca:reporte_prestamos"), {"export": "csv"}, 8),
+            },
+            self.supervisor,
+        )
+
+    def test_api(self):
+        hoy = timezone.localdate()
+        pk = self.prestamo.pk
+        # libro con stock libre para el POST de creación
+        libro_libre = Libro.objects.create(
+            titulo="Libre", autor="Autor", categoria=self.categoria,
+            ejemplares_totales=1, ejemplares_disponibles=1,
+        )
+        nuevo_prestamo = {
+            "libro_id": libro_libre.pk,
+            "lector_id": self.lector.pk,
+            "fecha_prestamo": hoy.isoformat(),
+            "fecha_devolucion_estimada": (hoy + datetime.timedelta(days=7)).isoformat(),
+        }
+        self._verificar(
+            {
+                "categoria-list": ("get", reverse("categoria-list"), None, 5),
+                "categoria-detail": ("get", reverse("categoria-detail", args=[self.categoria.pk]), None, 4),
+                "categoria-todos": ("get", reverse("categoria-todos"), None, 4),
+                "libro-list": ("get", reverse("libro-list"), {"q": "pq"}, 4),
+                "libro-detail": ("get", reverse("libro-detail", args=[self.libro.pk]), None, 3),
+                "libro-todos": ("get", reverse("libro-todos"), None, 3),
+                "lector-list": ("get", reverse("lector-list"), None, 4),
+                "lector-list-q": ("get", reverse("lector-list"), {"q": "Lector"}, 4),
+                "lector-todos": ("get", reverse("lector-list"), {"todos": "1"}, 4),
+                "prestamo-list": ("get", reverse("prestamo-list"), None, 4),
+                "prestamo-detail": ("get", reverse("prestamo-detail", args=[pk]), None, 3),
+                # +2 contadores de populares (upsert), +2 SAVEPOINT/RELEASE del
+                # atomic (en el test va anidado), +1 versión de fragmentos
+                # (stock del libro; on_commit)
+                "prestamo-create": ("post", reverse("prestamo-list"), nuevo_prestamo, 20),
+                "prestamo-devolver": ("post", reverse("prestamo-devolver", args=[pk]), None, 12),
+                "prestamo-marcar-robado": ("post", reverse("prestamo-marcar-robado", args=[pk]), None, 12),
+                "prestamo-dashboard": ("get", reverse("prestamo-dashboard"), None, 6),
+                "prestamo-reporte": ("get", reverse("prestamo-reporte"), None, 8),
+                "prestamo-reporte-csv": ("get", reverse("prestamo-reporte-csv"), None, 5),
+                "populares-list": ("get", reverse("populares-list"), None, 5),
+                "analitica-prestamos-list": ("get", reverse("analitica-prestamos-list"), None, 5),
+            },
+            self.supervisor,
+        )
+
+
+class ColaAuditLogTests(SimpleTestCase):
+    def test_cola_llena_descarta_y_avisa(self):
+        liberar = threading.Event()
+        escritos = []
+
+        class DestinoLento(logging.Handler):
+            def emit(self, record):
+                liberar.wait(5)
+                escritos.append(json.loads(record.getMessage()))
+
+        handler = ColaAcotadaHandler(capacidad=2, destino=DestinoLento())
+        handler.setFormatter(JsonFormatter())
+        logger = logging.getLogger("biblioteca.tests.cola")
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            # el listener queda trabado en el primero y la cola admite 2 más
+            for i in range(10):
+                logger.warning("PRESTAMO_CREATE user=%s prestamo_id=%s", "operador", i)
+            self.assertGreaterEqual(handler.descartados, 7)
+
+            liberar.set()
+            handler.queue.join()
+            logger.warning("PRESTAMO_CREATE user=%s prestamo_id=%s", "operador", 99)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        eventos = [e["evento"] for e in escritos]
+        self.assertIn("AUDIT_LOG_DESCARTADOS", eventos)
+        self.assertEqual(escritos[-1]["prestamo_id"], 99)
+        self.assertEqual(escritos[-1]["user"], "operador")
+
+    def test_descartar_viejos_no_traba_join(self):
+        liberar = threading.Event()
+        escritos = []
+
+        class DestinoLento(logging.Handler):
+            def emit(self, record):
+                liberar.wait(5)
+                escritos.append(record.getMessage())
+
+        handler = ColaAcotadaHandler(capacidad=2, politica="descartar_viejos", destino=DestinoLento())
+        try:
+            for i in range(10):
+                handler.handle(logging.makeLogRecord({"msg": f"R{i}", "levelno": logging.WARNING}))
+            liberar.set()
+            hilo = threading.Thread(target=handler.queue.join, daemon=True)
+            hilo.start()
+            hilo.join(5)
+            self.assertFalse(hilo.is_alive())
+        finally:
+            handler.close()
+        self.assertEqual(escritos[-1], "R9")
+
+    def test_listener_arranca_con_el_primer_registro_de_cada_proceso(self):
+        escritos = []
+
+        class Destino(logging.Handler):
+            def emit(self, record):
+                escritos.append(record.getMessage())
+
+        handler = ColaAcotadaHandler(destino=Destino())
+        try:
+            self.assertIsNone(handler.listener)
+            handler.handle(logging.makeLogRecord({"msg": "padre", "levelno": logging.WARNING}))
+            padre = handler.listener
+            self.assertIsNotNone(padre)
+
+            # después de un fork el pid cambia y el hilo del padre no existe
+            with mock.patch("biblioteca.logs.os.getpid", return_value=os.getpid() + 1):
+                handler.handle(logging.makeLogRecord({"msg": "hijo", "levelno": logging.WARNING}))
+                self.assertIsNot(handler.listener, padre)
+                handler.close()
+            padre.stop()
+        finally:
+            handler.close()
+        self.assertEqual(sorted(escritos), ["hijo", "padre"])
+
+
+class AuditoriaTests(BaseTestDataMixin, TestCase):
+    def test_devolucion_queda_registrada_y_se_consulta_por_api(self):
+        self.client.force_login(self.operador)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("biblioteca:prestamo_devolver", args=[self.prestamo.id]))
+
+        evento = EventoAuditoria.objects.get()
+        self.assertEqual(evento.accion, "PRESTAMO_DEVOLUCION")
+        self.assertEqual((evento.entidad, evento.entidad_id), ("prestamo", self.prestamo.id))
+        self.assertEqual(evento.usuario, self.operador)
+        self.assertIn(evento.datos["nuevo_estado"], ["DEVUELTO", "ATRASADO"])
+
+        url = reverse("auditoria-list")
+        filtros = {"entidad": "prestamo", "entidad_id": self.prestamo.id}
+        self.assertEqual(self.client.get(url, filtros).status_code, 403)
+
+        self.client.force_login(self.supervisor)
+        data = self.client.get(url, filtros).json()
+        self.assertEqual([e["usuario"] for e in data["results"]], ["operador"])
+        self.assertIn("next", data)
+
+        response = self.client.get(url, {"entidad": "prestamo", "entidad_id": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("entidad_id", response.json())
+        response = self.client.get(url, {"entidad": "prestamo", "entidad_id": "9" * 30})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filtro_desde_hasta_por_dia_local(self):
+        def a_las(dia, hora):
+            return timezone.make_aware(datetime.datetime(2025, 3, dia, hora))
+
+        EventoAuditoria.objects.bulk_create(
+            [
+                EventoAuditoria(accion=f"X{i}", entidad="libro", fecha=fecha)
+                for i, fecha in enumerate([a_las(9, 23), a_las(10, 0), a_las(11, 23), a_las(12, 0)])
+            ]
+        )
+        self.client.force_login(self.supervisor)
+        url = reverse("auditoria-list")
+
+        data = self.client.get(url, {"desde": "2025-03-10", "hasta": "2025-03-11"}).json()
+        self.assertEqual(sorted(e["accion"] for e in data["results"]), ["X1", "X2"])
+
+        response = self.client.get(url, {"desde": "10/03/2025"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("desde", response.json())
+
+    def test_un_insert_por_request_y_nada_si_hay_rollback(self):
+        def vista(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                auditar(self.supervisor, "LIBRO_UPDATE", "libro", self.libro.id, titulo="A")
+                auditar(self.supervisor, "LIBRO_UPDATE", "libro", self.libro.id, titulo="B")
+                with transaction.atomic():
+                    auditar(self.supervisor, "LIBRO_DELETE", "libro", self.libro.id)
+                    transaction.set_rollback(True)
+            return HttpResponse()
+
+        with CaptureQueriesContext(connection) as ctx:
+            AuditoriaMiddleware(vista)(RequestFactory().get("/"))
+
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(EventoAuditoria.objects.order_by("id").values_list("datos__titulo", flat=True)),
+            ["A", "B"],
+        )
+
+    def test_podar_por_meses(self):
+        ahora = timezone.now()
+        EventoAuditoria.objects.bulk_create(
+            [
+                EventoAuditoria(accion="X", entidad="libro", fecha=ahora - datetime.timedelta(days=dias))
+                for dias in (0, 40, 400, 800)
+            ]
+        )
+        call_command("podar_auditoria", meses=12, batch_size=1, stdout=StringIO())
+        self.assertEqual(EventoAuditoria.objects.count(), 2)
+
+
+class SesionesTests(BaseTestDataMixin, TestCase):
+    def test_limpiar_sesiones_borra_solo_vencidas_en_lotes(self):
+        from django.contrib.sessions.models import Session
+
+        ahora = timezone.now()
+        Session.objects.bulk_create(
+            [
+                Session(
+                    session_key=f"s{i}",
+                    session_data="",
+                    expire_date=ahora + datetime.timedelta(days=1 if i < 2 else -1),
+                )
+                for i in range(7)
+            ]
+        )
+        salida = StringIO()
+        call_command("limpiar_sesiones", batch_size=2, stdout=salida)
+        self.assertEqual(set(Session.objects.values_list("session_key", flat=True)), {"s0", "s1"})
+        self.assertIn("Borradas 5", salida.getvalue())
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_login_con_cookies_firmadas_no_usa_tabla(self):
+        from django.contrib.sessions.models import Session
+
+        self.client.login(username="operador", password="operador123")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("biblioteca:prestamo_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(any("django_session" in q["sql"] for q in ctx.captured_queries))
+
+
+class TokenAPITests(BaseTestDataMixin, TestCase):
+    def _token(self, usuario, alcances, dias=30):
+        _, clave = TokenAPI.generar(
+            usuario, "test", alcances, timezone.now() + datetime.timedelta(days=dias)
+        )
+        return {"HTTP_AUTHORIZATION": f"Token {clave}"}
+
+    def test_segundo_request_no_consulta_tokens_sesiones_ni_grupos(self):
+        headers = self._token(self.operador, ["operador"])
+        self.assertEqual(self.client.get(reverse("libro-list"), **headers).status_code, 200)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("libro-list"), **headers)
+        self.assertEqual(response.status_code, 200)
+        tablas = ("biblioteca_tokenapi", "django_session", "auth_group", "auth_user")
+        for query in ctx.captured_queries:
+            self.assertFalse(any(t in query["sql"] for t in tablas), query["sql"])
+
+    def test_token_vencido_o_revocado_da_401(self):
+        token, clave = TokenAPI.generar(
+            self.operador, "viejo", ["operador"], timezone.now() - datetime.timedelta(minutes=1)
+        )
+        headers = {"HTTP_AUTHORIZATION": f"Token {clave}"}
+        self.assertEqual(self.client.get(reverse("libro-list"), **headers).status_code, 401)
+
+        token.expira = timezone.now() + datetime.timedelta(days=1)
+        token.save()
+        self.assertEqual(self.client.get(reverse("libro-list"), **headers).status_code, 200)
+
+        # revocar invalida la cache sin esperar el TTL
+        token.activo = False
+        token.save()
+        self.assertEqual(self.client.get(reverse("libro-list"), **headers).status_code, 401)
+
+    def test_supervisor_degradado_pierde_el_rol_del_token(self):
+        headers = self._token(self.supervisor, ["supervisor"])
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 200)
+
+        grupo = Group.objects.get(name="Supervisor")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supervisor.groups.remove(grupo)
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 403)
+
+        # aunque la cache no se entere (cambio por SQL, otro proceso), al
+        # vencer vuelve a cruzar alcances con los grupos actuales
+        with self.captureOnCommitCallbacks(execute=True):
+            self.supervisor.groups.add(grupo)
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 200)
+        self.supervisor.groups.through.objects.filter(user=self.supervisor).delete()
+        cache.clear()
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 403)
+
+    def test_alcance_operador_no_accede_a_reportes(self):
+        # el supervisor puede emitir un token con menos permisos que él
+        headers = self._token(self.supervisor, ["operador"])
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 403)
+        headers = self._token(self.supervisor, ["supervisor"])
+        self.assertEqual(self.client.get(reverse("prestamo-reporte"), **headers).status_code, 200)
+
+    def test_post_con_token_no_requiere_csrf(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        response = client.post(
+            reverse("prestamo-list"),
+            {
+                "libro_id": self.libro.id,
+                "lector_id": self.lector.id,
+                "fecha_prestamo": str(datetime.date.today()),
+                "fecha_devolucion_estimada": str(datetime.date.today() + datetime.timedelta(days=7)),
+            },
+            content_type="application/json",
+            **self._token(self.operador, ["operador"]),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Prestamo.objects.get(pk=response.json()["id"]).creado_por, self.operador)
+
+    def test_crear_token_api_no_excede_roles_del_usuario(self):
+        with self.assertRaises(CommandError):
+            call_command("crear_token_api", usuario="operador", alcance=["supervisor"], stdout=StringIO())
+
+        salida = StringIO()
+        call_command("crear_token_api", usuario="operador", alcance=["operador"], stdout=salida)
+        clave = salida.getvalue().strip().splitlines()[-1]
+        token = TokenAPI.objects.get()
+        self.assertEqual(token.clave_hash, TokenAPI.hashear(clave))
+        self.assertEqual(token.alcances, ["operador"])
+
+
+class LimitesTasaTests(BaseTestDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.supervisor)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"reporte": "2/min"}})
+    def test_reporte_comparte_balde_entre_api_y_html_con_retry_after(self):
+        self.assertEqual(self.client.get(reverse("prestamo-reporte")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("biblioteca:reporte_prestamos")).status_code, 200)
+
+        response = self.client.get(reverse("prestamo-reporte-csv"))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        response = self.client.get(reverse("biblioteca:reporte_prestamos"))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        # el balde es por usuario, y las lecturas comunes no se ven afectadas
+        self.assertEqual(self.client.get(reverse("libro-list")).status_code, 200)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse("prestamo-reporte")).status_code, 200)
+
+    def test_balde_se_rellena_con_el_tiempo(self):
+        tasa = limites.leer_tasa("2/s")
+        with mock.patch("biblioteca.limites.time.time", return_value=1000.0):
+            self.assertEqual(limites.consumir("x", "u1", tasa), 0)
+            self.assertEqual(limites.consumir("x", "u1", tasa), 0)
+            self.assertAlmostEqual(limites.consumir("x", "u1", tasa), 0.5)
+        with mock.patch("biblioteca.limites.time.time", return_value=1000.5):
+            self.assertEqual(limites.consumir("x", "u1", tasa), 0)
+
+
+class AutocompletePrestamoTests(BaseTestDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.operador)
+
+    def test_form_no_lista_lectores_ni_libros(self):
+        response = self.client.get(reverse("biblioteca:prestamo_create"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "<option")
+        self.assertNotContains(response, "Pérez")
+        self.assertContains(response, reverse("biblioteca:buscar_lectores"))
+
+    def test_buscar_lectores_por_dni_o_apellido(self):
+        UsuarioLector.objects.create(nombre="Ana", apellido="Gómez", dni="87654321")
+        UsuarioLector.objects.create(nombre="Eva", apellido="Perón", dni="11", activo=False)
+
+        response = self.client.get(reverse("biblioteca:buscar_lectores"), {"q": "123"})
+        self.assertEqual([r["id"] for r in response.json()["resultados"]], [self.lector.id])
+
+        response = self.client.get(reverse("biblioteca:buscar_lectores"), {"q": "pé"})
+        self.assertEqual([r["texto"] for r in response.json()["resultados"]], [str(self.lector)])
+
+    def test_buscar_libros_solo_con_ejemplares_disponibles(self):
+        Libro.objects.create(
+            titulo="1984 (edición agotada)", autor="George Orwell", categoria=self.categoria,
+            ejemplares_totales=1, ejemplares_disponibles=0,
+        )
+        response = self.client.get(reverse("biblioteca:buscar_libros"), {"q": "1984"})
+        self.assertEqual([r["id"] for r in response.json()["resultados"]], [self.libro.id])
+
+    def test_buscar_con_acentos_y_enie(self):
+        alvarez = UsuarioLector.objects.create(nombre="Ana", apellido="Álvarez", dni="555")
+        nandu = Libro.objects.create(titulo="Ñandú", autor="Anónimo", categoria=self.categoria)
+
+        response = self.client.get(reverse("biblioteca:buscar_lectores"), {"q": "Ál"})
+        self.assertEqual([r["id"] for r in response.json()["resultados"]], [alvarez.id])
+        response = self.client.get(reverse("biblioteca:buscar_libros"), {"q": "Ñan"})
+        self.assertEqual([r["id"] for r in response.json()["resultados"]], [nandu.id])
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN de SQLite")
+    def test_busquedas_por_prefijo_usan_indices(self):
+        planes = {
+            "lector": UsuarioLector.objects.filter(activo=True).buscar("pé").order_by("apellido", "nombre")[:20],
+            "dni": UsuarioLector.objects.buscar("123"),
+            "libro": Libro.objects.filter(Q(titulo__istartswith="19") | Q(autor__istartswith="19"))[:20],
+        }
+        esperados = {
+            "lector": ["lector_apellido_prefijo", "lector_nombre_prefijo"],
+            "dni": ["sqlite_autoindex_biblioteca_usuariolector"],
+            "libro": ["libro_titulo_prefijo", "libro_autor_prefijo"],
+        }
+        for nombre, qs in planes.items():
+            with self.subTest(nombre):
+                plan = qs.explain()
+                self.assertNotIn("SCAN", plan)
+                for indice in esperados[nombre]:
+                    self.assertRegex(plan, rf"SEARCH \S+ USING INDEX {indice}")
+
+    def test_form_con_errores_muestra_el_lector_elegido(self):
+        response = self.client.post(
+            reverse("biblioteca:prestamo_create"), {"lector": self.lector.id, "libro": ""}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'value="{self.lector}"')
+
+
+class UsuarioLectorAPITests(BaseTestDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.operador)
+        UsuarioLector.objects.bulk_create(
+            UsuarioLector(nombre="Ana", apellido=f"Gómez {i:02d}", dni=f"2000{i:02d}") for i in range(5)
+        )
+
+    def test_listado_paginado_por_cursor_y_resumido(self):
+        response = self.client.get(reverse("lector-list"), {"page_size": 4})
+        datos = response.json()
+        self.assertEqual(len(datos["results"]), 4)
+        self.assertNotIn("email", datos["results"][0])
+
+        siguiente = self.client.get(datos["next"]).json()
+        self.assertEqual(len(siguiente["results"]), 2)
+        self.assertIsNone(siguiente["next"])
+
+    def test_cursor_no_repite_ni_saltea_con_apellidos_iguales(self):
+        UsuarioLector.objects.bulk_create(
+            UsuarioLector(nombre=f"Eva {i % 3}", apellido="López", dni=f"3000{i:02d}") for i in range(20)
+        )
+        vistos = []
+        url, params = reverse("lector-list"), {"page_size": 3}
+        while url:
+            datos = self.client.get(url, params).json()
+            vistos += [r["id"] for r in datos["results"]]
+            url, params = datos["next"], None
+        self.assertEqual(vistos, list(UsuarioLector.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_busqueda_por_dni_y_apellido(self):
+        response = self.client.get(reverse("lector-list"), {"q": "20000"})
+        self.assertEqual(len(response.json()["results"]), 5)
+        response = self.client.get(reverse("lector-list"), {"q": "pér"})
+        self.assertEqual([r["id"] for r in response.json()["results"]], [self.lector.id])
+
+    def test_todos_devuelve_el_formato_anterior_en_streaming(self):
+        # sesión, usuario, grupos y una sola query para los lectores
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("lector-list"), {"todos": "1"})
+            self.assertTrue(response.streaming)
+            datos = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(datos), 6)
+        self.assertEqual(datos[0]["apellido"], "Gómez 00")
+        self.assertIn("email", datos[0])
+
+    def test_todos_de_libros_y_categorias_en_streaming(self):
+        self.client.force_login(self.supervisor)
+        for nombre, esperado in (
+            ("libro-todos", [self.libro.id]),
+            ("categoria-todos", [self.categoria.id]),
+        ):
+            with self.subTest(nombre):
+                response = self.client.get(reverse(nombre))
+                self.assertTrue(response.streaming)
+                self.assertEqual(response["Content-Type"], "application/json")
+                datos = json.loads(b"".join(response.streaming_content))
+                self.assertEqual([d["id"] for d in datos], esperado)
+
+    def test_streaming_emite_el_array_por_bloques(self):
+        from .api.serializers import UsuarioLectorSerializer
+        from .api.streaming import respuesta_json_streaming
+
+        response = respuesta_json_streaming(
+            UsuarioLector.objects.order_by("dni"), UsuarioLectorSerializer, chunk_size=4
+        )
+        partes = [p.decode() for p in response.streaming_content]
+        self.assertEqual(len(partes), 4)  # "[", 4 filas, 2 filas, "]"
+        self.assertEqual(len(json.loads("".join(partes))), 6)
+
+
+class FragmentosCacheTests(BaseTestDataMixin, TestCase):
+    def test_listado_de_libros_cacheado_hasta_que_cambian_los_datos(self):
+        self.client.force_login(self.operador)
+        url = reverse("biblioteca:libro_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, "1984")
+        self.assertFalse(any('FROM "biblioteca_libro" INNER JOIN' in q["sql"] for q in ctx.captured_queries))
+
+        # la versión sube al confirmar, no antes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.titulo = "Rebelión en la granja"
+            self.libro.save()
+            self.assertNotContains(self.client.get(url), "Rebelión en la granja")
+        self.assertContains(self.client.get(url), "Rebelión en la granja")
+
+    def test_version_compartida_entre_procesos(self):
+        # otro proceso (un worker, un comando) cambia datos sin señales y sube
+        # la versión: la ve este proceso aunque tenga su propia cache
+        self.client.force_login(self.operador)
+        url = reverse("biblioteca:libro_list")
+        self.assertContains(self.client.get(url), "1984")
+
+        Libro.objects.filter(pk=self.libro.pk).update(titulo="Rebelión en la granja")
+        VersionFragmento.objects.filter(area="libros").update(version=F("version") + 1)
+        self.assertContains(self.client.get(url), "Rebelión en la granja")
+
+    def test_fragmento_distinto_por_rol(self):
+        url = reverse("biblioteca:libro_list")
+        self.client.force_login(self.operador)
+        self.assertNotContains(self.client.get(url), "Editar")
+        self.client.force_login(self.supervisor)
+        self.assertContains(self.client.get(url), "Editar")
+
+    def test_prestamos_no_invalidan_home_que_vive_poco(self):
+        otro = UsuarioLector.objects.create(nombre="Ana", apellido="Gómez", dni="87654321")
+        self.client.force_login(self.operador)
+        url = reverse("biblioteca:home")
+        self.assertNotContains(self.client.get(url), "Gómez")
+        versiones = dict(VersionFragmento.objects.values_list("area", "version"))
+
+        hoy = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            Prestamo.objects.create(
+                libro=self.libro, lector=otro, fecha_prestamo=hoy,
+                fecha_devolucion_estimada=hoy + datetime.timedelta(days=7),
+                creado_por=self.operador,
+            )
+        # sólo el stock del listado de libros
+        nuevas = dict(VersionFragmento.objects.values_list("area", "version"))
+        self.assertEqual(nuevas["home"], versiones["home"])
+        self.assertEqual(nuevas["libros"], versiones["libros"] + 1)
+        self.assertNotContains(self.client.get(url), "Gómez")
+
+        with override_settings(FRAGMENTOS_HOME_TTL=0):
+            self.assertContains(self.client.get(url), "Gómez")
+
+
+class EsquemaOpenAPITests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.enterContext(override_settings(OPENAPI_ESQUEMA_DIR=self.dir.name))
+
+    def test_sirve_el_archivo_generado_con_etag(self):
+        call_command("spectacular", file=f"{self.dir.name}/schema.yaml", stderr=StringIO())
+        response = self.client.get(reverse("schema"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"openapi:", response.content)
+        self.assertIn(b"tokenAuth", response.content)
+        self.assertTrue(response["ETag"])
+
+        response = self.client.get(reverse("schema"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(DEBUG=False)
+    def test_sin_archivo_no_genera_en_vivo_fuera_de_debug(self):
+        with mock.patch("drf_spectacular.generators.SchemaGenerator.get_schema") as generar:
+            response = self.client.get(reverse("schema"))
+        self.assertEqual(response.status_code, 503)
+        generar.assert_not_called()
+
+    @override_settings(DEBUG=True)
+    def test_sin_archivo_en_debug_genera_en_vivo(self):
+        response = self.client.get(reverse("schema"), {"format": "json"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("paths", json.loads(response.content))
+
+
+class PerfilArranqueTests(SimpleTestCase):
+    def test_sin_api_ni_admin_no_carga_drf(self):
+        out = StringIO()
+        with mock.patch.dict("os.environ", {"API_HABILITADA": "0", "ADMIN_HABILITADO": "0"}):
+            call_command("perfil_arranque", repeticiones=1, top=1000, stdout=out)
+        salida = out.getvalue()
+        self.assertIn("(200 OK)", salida)
+        self.assertIn("django ", salida)
+        self.assertNotIn("rest_framework", salida)
+        self.assertNotIn("drf_spectacular", salida)
+
+
+class SaludTests(TestCase):
+    def test_healthz_no_toca_la_db_ni_la_sesion(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"estado": "ok"})
+        self.assertNotIn("Vary", response)
+        self.assertEqual(response.cookies, {})
+
+    def test_readyz_hace_un_ping(self):
+        salud.migraciones_al_dia()
+        with self.assertNumQueries(1):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+
+    def test_readyz_sin_db_responde_503(self):
+        with mock.patch("biblioteca.salud.ping_db", side_effect=OperationalError("caída")):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["db"], "OperationalError")
+
+    def test_readyz_con_migraciones_pendientes_responde_503(self):
+        with mock.patch.object(salud, "_migraciones_al_dia", None), mock.patch(
+            "django.db.migrations.executor.MigrationExecutor.migration_plan", return_value=[("0099", False)]
+        ):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["migraciones"], "pendientes")
+
+
+class MetricasTests(BaseTestDataMixin, TestCase):
+    @override_settings(METRICAS_PUBLICAS=True)
+    def test_cuenta_requests_por_vista_y_expone_gauges(self):
+        from .testing import crear_prestamos_masivos
+
+        # 1 préstamo vencido del setUp + PRESTADO, ATRASADO, DEVUELTO, ROBADO
+        crear_prestamos_masivos(4, self.supervisor)
+        self.client.login(username="operador", password="operador123")
+        self.client.get(reverse("biblioteca:home"))
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        texto = response.content.decode()
+        self.assertRegex(
+            texto, r'biblioteca_http_requests_total\{status="200",vista="biblioteca:home"\} [1-9]'
+        )
+        self.assertIn('biblioteca_db_queries_por_request_count{vista="biblioteca:home"}', texto)
+        self.assertIn("biblioteca_prestamos_activos 3.0", texto)
+        self.assertIn("biblioteca_prestamos_atrasados 2.0", texto)
+
+    def test_sin_token_fuera_de_debug_no_es_publico(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+        from .checks import metricas_publicas
+
+        self.assertEqual(metricas_publicas(None), [])
+        with override_settings(METRICAS_PUBLICAS=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+            self.assertEqual([w.id for w in metricas_publicas(None)], ["biblioteca.W003"])
+
+    @override_settings(METRICAS_TOKEN="secreto")
+    def test_con_token_exige_bearer(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secreto")
+        self.assertEqual(response.status_code, 200)
+
+    def test_multiproceso_suma_los_workers(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        script = (
+            "import django; django.setup()\n"
+            "from biblioteca.metricas import REQUESTS\n"
+            "REQUESTS.labels('worker', '200').inc()\n"
+        )
+        env = {
+            **os.environ,
+            "PROMETHEUS_MULTIPROC_DIR": directorio.name,
+            "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            "PYTHONPATH": str(settings.BASE_DIR),
+        }
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", script], env=env, check=True, cwd=settings.BASE_DIR)
+
+        with mock.patch.dict("os.environ", {"PROMETHEUS_MULTIPROC_DIR": directorio.name}):
+            texto = metricas.exponer().decode()
+        self.assertIn('biblioteca_http_requests_total{status="200",vista="worker"} 2.0', texto)
+
+
+@override_settings(CONSULTAS_LENTAS_MS=0.001)
+class ConsultasLentasTests(BaseTestDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        consultas_lentas.limpiar()
+        self.addCleanup(consultas_lentas.limpiar)
+
+    def test_registra_sql_vista_y_explain(self):
+        self.client.login(username="supervisor", password="supervisor123")
+        with self.assertLogs("biblioteca.audit", "WARNING") as logs:
+            self.client.get(reverse("biblioteca:libro_list"))
+        self.assertTrue(any("CONSULTA_LENTA" in linea for linea in logs.output))
+
+        registradas = consultas_lentas.registradas()
+        libros = [c for c in registradas if c.vista == "biblioteca:libro_list" and "biblioteca_libro" in c.sql]
+        self.assertTrue(libros)
+        self.assertTrue(libros[0].plan)
+        self.assertEqual([c.ms for c in registradas], sorted((c.ms for c in registradas), reverse=True))
+
+        with self.assertLogs("biblioteca.audit", "WARNING"):
+            response = self.client.get(reverse("biblioteca:consultas_lentas"))
+        self.assertContains(response, "biblioteca:libro_list")
+
+    @override_settings(CONSULTAS_LENTAS_CAPACIDAD=2)
+    def test_capacidad_se_lee_al_usar_el_buffer(self):
+        self.client.login(username="supervisor", password="supervisor123")
+        with self.assertLogs("biblioteca.audit", "WARNING"):
+            self.client.get(reverse("biblioteca:libro_list"))
+        self.assertEqual(len(consultas_lentas.registradas()), 2)
+
+    @override_settings(CONSULTAS_LENTAS_MS=10**9, TIME_ZONE="America/Argentina/Buenos_Aires")
+    def test_hora_en_utc(self):
+        cuando = datetime.datetime(2025, 3, 10, 2, 30, tzinfo=datetime.timezone.utc)
+        with consultas_lentas._lock:
+            consultas_lentas._buffer_actual().append(
+                consultas_lentas.ConsultaLenta(cuando, 12.0, "default", "-", "/", "SELECT 1", "()", "")
+            )
+        self.client.login(username="supervisor", password="supervisor123")
+        response = self.client.get(reverse("biblioteca:consultas_lentas"))
+        # en Buenos Aires sería 2025-03-09 23:30
+        self.assertContains(response, "2025-03-10 02:30:00")
+
+    def test_explain_sin_efectos_fuera_de_select(self):
+        self.assertEqual(consultas_lentas.explicar(connection, "DELETE FROM biblioteca_libro", None), "")
+        self.assertTrue(Libro.objects.exists())
+        self.assertIn("falló", consultas_lentas.explicar(connection, "SELECT * FROM no_existe", None))
+
+    def test_solo_supervisores(self):
+        self.client.login(username="operador", password="operador123")
+        with self.assertLogs("biblioteca.audit", "WARNING"):
+            response = self.client.get(reverse("biblioteca:consultas_lentas"))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PERFILADO_HABILITADO=True)
+class PerfiladoTests(BaseTestDataMixin, TestCase):
+    def test_cpu_devuelve_pstats_para_supervisor(self):
+        self.client.login(username="supervisor", password="supervisor123")
+        response = self.client.get(reverse("biblioteca:home"), {"__profile": "cpu"})
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertEqual(response["X-Perfil-Status"], "200")
+        self.assertIn("cumulative", response.content.decode())
+
+    def test_mem_por_header_y_guarda_snapshot(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.client.login(username="supervisor", password="supervisor123")
+        with override_settings(PERFILADO_DIR=directorio.name):
+            response = self.client.get(reverse("biblioteca:home"), HTTP_X_PERFIL="mem")
+        self.assertIn("Pico durante el request", response.content.decode())
+        self.assertTrue((Path(directorio.name) / response["X-Perfil-Archivo"]).exists())
+
+    def test_operador_no_puede_perfilar(self):
+        self.client.login(username="operador", password="operador123")
+        response = self.client.get(reverse("biblioteca:home"), {"__profile": "cpu"})
+        self.assertNotIn("X-Perfil-Status", response)
+        self.assertTemplateUsed(response, "biblioteca/home.html")
+
+    @override_settings(PERFILADO_HABILITADO=False)
+    def test_apagado_por_defecto(self):
+        self.client.login(username="supervisor", password="supervisor123")
+        response = self.client.get(reverse("biblioteca:home"), {"__profile": "cpu"})
+        self.assertNotIn("X-Perfil-Status", response)
+
+
+class AnaliticaPrestamosTests(BaseTestDataMixin, TestCase):
+    def rollup(self):
+        return {
+            (r.fecha, r.estado): r.cantidad
+            for r in RollupPrestamoDiario.objects.filter(categoria=self.categoria)
+        }
+
+    def test_incremental_sigue_los_cambios_de_estado(self):
+        call_command("actualizar_rollups", stdout=StringIO())
+        self.assertEqual(self.rollup(), {(self.fecha_prestamo, "PRESTADO"): 1})
+
+        # el préstamo viejo se cierra y entra uno nuevo hoy
+        Prestamo.objects.filter(pk=self.prestamo.pk).update(estado=Prestamo.Estados.DEVUELTO)
+        hoy = timezone.localdate()
+        Prestamo.objects.create(
+            libro=self.libro,
+            lector=self.lector,
+            fecha_prestamo=hoy,
+            fecha_devolucion_estimada=hoy,
+            creado_por=self.operador,
+        )
+        call_command("actualizar_rollups", stdout=StringIO())
+        self.assertEqual(
+            self.rollup(), {(self.fecha_prestamo, "DEVUELTO"): 1, (hoy, "PRESTADO"): 1}
+        )
+
+    def test_series_por_mes_desde_el_rollup(self):
+        otro = CategoriaLibro.objects.create(nombre="Ensayo")
+        for dia, categoria, estado, cantidad in [
+            (datetime.date(2025, 1, 3), self.categoria, "DEVUELTO", 4),
+            (datetime.date(2025, 1, 20), self.categoria, "DEVUELTO", 1),
+            (datetime.date(2025, 1, 20), otro, "ROBADO", 2),
+            (datetime.date(2025, 2, 1), self.categoria, "DEVUELTO", 7),
+        ]:
+            RollupPrestamoDiario.objects.create(fecha=dia, categoria=categoria, estado=estado, cantidad=cantidad)
+
+        self.client.login(username="supervisor", password="supervisor123")
+        url = reverse("analitica-prestamos-list")
+        with self.assertNumQueries(5):  # sesión, usuario, grupos, serie, última actualización
+            response = self.client.get(url, {"desde": "2025-01-01", "hasta": "2025-02-28", "por": "estado"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["series"],
+            [
+                {"periodo": "2025-01-01", "estado": "DEVUELTO", "cantidad": 5},
+                {"periodo": "2025-01-01", "estado": "ROBADO", "cantidad": 2},
+                {"periodo": "2025-02-01", "estado": "DEVUELTO", "cantidad": 7},
+            ],
+        )
+
+        response = self.client.get(url, {"desde": "2025-01-01", "hasta": "2025-01-31", "por": "categoria"})
+        self.assertEqual(
+            [(f["categoria_nombre"], f["cantidad"]) for f in response.json()["series"]],
+            [("Novela", 5), ("Ensayo", 2)],
+        )
+
+        self.assertEqual(self.client.get(url, {"por": "libro"}).status_code, 400)
+
+    def test_solo_supervisores(self):
+        self.client.login(username="operador", password="operador123")
+        self.assertEqual(self.client.get(reverse("analitica-prestamos-list")).status_code, 403)
+
+
+class PopularesTests(BaseTestDataMixin, TestCase):
+    def prestar(self, libro, fecha):
+        lector = UsuarioLector.objects.create(nombre="L", apellido="P", dni=f"pop{UsuarioLector.objects.count()}")
+        return Prestamo.objects.create(
+            libro=libro,
+            lector=lector,
+            fecha_prestamo=fecha,
+            fecha_devolucion_estimada=fecha,
+            creado_por=self.operador,
+        )
+
+    def test_el_alta_incrementa_los_contadores(self):
+        mes = datetime.date(2025, 1, 1)
+        self.assertEqual(PrestamosLibroMes.objects.get(mes=mes, libro=self.libro).cantidad, 1)
+
+        self.prestar(self.libro, datetime.date(2025, 1, 20))
+        self.prestamo.estado = Prestamo.Estados.DEVUELTO
+        self.prestamo.save()  # no es un alta: no cuenta
+
+        self.assertEqual(PrestamosLibroMes.objects.get(mes=mes, libro=self.libro).cantidad, 2)
+        self.assertEqual(PrestamosCategoriaMes.objects.get(mes=mes, categoria=self.categoria).cantidad, 2)
+
+    def test_checkout_que_falla_no_deja_contadores(self):
+        libro = Libro.objects.create(
+            titulo="Rayuela", autor="Cortázar", categoria=self.categoria, ejemplares_totales=5, ejemplares_disponibles=5
+        )
+        hoy = timezone.localdate()
+        self.client.force_login(self.operador)
+        # falla después del INSERT y de los contadores: se deshace todo
+        with mock.patch.object(Libro, "actualizar_disponibles", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    reverse("prestamo-list"),
+                    {
+                        "libro_id": libro.id,
+                        "lector_id": self.lector.id,
+                        "fecha_prestamo": hoy.isoformat(),
+                        "fecha_devolucion_estimada": hoy.isoformat(),
+                    },
+                    content_type="application/json",
+                )
+        self.assertFalse(Prestamo.objects.filter(libro=libro).exists())
+        self.assertFalse(PrestamosLibroMes.objects.filter(libro=libro).exists())
+        self.assertEqual(
+            PrestamosCategoriaMes.objects.filter(categoria=self.categoria).aggregate(total=Sum("cantidad"))["total"],
+            1,
+        )
+
+    def test_top_n_por_api(self):
+        otro = Libro.objects.create(
+            titulo="Rayuela", autor="Cortázar", categoria=self.categoria, ejemplares_totales=5, ejemplares_disponibles=5
+        )
+        for _ in range(2):
+            self.prestar(otro, datetime.date(2025, 1, 5))
+
+        self.client.login(username="operador", password="operador123")
+        with self.assertNumQueries(5):  # sesión, usuario, grupos, top libros, top categorías
+            response = self.client.get(reverse("populares-list"), {"mes": "2025-01", "n": 1})
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos["mes"], "2025-01-01")
+        self.assertEqual(datos["libros"], [{"libro": otro.id, "titulo": "Rayuela", "autor": "Cortázar", "cantidad": 2}])
+        self.assertEqual(datos["categorias"][0]["cantidad"], 3)
+
+        self.assertEqual(self.client.get(reverse("populares-list"), {"mes": "enero"}).status_code, 400)
+
+    def test_reconstruir_cuenta_lo_que_no_paso_por_save(self):
+        from .testing import crear_prestamos_masivos
+
+        def total(modelo):
+            return modelo.objects.aggregate(total=Sum("cantidad"))["total"]
+
+        crear_prestamos_masivos(3, self.supervisor, prefijo="pop")  # bulk_create: sin señales
+        self.assertEqual(total(PrestamosLibroMes), 1)
+
+        call_command("reconstruir_populares", stdout=StringIO())
+        self.assertEqual(total(PrestamosLibroMes), Prestamo.objects.count())
+        self.assertEqual(total(PrestamosCategoriaMes), Prestamo.objects.count())
+        self.assertEqual(PrestamosLibroMes.objects.get(mes=datetime.date(2025, 1, 1), libro=self.libro).cantidad, 1)
+
+    def test_home_muestra_el_top_del_mes(self):
+        self.prestar(self.libro, timezone.localdate())
+        self.client.login(username="operador", password="operador123")
+        response = self.client.get(reverse("biblioteca:home"))
+        self.assertContains(response, "Más prestados este mes")
+        self.assertContains(response, "1984 (George Orwell) — 1")
@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import home, listar_libros, listar_prestamos, crear_prestamo, registrar_devolucion, reporte_prestamos, \
     marcar_prestamo_robado, eliminar_libro, editar_libro, crear_libro, listar_categorias, crear_categoria, \
-    editar_categoria, eliminar_categoria
+    editar_categoria, eliminar_categoria, buscar_lectores, buscar_libros, consultas_lentas
 
 app_name = "biblioteca"
 
@@ -23,17 +23,20 @@ urlpatterns = [
     # Préstamos
     path("prestamos/", listar_prestamos, name="prestamo_list"),
     path("prestamos/nuevo/", crear_prestamo, name="prestamo_create"),
+    path("prestamos/buscar-lectores/", buscar_lectores, name="buscar_lectores"),
+    path("prestamos/buscar-libros/", buscar_libros, name="buscar_libros"),
     path(
         "prestamos/<int:pk>/devolver/",
         registrar_devolucion,
         name="prestamo_devolver",
     ),
     path(
-        "prestamos/<int:prestamo_id>/robado/",
+        "prestamos/<int:pk>/robado/",
         marcar_prestamo_robado,
         name="prestamo_marcar_robado",
     ),
 
     # Reporte
     path("reportes/prestamos/", reporte_prestamos, name="reporte_prestamos"),
+    path("reportes/consultas-lentas/", consultas_lentas, name="consultas_lentas"),
 ]
@@ -1,6 +1,6 @@
 import datetime
 from functools import wraps
-import logging
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
@@ -8,12 +8,17 @@ from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count, Q
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from . import consultas_lentas as registro_consultas_lentas
+from . import fragmentos, populares, reportes
 from .forms import PrestamoForm, CategoriaLibroForm, LibroForm
-from .models import Libro, Prestamo, CategoriaLibro, UsuarioLector
-
-logger = logging.getLogger("biblioteca.audit")
+from .models import Libro, Prestamo, CategoriaLibro, UsuarioLector, PrestamoArchivado
+from .auditoria import auditar
+from .limites import limitar
+from .replicas import lectura_en_replica
+from .roles import es_operador, es_supervisor
 
 def _get_page_size(request, default=20, max_size=100):
     """
@@ -29,12 +34,6 @@ def _get_page_size(request, default=20, max_size=100):
         return default
     return max(1, min(size, max_size))
 
-def es_operador(user) -> bool:
-    return user.groups.filter(name="Operador").exists()
-
-def es_supervisor(user) -> bool:
-    return user.is_superuser or user.groups.filter(name="Supervisor").exists()
-
 def solo_operadores(view_func):
     @wraps(view_func)
     @login_required
@@ -53,7 +52,10 @@ def solo_supervisores(view_func):
         raise PermissionDenied("Solo supervisores pueden hacer esto.")
     return _wrapped
 
+TOP_POPULARES_HOME = 5
+
 @login_required
+@lectura_en_replica
 def home(request):
     user = request.user
     supervisor = es_supervisor(user)
@@ -101,6 +103,9 @@ def home(request):
         "prestamos_atrasados": prestamos_atrasados,
         "hace_7_dias": hace_7_dias,
         "hoy": hoy,
+        "libros_populares": populares.top_libros(hoy, TOP_POPULARES_HOME),
+        # los querysets son lazy: con el fragmento en cache no se ejecutan
+        **fragmentos.contexto("home"),
     }
     return render(request, "biblioteca/home.html", context)
 
@@ -129,6 +134,7 @@ def listar_categorias(request):
         "es_supervisor": supervisor,
         "es_operador": operador,
         "page_size": page_size,
+        **fragmentos.contexto("categorias"),
     }
     return render(request, "biblioteca/categoria_list.html", context)
 
@@ -139,11 +145,12 @@ def crear_categoria(request):
         form = CategoriaLibroForm(request.POST)
         if form.is_valid():
             categoria = form.save()
-            logger.info(
-                "CATEGORIA_CREATE user=%s categoria_id=%s nombre=%s",
-                request.user.username,
+            auditar(
+                request.user,
+                "CATEGORIA_CREATE",
+                "categoria",
                 categoria.id,
-                categoria.nombre,
+                nombre=categoria.nombre,
             )
             messages.success(request, "Categoría creada correctamente.")
             return redirect("biblioteca:categoria_list")
@@ -160,11 +167,12 @@ def editar_categoria(request, pk):
         form = CategoriaLibroForm(request.POST, instance=categoria)
         if form.is_valid():
             categoria = form.save()
-            logger.info(
-                "CATEGORIA_UPDATE user=%s categoria_id=%s nombre=%s",
-                request.user.username,
+            auditar(
+                request.user,
+                "CATEGORIA_UPDATE",
+                "categoria",
                 categoria.id,
-                categoria.nombre,
+                nombre=categoria.nombre,
             )
             messages.success(request, "Categoría actualizada correctamente.")
             return redirect("biblioteca:categoria_list")
@@ -195,11 +203,12 @@ def eliminar_categoria(request, pk):
         cat_id = categoria.id
         cat_nombre = categoria.nombre
         categoria.delete()
-        logger.info(
-            "CATEGORIA_DELETE user=%s categoria_id=%s nombre=%s",
-            request.user.username,
+        auditar(
+            request.user,
+            "CATEGORIA_DELETE",
+            "categoria",
             cat_id,
-            cat_nombre,
+            nombre=cat_nombre,
         )
         messages.success(request, "Categoría eliminada correctamente.")
         return redirect("biblioteca:categoria_list")
@@ -229,6 +238,7 @@ def listar_libros(request):
         "es_supervisor": supervisor,
         "es_operador": operador,
         "page_size": page_size,
+        **fragmentos.contexto("libros"),
     }
     return render(request, "biblioteca/libro_list.html", context)
 
@@ -239,11 +249,12 @@ def crear_libro(request):
         form = LibroForm(request.POST)
         if form.is_valid():
             libro = form.save()
-            logger.info(
-                "LIBRO_CREATE user=%s libro_id=%s titulo=%s",
-                request.user.username,
+            auditar(
+                request.user,
+                "LIBRO_CREATE",
+                "libro",
                 libro.id,
-                libro.titulo,
+                titulo=libro.titulo,
             )
             messages.success(request, "Libro creado correctamente.")
             return redirect("biblioteca:libro_list")
@@ -260,11 +271,12 @@ def editar_libro(request, pk):
         form = LibroForm(request.POST, instance=libro)
         if form.is_valid():
             libro = form.save()
-            logger.info(
-                "LIBRO_UPDATE user=%s libro_id=%s titulo=%s",
-                request.user.username,
+            auditar(
+                request.user,
+                "LIBRO_UPDATE",
+                "libro",
                 libro.id,
-                libro.titulo,
+                titulo=libro.titulo,
             )
             messages.success(request, "Libro actualizado correctamente.")
             return redirect("biblioteca:libro_list")
@@ -282,7 +294,10 @@ def eliminar_libro(request, pk):
 
     if request.method == "POST":
         # NO permitimos borrar libros con préstamos
-        tiene_prestamos = Prestamo.objects.filter(libro=libro).exists()
+        tiene_prestamos = (
+            Prestamo.objects.filter(libro=libro).exists()
+            or PrestamoArchivado.objects.filter(libro=libro).exists()
+        )
         if tiene_prestamos:
             messages.error(
                 request,
@@ -295,11 +310,12 @@ def eliminar_libro(request, pk):
         titulo = libro.titulo
         libro.delete()
 
-        logger.info(
-            "LIBRO_DELETE user=%s libro_id=%s titulo=%s",
-            request.user.username,
+        auditar(
+            request.user,
+            "LIBRO_DELETE",
+            "libro",
             libro_id,
-            titulo,
+            titulo=titulo,
         )
         messages.success(request, "Libro eliminado correctamente.")
         return redirect("biblioteca:libro_list")
@@ -359,29 +375,32 @@ def crear_prestamo(request):
         if form.is_valid():
             crear_nuevo = form.cleaned_data["crear_nuevo_lector"]
 
-            if crear_nuevo:
-                # Crear lector nuevo
-                lector = UsuarioLector.objects.create(
-                    nombre=form.cleaned_data["nombre_lector"],
-                    apellido=form.cleaned_data["apellido_lector"],
-                    dni=form.cleaned_data["dni_lector"],
-                    activo=True,
-                )
-            else:
-                lector = form.cleaned_data["lector"]
-
-            prestamo = form.save(commit=False)
-            prestamo.lector = lector
-            prestamo.creado_por = request.user
-            prestamo.estado = Prestamo.Estados.PRESTADO
-            prestamo.save()  # esto dispara clean() y actualizar_disponibles()
-
-            logger.info(
-                "PRESTAMO_CREATE user=%s prestamo_id=%s libro_id=%s lector_id=%s",
-                request.user.username,
+            # lector nuevo, préstamo, stock y contadores (populares): todo o nada
+            with transaction.atomic():
+                if crear_nuevo:
+                    # Crear lector nuevo
+                    lector = UsuarioLector.objects.create(
+                        nombre=form.cleaned_data["nombre_lector"],
+                        apellido=form.cleaned_data["apellido_lector"],
+                        dni=form.cleaned_data["dni_lector"],
+                        activo=True,
+                    )
+                else:
+                    lector = form.cleaned_data["lector"]
+
+                prestamo = form.save(commit=False)
+                prestamo.lector = lector
+                prestamo.creado_por = request.user
+                prestamo.estado = Prestamo.Estados.PRESTADO
+                prestamo.save()  # esto dispara clean() y actualizar_disponibles()
+
+            auditar(
+                request.user,
+                "PRESTAMO_CREATE",
+                "prestamo",
                 prestamo.id,
-                prestamo.libro_id,
-                prestamo.lector_id,
+                libro_id=prestamo.libro_id,
+                lector_id=prestamo.lector_id,
             )
 
             messages.success(request, "Préstamo creado correctamente.")
@@ -392,6 +411,55 @@ def crear_prestamo(request):
 
     return render(request, "biblioteca/prestamo_form.html", {"form": form})
 
+# ===================== BÚSQUEDAS PARA EL FORM DE PRÉSTAMO =====================
+
+# resultados por búsqueda del autocomplete
+LIMITE_BUSQUEDA = 20
+
+@login_required
+@solo_operadores
+def buscar_lectores(request):
+    """
+    Lectores activos para el autocomplete de PrestamoForm.
+    ?q= números -> prefijo de DNI; texto -> prefijo de apellido o nombre
+    (ver UsuarioLectorQuerySet.buscar). Ordenado por apellido y nombre,
+    hasta LIMITE_BUSQUEDA.
+    """
+    q = request.GET.get("q", "").strip()
+    if not q:
+        return JsonResponse({"resultados": []})
+
+    qs = UsuarioLector.objects.filter(activo=True).buscar(q)
+    lectores = qs.order_by("apellido", "nombre").only("id", "apellido", "nombre", "dni")[:LIMITE_BUSQUEDA]
+    return JsonResponse({"resultados": [{"id": l.id, "texto": str(l)} for l in lectores]})
+
+@login_required
+@solo_operadores
+def buscar_libros(request):
+    """
+    Libros activos CON ejemplares disponibles para el autocomplete de
+    PrestamoForm. ?q= prefijo de título o autor, sin distinguir
+    mayúsculas (índices de la migración 0010).
+    """
+    q = request.GET.get("q", "").strip()
+    if not q:
+        return JsonResponse({"resultados": []})
+
+    libros = (
+        Libro.objects.filter(activo=True, ejemplares_disponibles__gt=0)
+        .filter(Q(titulo__istartswith=q) | Q(autor__istartswith=q))
+        .order_by("titulo", "autor")
+        .only("id", "titulo", "autor", "ejemplares_disponibles")[:LIMITE_BUSQUEDA]
+    )
+    return JsonResponse(
+        {
+            "resultados": [
+                {"id": l.id, "texto": f"{l} — {l.ejemplares_disponibles} disp."}
+                for l in libros
+            ]
+        }
+    )
+
 @login_required
 def registrar_devolucion(request, pk):
     """
@@ -399,7 +467,7 @@ def registrar_devolucion(request, pk):
     - Si se devuelve después de la fecha estimada => ATRASADO
     - Si se devuelve en fecha o antes => DEVUELTO
     """
-    prestamo = get_object_or_404(Prestamo, pk=pk)
+    prestamo = get_object_or_404(Prestamo.objects.select_related("libro", "lector"), pk=pk)
 
     if request.method == "POST":
         hoy = timezone.localdate()
@@ -415,11 +483,12 @@ def registrar_devolucion(request, pk):
 
         prestamo.save()
 
-        logger.info(
-            "PRESTAMO_DEVOLUCION user=%s prestamo_id=%s nuevo_estado=%s",
-            request.user.username,
+        auditar(
+            request.user,
+            "PRESTAMO_DEVOLUCION",
+            "prestamo",
             prestamo.id,
-            prestamo.estado,
+            nuevo_estado=prestamo.estado,
         )
 
         messages.success(request, "Devolución registrada correctamente.")
@@ -427,7 +496,7 @@ def registrar_devolucion(request, pk):
 
     return render(
         request,
-        "biblioteca/prestamo_confirm_devolver.html",
+        "biblioteca/prestamo_confirm_devolucion.html",
         {"prestamo": prestamo},
     )
 
@@ -436,15 +505,16 @@ def marcar_prestamo_robado(request, pk):
     if not (es_operador(request.user) or es_supervisor(request.user)):
         return HttpResponseForbidden()
 
-    prestamo = get_object_or_404(Prestamo, pk=pk)
+    prestamo = get_object_or_404(Prestamo.objects.select_related("libro", "lector"), pk=pk)
 
     if request.method == "POST":
         prestamo.estado = Prestamo.Estados.ROBADO
         prestamo.fecha_devolucion_real = timezone.localdate()
         prestamo.save()
-        logger.info(
-            "PRESTAMO_ROBADO user=%s prestamo_id=%s",
-            request.user.username,
+        auditar(
+            request.user,
+            "PRESTAMO_ROBADO",
+            "prestamo",
             prestamo.id,
         )
         messages.warning(request, "Préstamo marcado como ROBADO.")
@@ -454,35 +524,21 @@ def marcar_prestamo_robado(request, pk):
 
 @login_required
 @solo_supervisores
+@limitar("reporte")
+@lectura_en_replica
 def reporte_prestamos(request):
     """
     Reporte de préstamos con filtros y exportación a CSV.
     Solo supervisores/admin.
     """
-    qs = Prestamo.objects.select_related("libro", "lector", "libro__categoria")
-
-    estado = (request.GET.get("estado") or "").strip()
-    categoria_id = (request.GET.get("categoria") or "").strip()
-    fecha_desde = (request.GET.get("fecha_desde") or "").strip()
-    fecha_hasta = (request.GET.get("fecha_hasta") or "").strip()
-
-    if estado:
-        qs = qs.filter(estado=estado)
-    if categoria_id:
-        qs = qs.filter(libro__categoria_id=categoria_id)
-    if fecha_desde:
-        qs = qs.filter(fecha_prestamo__gte=fecha_desde)
-    if fecha_hasta:
-        qs = qs.filter(fecha_prestamo__lte=fecha_hasta)
+    # Prestamo + PrestamoArchivado si el rango de fechas/estado lo requiere
+    filtros = reportes.leer_filtros(request.GET)
+    querysets = reportes.querysets_reporte(filtros)
 
     # métricas
-    resumen_por_estado = (
-        qs.values("estado")
-        .annotate(total=Count("id"))
-        .order_by("estado")
-    )
-    total_prestamos = qs.count()
-    total_atrasados = qs.filter(estado=Prestamo.Estados.ATRASADO).count()
+    resumen_por_estado = reportes.resumen_por_estado(querysets)
+    total_prestamos = reportes.contar(querysets)
+    total_atrasados = reportes.contar_atrasados(querysets)
 
     # CSV
     if request.GET.get("export") == "csv":
@@ -504,7 +560,8 @@ def reporte_prestamos(request):
                 "Categoría",
             ]
         )
-        for p in qs.order_by("-fecha_prestamo"):
+        # iterator(): en PostgreSQL usa cursor del lado del servidor
+        for p in reportes.iterar_prestamos(querysets):
             writer.writerow(
                 [
                     p.id,
@@ -522,22 +579,41 @@ def reporte_prestamos(request):
     categorias = CategoriaLibro.objects.all().order_by("nombre")
 
     context = {
-        "prestamos": qs.order_by("-fecha_prestamo")[:100],  # top 100 para la vista
+        "prestamos": reportes.ultimos_prestamos(querysets, 100),  # top 100 para la vista
         "resumen_por_estado": resumen_por_estado,
         "total_prestamos": total_prestamos,
         "total_atrasados": total_atrasados,
-        "estado": estado,
-        "categoria_id": categoria_id,
-        "fecha_desde": fecha_desde,
-        "fecha_hasta": fecha_hasta,
+        "estado": filtros["estado"],
+        "categoria_id": filtros["categoria_id"],
+        "fecha_desde": filtros["fecha_desde"],
+        "fecha_hasta": filtros["fecha_hasta"],
         "categorias": categorias,
         "prestamo_estados": Prestamo.Estados.choices,
     }
     return render(request, "biblioteca/reporte_prestamos.html", context)
 
+@login_required
+@solo_supervisores
+def consultas_lentas(request):
+    """
+    Consultas que superaron CONSULTAS_LENTAS_MS en este proceso, de la más
+    lenta a la más rápida, con su plan. POST = vaciar el registro.
+    """
+    if request.method == "POST":
+        registro_consultas_lentas.limpiar()
+        messages.success(request, "Registro de consultas lentas vaciado.")
+        return redirect("biblioteca:consultas_lentas")
+
+    context = {
+        "consultas": registro_consultas_lentas.registradas(),
+        "umbral_ms": settings.CONSULTAS_LENTAS_MS,
+        "capacidad": settings.CONSULTAS_LENTAS_CAPACIDAD,
+    }
+    return render(request, "biblioteca/consultas_lentas.html", context)
+
 def permission_denied_403(request, exception=None):
     """
     Vista para errores 403 (Permiso denegado).
     La usamos como handler global.
     """
-    return render(request, "403.html", status=403)
\ No newline at end of file
+    return render(request, "403.html", status=403)
\ No newline at end of file
@@ -1,13 +1,29 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView, SpectacularAPIView
 
 from biblioteca.views import logout_view, permission_denied_403
 
-urlpatterns = [
-    path("admin/", admin.site.urls),
 
+def _vista_docs(nombre):
+    """
+    Swagger / ReDoc importan drf_spectacular.views (y con él los renderers
+    de DRF, yaml, pygments...) recién en el primer request a la UI.
+    """
+    vista = None
+
+    def docs(request, *args, **kwargs):
+        nonlocal vista
+        if vista is None:
+            from drf_spectacular import views as spectacular_views
+
+            vista = getattr(spectacular_views, nombre).as_view(url_name="schema")
+        return vista(request, *args, **kwargs)
+
+    return docs
+
+
+urlpatterns = [
     path(
         "login/",
         auth_views.LoginView.as_view(template_name="registration/login.html"),
@@ -16,24 +32,33 @@ urlpatterns = [
     path("logout/", logout_view, name="logout"),
 
     path("", include("biblioteca.urls")),
-    path("api/", include("biblioteca.api.urls")),
+]
 
-    # 👇 esquema OpenAPI en JSON/YAML
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+if settings.ADMIN_HABILITADO:
+    from django.contrib import admin
 
-    # 👇 Swagger UI
-    path(
-        "api/docs/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
+    urlpatterns.append(path("admin/", admin.site.urls))
 
-    # 👇 ReDoc (otra UI alternativa)
-    path(
-        "api/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
-        name="redoc",
-    ),
-]
+if settings.METRICAS_HABILITADAS:
+    from biblioteca.metricas import metricas_view
+
+    urlpatterns.append(path("metrics", metricas_view, name="metricas"))
+
+if settings.API_HABILITADA:
+    urlpatterns.append(path("api/", include("biblioteca.api.urls")))
+
+if settings.DOCS_API_HABILITADAS:
+    from biblioteca.api.esquema import esquema
+
+    urlpatterns += [
+        # 👇 esquema OpenAPI en JSON/YAML (pre-generado, ver biblioteca/api/esquema.py)
+        path("api/schema/", esquema, name="schema"),
+
+        # 👇 Swagger UI
+        path("api/docs/", _vista_docs("SpectacularSwaggerView"), name="swagger-ui"),
+
+        # 👇 ReDoc (otra UI alternativa)
+        path("api/redoc/", _vista_docs("SpectacularRedocView"), name="redoc"),
+    ]
 
-handler403 = "biblioteca.views.permission_denied_403"
\ No newline at end of file
+handler403 = "biblioteca.views.permission_denied_403"
@@ -0,0 +1,45 @@
+#!/usr/bin/env bash
+set -e
+
+# Corre la suite de tests contra un PostgreSQL descartable (contenedor temporal).
+# Uso: ./test_postgres.sh [args extra para manage.py test]
+
+IMAGE_NAME="michi-biblioteca-django"
+IMAGE_TAG="dev"
+NETWORK_NAME="michi-biblioteca-test-net"
+PG_CONTAINER="michi-biblioteca-test-pg"
+PG_IMAGE="postgres:16-alpine"
+
+cleanup() {
+  echo ">> Eliminando PostgreSQL temporal..."
+  docker rm -f "${PG_CONTAINER}" >/dev/null 2>&1 || true
+  docker network rm "${NETWORK_NAME}" >/dev/null 2>&1 || true
+}
+trap cleanup EXIT
+
+echo ">> (re)construyendo imagen Docker..."
+docker build -t "${IMAGE_NAME}:${IMAGE_TAG}" .
+
+docker network create "${NETWORK_NAME}" >/dev/null 2>&1 || true
+
+echo ">> Levantando PostgreSQL temporal (${PG_IMAGE})..."
+docker run -d --rm \
+  --name "${PG_CONTAINER}" \
+  --network "${NETWORK_NAME}" \
+  -e POSTGRES_USER=michi \
+  -e POSTGRES_PASSWORD=michi \
+  -e POSTGRES_DB=michi \
+  --tmpfs /var/lib/postgresql/data \
+  "${PG_IMAGE}" >/dev/null
+
+echo ">> Esperando a que PostgreSQL acepte conexiones..."
+until docker exec "${PG_CONTAINER}" pg_isready -U michi >/dev/null 2>&1; do
+  sleep 1
+done
+
+echo ">> Corriendo tests contra PostgreSQL..."
+docker run --rm \
+  --network "${NETWORK_NAME}" \
+  -e DATABASE_URL="postgres://michi:michi@${PG_CONTAINER}:5432/michi" \
+  "${IMAGE_NAME}:${IMAGE_TAG}" \
+  python manage.py test "$@"